@@ -0,0 +1,104 @@
+"""Historial de acciones particionado por mes
+
+Revision ID: a8b6c2d5e7f9
+Revises: f7a5b1c4d6e8
+Create Date: 2026-10-17 17:00:00.000000
+
+"""
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'a8b6c2d5e7f9'
+down_revision = 'f7a5b1c4d6e8'
+branch_labels = None
+depends_on = None
+
+# Particiones que se crean por adelantado además de las de los datos existentes
+MESES_ADELANTE = 2
+
+COLUMNAS = (
+    "id_historial, id_usuario, accion, modulo, descripcion, datos_anteriores, datos_nuevos, "
+    "fecha_accion, entidad, es_diferencia"
+)
+
+INDICES = {
+    'ix_historial_acciones_id_historial': ['id_historial'],
+    'ix_historial_acciones_modulo_entidad': ['modulo', 'entidad', 'id_historial'],
+    'ix_historial_acciones_fecha_id': ['fecha_accion', 'id_historial'],
+    'ix_historial_acciones_usuario_fecha_id': ['id_usuario', 'fecha_accion', 'id_historial'],
+    'ix_historial_acciones_modulo_fecha_id': ['modulo', 'fecha_accion', 'id_historial'],
+    'ix_historial_acciones_accion_fecha_id': ['accion', 'fecha_accion', 'id_historial'],
+}
+
+
+def _sumar_meses(mes: date, meses: int) -> date:
+    indice = mes.year * 12 + mes.month - 1 + meses
+    return date(indice // 12, indice % 12 + 1, 1)
+
+
+def _renombrar_tabla(actual: str, nueva: str) -> None:
+    """Renombra la tabla y libera los nombres de sus índices y de la llave primaria."""
+    op.rename_table(actual, nueva)
+    op.execute(f"ALTER TABLE {nueva} RENAME CONSTRAINT {actual}_pkey TO {nueva}_pkey")
+    for nombre in INDICES:
+        op.execute(f"DROP INDEX IF EXISTS {nombre}")
+    op.execute("ALTER SEQUENCE historial_acciones_id_historial_seq OWNED BY NONE")
+
+
+def _crear_tabla(particionada: bool) -> None:
+    op.execute(f"""
+        CREATE TABLE historial_acciones (
+            id_historial INTEGER NOT NULL DEFAULT nextval('historial_acciones_id_historial_seq'),
+            id_usuario INTEGER NOT NULL REFERENCES usuarios (id_usuario),
+            accion VARCHAR(50) NOT NULL,
+            modulo VARCHAR(50) NOT NULL,
+            descripcion VARCHAR(255),
+            datos_anteriores JSON,
+            datos_nuevos JSON,
+            fecha_accion TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT now(),
+            entidad VARCHAR(100),
+            es_diferencia BOOLEAN NOT NULL DEFAULT false,
+            {'PRIMARY KEY (id_historial, fecha_accion)' if particionada else 'PRIMARY KEY (id_historial)'}
+        ){' PARTITION BY RANGE (fecha_accion)' if particionada else ''}
+    """)
+    op.execute("ALTER SEQUENCE historial_acciones_id_historial_seq OWNED BY historial_acciones.id_historial")
+    # En la tabla particionada los índices se crean en cada partición automáticamente
+    for nombre, columnas in INDICES.items():
+        op.create_index(nombre, 'historial_acciones', columnas)
+
+
+def upgrade() -> None:
+    """Upgrade schema: historial_acciones pasa a estar particionada por mes (RANGE sobre fecha_accion)."""
+    _renombrar_tabla('historial_acciones', 'historial_acciones_anterior')
+    _crear_tabla(particionada=True)
+    op.execute("CREATE TABLE historial_acciones_default PARTITION OF historial_acciones DEFAULT")
+
+    # Una partición por cada mes con datos, más el actual y los siguientes
+    bind = op.get_bind()
+    meses = {
+        date(fila.year, fila.month, 1)
+        for fila in bind.execute(sa.text(
+            "SELECT DISTINCT date_trunc('month', fecha_accion)::date FROM historial_acciones_anterior"
+        )).scalars()
+    }
+    actual = date.today().replace(day=1)
+    meses.update(_sumar_meses(actual, i) for i in range(MESES_ADELANTE + 1))
+    for mes in sorted(meses):
+        op.execute(
+            f"CREATE TABLE historial_acciones_{mes:%Y_%m} PARTITION OF historial_acciones "
+            f"FOR VALUES FROM ('{mes.isoformat()}') TO ('{_sumar_meses(mes, 1).isoformat()}')"
+        )
+
+    op.execute(f"INSERT INTO historial_acciones ({COLUMNAS}) SELECT {COLUMNAS} FROM historial_acciones_anterior")
+    op.execute("DROP TABLE historial_acciones_anterior")
+
+
+def downgrade() -> None:
+    """Downgrade schema: vuelve a una tabla simple (los meses ya archivados en disco no se restauran)."""
+    _renombrar_tabla('historial_acciones', 'historial_acciones_particionada')
+    _crear_tabla(particionada=False)
+    op.execute(f"INSERT INTO historial_acciones ({COLUMNAS}) SELECT {COLUMNAS} FROM historial_acciones_particionada")
+    op.execute("DROP TABLE historial_acciones_particionada")
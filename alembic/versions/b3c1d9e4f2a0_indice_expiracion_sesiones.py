@@ -0,0 +1,30 @@
+"""Índice parcial para expirar sesiones
+
+Revision ID: b3c1d9e4f2a0
+Revises: a7f6385e869f
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'b3c1d9e4f2a0'
+down_revision = 'a7f6385e869f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Upgrade schema: índice por vencimiento solo de sesiones activas."""
+    op.create_index(
+        'ix_sesiones_activas_expiracion',
+        'sesiones',
+        [sa.text('(ultima_actividad + expiracion_inactividad)')],
+        postgresql_where=sa.text('estado IS true')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema: elimina el índice de expiración."""
+    op.drop_index('ix_sesiones_activas_expiracion', table_name='sesiones')
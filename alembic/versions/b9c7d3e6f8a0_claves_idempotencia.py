@@ -0,0 +1,38 @@
+"""Tabla claves_idempotencia
+
+Revision ID: b9c7d3e6f8a0
+Revises: a8b6c2d5e7f9
+Create Date: 2026-10-17 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'b9c7d3e6f8a0'
+down_revision = 'a8b6c2d5e7f9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Upgrade schema: resultados por clave de idempotencia, compartidos por todos los workers."""
+    op.create_table(
+        'claves_idempotencia',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('clave', sa.String(length=255), nullable=False),
+        sa.Column('huella', sa.String(length=64), nullable=False),
+        sa.Column('resultado', sa.JSON(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        sa.UniqueConstraint('clave', name='uq_claves_idempotencia_clave'),
+    )
+    op.create_index('ix_claves_idempotencia_id', 'claves_idempotencia', ['id'])
+    op.create_index('ix_claves_idempotencia_expires_at', 'claves_idempotencia', ['expires_at'])
+
+
+def downgrade() -> None:
+    """Downgrade schema: elimina claves_idempotencia."""
+    op.drop_index('ix_claves_idempotencia_expires_at', table_name='claves_idempotencia')
+    op.drop_index('ix_claves_idempotencia_id', table_name='claves_idempotencia')
+    op.drop_table('claves_idempotencia')
@@ -0,0 +1,39 @@
+"""Tabla de acumulados tickets_diarios
+
+Revision ID: c1e8f4a7b9d2
+Revises: b9c7d3e6f8a0
+Create Date: 2026-10-17 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'c1e8f4a7b9d2'
+down_revision = 'b9c7d3e6f8a0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Upgrade schema: crea tickets_diarios y la llena con el historial de ventas."""
+    op.create_table(
+        'tickets_diarios',
+        sa.Column('dia', sa.Date(), nullable=False),
+        sa.Column('id_user', sa.Integer(), sa.ForeignKey('usuarios.id_usuario', ondelete='CASCADE'), nullable=False),
+        sa.Column('tickets', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('dia', 'id_user'),
+    )
+
+    op.execute("""
+        INSERT INTO tickets_diarios (dia, id_user, tickets)
+        SELECT CAST(s.date AS DATE), s.id_user, COUNT(*)
+        FROM sales s
+        WHERE EXISTS (SELECT 1 FROM sale_items si WHERE si.id_sale = s.id_sale)
+        GROUP BY CAST(s.date AS DATE), s.id_user
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema: elimina tickets_diarios."""
+    op.drop_table('tickets_diarios')
@@ -0,0 +1,28 @@
+"""Índice de movimientos por producto y fecha
+
+Revision ID: c4d2e8f1a3b5
+Revises: b3c1d9e4f2a0
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'c4d2e8f1a3b5'
+down_revision = 'b3c1d9e4f2a0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Upgrade schema: índice (id_product, date) que el modelo declaraba pero nunca se creó."""
+    op.create_index(
+        'ix_inventory_movements_product_date',
+        'inventory_movements',
+        ['id_product', 'date']
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema: elimina el índice de movimientos por producto."""
+    op.drop_index('ix_inventory_movements_product_date', table_name='inventory_movements')
@@ -0,0 +1,50 @@
+"""Tabla jobs_reportes
+
+Revision ID: d2f9a5b8c0e3
+Revises: c1e8f4a7b9d2
+Create Date: 2026-10-17 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'd2f9a5b8c0e3'
+down_revision = 'c1e8f4a7b9d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Upgrade schema: reportes en segundo plano, compartidos por todos los workers."""
+    op.create_table(
+        'jobs_reportes',
+        sa.Column('id', sa.String(length=32), primary_key=True),
+        sa.Column('id_usuario', sa.Integer(), sa.ForeignKey('usuarios.id_usuario', ondelete='CASCADE'), nullable=False),
+        sa.Column('tipo', sa.String(length=20), nullable=False),
+        sa.Column('formato', sa.String(length=10), nullable=False),
+        sa.Column('filtros', sa.JSON(), nullable=False),
+        sa.Column('llave', sa.String(length=64), nullable=False),
+        sa.Column('estado', sa.String(length=20), nullable=False),
+        sa.Column('bytes_generados', sa.Integer(), nullable=False),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('ruta', sa.String(length=500), nullable=True),
+        sa.Column('creado', sa.DateTime(), nullable=False),
+        sa.Column('iniciado', sa.DateTime(), nullable=True),
+        sa.Column('terminado', sa.DateTime(), nullable=True),
+        sa.Column('expira', sa.DateTime(), nullable=True),
+    )
+    op.create_index('ix_jobs_reportes_id_usuario', 'jobs_reportes', ['id_usuario'])
+    op.create_index('ix_jobs_reportes_expira', 'jobs_reportes', ['expira'])
+    op.create_index(
+        'uq_jobs_reportes_activo', 'jobs_reportes', ['llave'], unique=True,
+        postgresql_where=sa.text("estado IN ('pendiente', 'en_proceso')")
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema: elimina jobs_reportes."""
+    op.drop_index('uq_jobs_reportes_activo', table_name='jobs_reportes')
+    op.drop_index('ix_jobs_reportes_expira', table_name='jobs_reportes')
+    op.drop_index('ix_jobs_reportes_id_usuario', table_name='jobs_reportes')
+    op.drop_table('jobs_reportes')
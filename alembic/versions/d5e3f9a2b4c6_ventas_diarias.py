@@ -0,0 +1,47 @@
+"""Tabla de acumulados ventas_diarias
+
+Revision ID: d5e3f9a2b4c6
+Revises: c4d2e8f1a3b5
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'd5e3f9a2b4c6'
+down_revision = 'c4d2e8f1a3b5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Upgrade schema: crea ventas_diarias y la llena con el historial de ventas."""
+    op.create_table(
+        'ventas_diarias',
+        sa.Column('dia', sa.Date(), nullable=False),
+        sa.Column('id_product', sa.Integer(), sa.ForeignKey('products.id_product', ondelete='CASCADE'), nullable=False),
+        sa.Column('id_user', sa.Integer(), sa.ForeignKey('usuarios.id_usuario', ondelete='CASCADE'), nullable=False),
+        sa.Column('cantidad', sa.Integer(), nullable=False),
+        sa.Column('ingresos', sa.Numeric(14, 2), nullable=False),
+        sa.Column('tickets', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('dia', 'id_product', 'id_user'),
+    )
+    op.create_index('ix_ventas_diarias_producto_dia', 'ventas_diarias', ['id_product', 'dia'])
+    op.create_index('ix_ventas_diarias_usuario_dia', 'ventas_diarias', ['id_user', 'dia'])
+
+    op.execute("""
+        INSERT INTO ventas_diarias (dia, id_product, id_user, cantidad, ingresos, tickets)
+        SELECT CAST(s.date AS DATE), si.id_product, s.id_user,
+               SUM(si.quantity), SUM(si.price * si.quantity), COUNT(DISTINCT s.id_sale)
+        FROM sales s
+        JOIN sale_items si ON si.id_sale = s.id_sale
+        GROUP BY CAST(s.date AS DATE), si.id_product, s.id_user
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema: elimina ventas_diarias."""
+    op.drop_index('ix_ventas_diarias_usuario_dia', table_name='ventas_diarias')
+    op.drop_index('ix_ventas_diarias_producto_dia', table_name='ventas_diarias')
+    op.drop_table('ventas_diarias')
@@ -0,0 +1,48 @@
+"""Historial de acciones con diferencias por objeto
+
+Revision ID: e6f4a0b3c5d7
+Revises: d5e3f9a2b4c6
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'e6f4a0b3c5d7'
+down_revision = 'd5e3f9a2b4c6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Upgrade schema: columnas entidad y es_diferencia, índice por objeto y relleno de entidad."""
+    op.add_column('historial_acciones', sa.Column('entidad', sa.String(length=100), nullable=True))
+    op.add_column(
+        'historial_acciones',
+        sa.Column('es_diferencia', sa.Boolean(), nullable=False, server_default=sa.false())
+    )
+    op.create_index(
+        'ix_historial_acciones_modulo_entidad',
+        'historial_acciones',
+        ['modulo', 'entidad', 'id_historial']
+    )
+
+    # Registros existentes: datos_nuevos guardaba el APIResponse completo (id en data)
+    op.execute("""
+        UPDATE historial_acciones
+        SET entidad = COALESCE(
+            datos_nuevos -> 'data' ->> 'id',
+            datos_nuevos -> 'data' ->> 'id_product',
+            datos_anteriores ->> 'id',
+            datos_anteriores ->> 'id_product'
+        )
+        WHERE entidad IS NULL
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema: elimina el índice y las columnas nuevas."""
+    op.drop_index('ix_historial_acciones_modulo_entidad', table_name='historial_acciones')
+    op.drop_column('historial_acciones', 'es_diferencia')
+    op.drop_column('historial_acciones', 'entidad')
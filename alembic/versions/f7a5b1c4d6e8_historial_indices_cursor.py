@@ -0,0 +1,33 @@
+"""Índices del historial de acciones para paginación por cursor
+
+Revision ID: f7a5b1c4d6e8
+Revises: e6f4a0b3c5d7
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'f7a5b1c4d6e8'
+down_revision = 'e6f4a0b3c5d7'
+branch_labels = None
+depends_on = None
+
+INDICES = {
+    'ix_historial_acciones_fecha_id': ['fecha_accion', 'id_historial'],
+    'ix_historial_acciones_usuario_fecha_id': ['id_usuario', 'fecha_accion', 'id_historial'],
+    'ix_historial_acciones_modulo_fecha_id': ['modulo', 'fecha_accion', 'id_historial'],
+    'ix_historial_acciones_accion_fecha_id': ['accion', 'fecha_accion', 'id_historial'],
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema: índices compuestos (filtro, fecha_accion, id_historial)."""
+    for nombre, columnas in INDICES.items():
+        op.create_index(nombre, 'historial_acciones', columnas)
+
+
+def downgrade() -> None:
+    """Downgrade schema: elimina los índices compuestos."""
+    for nombre in INDICES:
+        op.drop_index(nombre, table_name='historial_acciones')
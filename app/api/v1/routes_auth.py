@@ -7,7 +7,7 @@ from app.schemas.api_response import APIResponse
 from app.schemas.auth import  GoogleUser, LoginRequest, LoginResponse, OTPRequest, PasswordRecoveryRequest, PasswordResetRequest, SessionResponse, UsuarioRequest, UsuarioResponse, UsernameRecoveryRequest
 # Services
 from app.services import  MailService, GoogleOAuthService, UserService, TwoFAService, OTPService, SessionService, GeoService
-from app.core.security import generate_state
+from app.core.security import HashingBusyError, generate_state
 from app.models.user import Usuario
 import logging
 from app.core.limiter import limiter
@@ -415,6 +415,9 @@ async def reset_password(
             detail="Contraseña restablecida correctamente"
         )
 
+    except HashingBusyError:
+        # Pool de hashing saturado: 503 con Retry-After (ver exception_handlers)
+        raise
     except Exception as e:
         logger.error(f"Error en reset_password: {e}")
         return APIResponse.from_enum(
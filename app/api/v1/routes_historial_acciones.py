@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, status, Request
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.db.database import get_db
+from app.db.database import get_db_lectura
 from app.dependencies.auth import permission_required
 from app.schemas.api_response import APIResponse
 from app.schemas.historial_acciones import HistorialAccionQuery
@@ -13,24 +13,29 @@ router = APIRouter(prefix="/historial", tags=["historial"])
 async def obtener_historial(
     request: Request,
     query: HistorialAccionQuery,  # ahora se recibe en el body
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db_lectura),
     usuario = Depends(permission_required("ver_historial")),
 ):
     """
-    Listar historial de acciones con filtros opcionales y paginación.
+    Listar historial de acciones con filtros opcionales y paginación por cursor
+    (enviar el `next_cursor` de la respuesta para pedir la página siguiente).
     """
     service = HistorialService(db)
     try:
         historial = await service.listar_historial(
-            page=query.page,
             per_page=query.per_page,
+            cursor=query.cursor,
             usuario_nombre=query.usuario_nombre,
             accion=query.accion,
             modulo=query.modulo,
             fecha_inicio=query.fecha_inicio,
-            fecha_fin=query.fecha_fin
+            fecha_fin=query.fecha_fin,
+            completo=query.completo,
+            total=query.total
         )
         return historial
+    except ValueError as e:
+        return APIResponse.from_enum(ResponseCode.VALIDATION_ERROR, detail=str(e))
     except Exception as e:
         return APIResponse.from_enum(
             ResponseCode.SERVER_ERROR,
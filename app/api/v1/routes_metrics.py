@@ -0,0 +1,48 @@
+from fastapi import APIRouter, Security
+from app.core.enums.responses import ResponseCode
+from app.core.security import hashing_executor
+from app.core.session_cache import session_cache
+from app.core.permission_cache import permission_cache
+from app.core.report_cache import report_cache
+from app.jobs import scheduler as scheduler_jobs
+from app.db.database import engine, estado_replica, replica_engine, replica_reportes_engine, reportes_engine
+from app.db.pool import metricas_pool
+from app.services.report_jobs import report_jobs
+from app.services.audit_writer import audit_writer
+from app.dependencies.auth import admin_session_required
+from app.schemas.api_response import APIResponse
+
+router = APIRouter(
+    prefix="/metrics",
+    tags=["metrics"],
+    dependencies=[Security(admin_session_required)]
+)
+
+
+@router.get("/", response_model=APIResponse)
+async def obtener_metricas():
+    """
+    Métricas internas del proceso (solo admins).
+    """
+    return APIResponse.from_enum(
+        ResponseCode.SUCCESS,
+        data={
+            "hashing": hashing_executor.metricas(),
+            "sesiones": session_cache.metricas(),
+            "permisos": permission_cache.metricas(),
+            "reportes": report_cache.metricas(),
+            "jobs_reportes": report_jobs.metricas(),
+            "auditoria": audit_writer.metricas(),
+            "scheduler": scheduler_jobs.metricas(),
+            "pool_db": {
+                "principal": metricas_pool(engine),
+                "reportes": metricas_pool(reportes_engine),
+                **({
+                    "replica": metricas_pool(replica_engine),
+                    "replica_reportes": metricas_pool(replica_reportes_engine),
+                } if replica_engine else {})
+            },
+            "replica": estado_replica.metricas() if estado_replica else {"configurada": False}
+        },
+        detail="Métricas obtenidas correctamente"
+    )
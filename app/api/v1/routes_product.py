@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.db.database import get_db
+from app.db.database import get_db, get_db_lectura
 from app.dependencies.auth import permission_required
 from app.models.category import Category
 from app.models.product import Product
@@ -46,7 +46,7 @@ async def create_product(
 @router.post("/paginated", response_model=PaginatedResponse[ProductResponse])
 async def get_products_paginated(
     request: ProductPaginationRequest,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db_lectura),
     usuario=Depends(permission_required("ver_productos"))
 ):
     service = ProductService(db)
@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, status
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.database import get_db
 from app.dependencies.auth import permission_required
@@ -6,6 +7,7 @@ from app.schemas.api_response import APIResponse
 from app.schemas.purchases import PurchaseCreateRequest, PurchaseCreateResponse
 from app.services.purchase_service import PurchaseService
 from app.core.enums.responses import ResponseCode
+from app.core.idempotency import idempotency_store
 
 router = APIRouter(
     prefix="/purchases",
@@ -15,12 +17,20 @@ router = APIRouter(
 @router.post("/", status_code=status.HTTP_201_CREATED)
 async def create_purchase(
     purchase_request: PurchaseCreateRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     db: AsyncSession = Depends(get_db),
     usuario = Depends(permission_required("crear_compra"))
 ):
     service = PurchaseService(db, usuario.id_usuario)
     try:
-        purchase_result = await service.create_purchase(purchase_request)
+        # Un reintento con la misma Idempotency-Key devuelve la compra ya registrada
+        purchase_result = await idempotency_store.ejecutar(
+            db,
+            f"purchases:{usuario.id_usuario}:{idempotency_key}" if idempotency_key else None,
+            purchase_request.model_dump_json(),
+            PurchaseCreateResponse,
+            lambda registrar: service.create_purchase(purchase_request, registrar)
+        )
         product_names = ", ".join([p.product for p in purchase_result.products])
         return APIResponse.from_enum(
             ResponseCode.SUCCESS,
@@ -1,27 +1,84 @@
-from fastapi import APIRouter, Depends
+import os
+from typing import AsyncIterator, Callable, Optional
+from fastapi import APIRouter, Depends, Header, Query
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy import Select
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.db.database import get_db
+from app.db.database import get_db_lectura, sesion_lectura
+from app.core.enums.estado_job import ReportJobStatus
+from app.core.enums.formato_reporte import ReportFormat
+from app.core.enums.roles_enum import UserRole
+from app.core.report_cache import report_cache
+from app.schemas.reporte_jobs import ReporteJobRequest, ReporteJobResponse
 from app.schemas.reporte_inventario import ReporteInventarioRequest, ReporteInventarioResponse
-from app.schemas.reporte_ventas import ReporteVentasRequest, ReporteVentasResponse
-from app.services.reporte_inventario_service import generar_reporte_inventario
-from app.services.reporte_ventas_service import generar_reporte_ventas
+from app.schemas.reporte_ventas import ReporteVentasRequest, ReporteVentasResponse, ResumenVentasRequest, ResumenVentasResponse
+from app.services.reporte_inventario_service import (
+    alcance_reporte_inventario,
+    construir_consulta_inventario,
+    exportar_reporte_inventario,
+    generar_reporte_inventario
+)
+from app.services.reporte_ventas_service import (
+    alcance_reporte_ventas,
+    construir_consulta_ventas,
+    exportar_reporte_ventas,
+    generar_reporte_ventas,
+    generar_resumen_ventas
+)
+from app.services.report_jobs import ColaReportesLlenaError, report_jobs
 from app.schemas.api_response import APIResponse, ResponseCode
 from app.dependencies.auth import permission_required
+from app.utils.exportacion import CSV_MEDIA_TYPE, leer_gzip
+from app.utils.ndjson import NDJSON_MEDIA_TYPE
 
 router = APIRouter(prefix="/reportes", tags=["Reportes"])
 
+MEDIA_TYPES = {
+    ReportFormat.json: "application/json",
+    ReportFormat.csv: CSV_MEDIA_TYPE,
+    ReportFormat.ndjson: NDJSON_MEDIA_TYPE,
+}
+
+
+def _respuesta_por_partes(
+    exportar: Callable[[AsyncSession, Select, ReportFormat], AsyncIterator[bytes]],
+    query: Select,
+    formato: ReportFormat,
+    nombre: str
+) -> StreamingResponse:
+    # La sesión de get_db_lectura se cierra antes de enviar el cuerpo: el generador abre la suya
+    async def contenido():
+        async with sesion_lectura() as db:
+            async for parte in exportar(db, query, formato):
+                yield parte
+
+    return StreamingResponse(
+        contenido(),
+        media_type=MEDIA_TYPES[formato],
+        headers={"Content-Disposition": f'attachment; filename="{nombre}.{formato.value}"'}
+    )
+
+
 @router.post("/ventas", response_model=APIResponse[ReporteVentasResponse])
 async def obtener_reporte_ventas(
     filtros: ReporteVentasRequest,
-    db: AsyncSession = Depends(get_db),
+    formato: ReportFormat = Query(ReportFormat.json, alias="format"),
+    db: AsyncSession = Depends(get_db_lectura),
     usuario=Depends(permission_required("ver_reportes"))
 ):
     """
     📊 Endpoint para generar un reporte de ventas filtrado por usuario, fechas, categorías o productos.
+    Con `format=csv` o `format=ndjson` el reporte se envía por partes.
     """
     try:
-        # Llamar al servicio con los filtros
-        reporte = await generar_reporte_ventas(db, filtros)
+        if formato != ReportFormat.json:
+            return _respuesta_por_partes(exportar_reporte_ventas, construir_consulta_ventas(filtros), formato, "reporte_ventas")
+
+        # Llamar al servicio con los filtros (o reutilizar el resultado de los mismos filtros)
+        reporte = await report_cache.obtener_o_calcular(
+            alcance_reporte_ventas(filtros),
+            lambda: generar_reporte_ventas(db, filtros)
+        )
 
         return APIResponse.from_enum(
             ResponseCode.SUCCESS,
@@ -40,17 +97,46 @@ async def obtener_reporte_ventas(
             detail=f"Ocurrió un error al generar el reporte: {str(e)}"
         )
 
+@router.post("/ventas/resumen", response_model=APIResponse[ResumenVentasResponse])
+async def obtener_resumen_ventas(
+    filtros: ResumenVentasRequest,
+    db: AsyncSession = Depends(get_db_lectura),
+    usuario=Depends(permission_required("ver_reportes"))
+):
+    """
+    📈 Totales de ventas por día, producto, usuario o categoría, calculados desde los acumulados diarios.
+    """
+    try:
+        resumen = await generar_resumen_ventas(db, filtros)
+        return APIResponse.from_enum(
+            ResponseCode.SUCCESS,
+            data=resumen,
+            detail="Resumen de ventas generado correctamente."
+        )
+    except ValueError as e:
+        return APIResponse.from_enum(ResponseCode.VALIDATION_ERROR, detail=str(e))
+    except Exception as e:
+        return APIResponse.from_enum(ResponseCode.SERVER_ERROR, detail=f"Ocurrió un error al generar el resumen: {str(e)}")
+
 @router.post("/inventario", response_model=APIResponse[ReporteInventarioResponse])
 async def obtener_reporte_inventario(
     filtros: ReporteInventarioRequest,
-    db: AsyncSession = Depends(get_db),
+    formato: ReportFormat = Query(ReportFormat.json, alias="format"),
+    db: AsyncSession = Depends(get_db_lectura),
     usuario=Depends(permission_required("ver_reportes"))
 ):
     """
     📦 Genera un reporte de inventario filtrado por fechas, categorías o productos.
+    Con `format=csv` o `format=ndjson` el reporte se envía por partes.
     """
     try:
-        reporte = await generar_reporte_inventario(db, filtros)
+        if formato != ReportFormat.json:
+            return _respuesta_por_partes(exportar_reporte_inventario, construir_consulta_inventario(filtros), formato, "reporte_inventario")
+
+        reporte = await report_cache.obtener_o_calcular(
+            alcance_reporte_inventario(filtros),
+            lambda: generar_reporte_inventario(db, filtros)
+        )
         return APIResponse.from_enum(
             ResponseCode.SUCCESS,
             data=reporte,
@@ -59,4 +145,78 @@ async def obtener_reporte_inventario(
     except ValueError as e:
         return APIResponse.from_enum(ResponseCode.VALIDATION_ERROR, detail=str(e))
     except Exception as e:
-        return APIResponse.from_enum(ResponseCode.SERVER_ERROR, detail=f"Ocurrió un error: {str(e)}")
\ No newline at end of file
+        return APIResponse.from_enum(ResponseCode.SERVER_ERROR, detail=f"Ocurrió un error: {str(e)}")
+
+
+# ==============================
+# REPORTES EN SEGUNDO PLANO
+# ==============================
+
+@router.post("/jobs", response_model=APIResponse[ReporteJobResponse])
+async def crear_job_reporte(
+    solicitud: ReporteJobRequest,
+    usuario=Depends(permission_required("ver_reportes"))
+):
+    """
+    ⏳ Encola un reporte pesado y retorna el id del job para consultar su avance.
+    Si el usuario ya tiene un job idéntico pendiente o en proceso, se retorna ese mismo.
+    """
+    try:
+        job = await report_jobs.crear(solicitud.tipo, solicitud.formato, solicitud.filtros, usuario.id_usuario)
+        return APIResponse.from_enum(
+            ResponseCode.SUCCESS,
+            data=await report_jobs.a_respuesta(job),
+            detail="Reporte encolado correctamente."
+        )
+    except ColaReportesLlenaError as e:
+        return APIResponse.from_enum(ResponseCode.RATE_LIMIT_EXCEEDED, detail=e.detail)
+    except ValueError as e:
+        return APIResponse.from_enum(ResponseCode.VALIDATION_ERROR, detail=str(e))
+
+
+@router.get("/jobs/{id_job}", response_model=APIResponse[ReporteJobResponse])
+async def obtener_job_reporte(
+    id_job: str,
+    usuario=Depends(permission_required("ver_reportes"))
+):
+    """
+    🔎 Estado y avance de un reporte en segundo plano (solo de quien lo creó o un admin).
+    """
+    job = await report_jobs.obtener(id_job, usuario.id_usuario, usuario.rol == UserRole.ADMIN)
+    if not job:
+        return APIResponse.from_enum(ResponseCode.NOT_FOUND, detail="No se encontró el reporte o ya expiró.")
+    return APIResponse.from_enum(
+        ResponseCode.SUCCESS,
+        data=await report_jobs.a_respuesta(job),
+        detail="Estado del reporte obtenido correctamente."
+    )
+
+
+@router.get("/jobs/{id_job}/descarga")
+async def descargar_job_reporte(
+    id_job: str,
+    accept_encoding: Optional[str] = Header(None, alias="Accept-Encoding"),
+    usuario=Depends(permission_required("ver_reportes"))
+):
+    """
+    📥 Descarga el archivo de un reporte terminado. Se envía tal como está guardado
+    (gzip) si el cliente lo acepta; si no, se descomprime por partes.
+    Solo para quien lo creó o un admin.
+    """
+    job = await report_jobs.obtener(id_job, usuario.id_usuario, usuario.rol == UserRole.ADMIN)
+    if not job:
+        return APIResponse.from_enum(ResponseCode.NOT_FOUND, detail="No se encontró el reporte o ya expiró.")
+    if job.estado != ReportJobStatus.terminado:
+        return APIResponse.from_enum(
+            ResponseCode.CONFLICT,
+            detail=f"El reporte no está listo para descargar (estado: {job.estado.value})."
+        )
+
+    if not job.ruta or not os.path.exists(job.ruta):
+        return APIResponse.from_enum(ResponseCode.NOT_FOUND, detail="No se encontró el reporte o ya expiró.")
+
+    headers = {"Content-Disposition": f'attachment; filename="reporte_{job.tipo.value}.{job.formato.value}"'}
+    if accept_encoding and "gzip" in accept_encoding:
+        headers["Content-Encoding"] = "gzip"
+        return FileResponse(job.ruta, media_type=MEDIA_TYPES[job.formato], headers=headers)
+    return StreamingResponse(leer_gzip(job.ruta), media_type=MEDIA_TYPES[job.formato], headers=headers)
@@ -1,13 +1,18 @@
-import asyncio
-from fastapi import APIRouter, BackgroundTasks, Depends, status
+import json
+from typing import List, Optional, Union
+from fastapi import APIRouter, Depends, Header, Request, status
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.db.database import get_db  # Tu función de dependencia para obtener la sesión
+from app.core.config import settings
+from app.db.database import async_session, get_db  # Tu función de dependencia para obtener la sesión
 from app.dependencies.auth import permission_required
 from app.schemas.api_response import APIResponse
-from app.schemas.sales import SaleCreateRequest, SaleCreateResponse
-from app.services.mail_service import MailService
+from app.schemas.sales import SaleCreateRequest, SaleCreateResponse, SaleSyncRecord, SaleSyncResult
 from app.services.sale_service import SaleService
 from app.core.enums.responses import ResponseCode
+from app.core.idempotency import idempotency_store
+from app.utils.ndjson import NDJSON_MEDIA_TYPE, leer_lineas_ndjson
 
 router = APIRouter(
     prefix="/sales",
@@ -17,15 +22,21 @@ router = APIRouter(
 @router.post("/", status_code=status.HTTP_201_CREATED)
 async def create_sale(
     sale_request: SaleCreateRequest,
-    background_tasks: BackgroundTasks,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     db: AsyncSession = Depends(get_db),
     usuario = Depends(permission_required("crear_venta"))
 ):
-    service = SaleService(db, usuario.id_usuario)
+    service = SaleService(db, usuario.id_usuario, usuario.nombre_usuario)
     try:
-        sale_result = await service.create_sale(sale_request)
+        # Un reintento con la misma Idempotency-Key devuelve la venta ya registrada
+        sale_result = await idempotency_store.ejecutar(
+            db,
+            f"sales:{usuario.id_usuario}:{idempotency_key}" if idempotency_key else None,
+            sale_request.model_dump_json(),
+            SaleCreateResponse,
+            lambda registrar: service.create_sale(sale_request, registrar)
+        )
 
-        # programar envío de correo en background
         product_names = ", ".join([
             p.barcode or p.product_code or "desconocido"
             for p in sale_request.products
@@ -44,4 +55,79 @@ async def create_sale(
         return APIResponse.from_enum(
             ResponseCode.SERVER_ERROR,
             detail=f"Ocurrió un error inesperado: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+
+@router.post("/bulk", status_code=status.HTTP_200_OK)
+async def sync_sales(
+    request: Request,
+    usuario = Depends(permission_required("crear_venta"))
+):
+    """
+    Sincroniza ventas registradas sin conexión.
+
+    El cuerpo es NDJSON: una venta por línea con la forma de SaleCreateRequest más
+    `client_id` (y opcionalmente `date`). Las ventas se procesan en lotes de
+    SALES_SYNC_CHUNK_SIZE por transacción y la respuesta es otro NDJSON con un
+    resultado por línea, que se va enviando a medida que se procesa cada lote.
+    Reenviar un `client_id` ya sincronizado devuelve el resultado original.
+    """
+    # Leer y validar todo el cuerpo antes de responder: mientras envía una
+    # StreamingResponse, Starlette consume los mensajes de la petición para detectar
+    # la desconexión del cliente, así que el cuerpo no se puede leer desde el generador
+    entradas: List[Union[SaleSyncRecord, SaleSyncResult]] = []
+    async for linea in leer_lineas_ndjson(request.stream()):
+        try:
+            entradas.append(SaleSyncRecord.model_validate_json(linea))
+        except ValidationError as e:
+            try:
+                client_id = json.loads(linea).get("client_id")
+            except (ValueError, AttributeError):
+                client_id = None
+            entradas.append(SaleSyncResult.from_enum(
+                ResponseCode.VALIDATION_ERROR,
+                client_id=str(client_id) if client_id is not None else None,
+                detail=e.errors()[0].get("msg", "Registro inválido") if e.errors() else "Registro inválido"
+            ))
+
+    async def procesar_lote(pendientes: List[Union[SaleSyncRecord, SaleSyncResult]]):
+        # Los errores de validación quedan en su posición: cada resultado del lote
+        # reemplaza a su registro para que la salida siga el orden de la entrada
+        lote = [e for e in pendientes if isinstance(e, SaleSyncRecord)]
+        if not lote:
+            return "".join(e.model_dump_json() + "\n" for e in pendientes)
+
+        async with async_session() as db:
+            try:
+                resultados = await SaleService(db, usuario.id_usuario, usuario.nombre_usuario).sincronizar_ventas(lote)
+            except Exception as e:
+                await db.rollback()
+                resultados = [
+                    SaleSyncResult.from_enum(
+                        ResponseCode.SERVER_ERROR,
+                        client_id=registro.client_id,
+                        detail=f"Ocurrió un error inesperado: {str(e)}"
+                    )
+                    for registro in lote
+                ]
+        resultados = iter(resultados)
+        return "".join(
+            (next(resultados) if isinstance(e, SaleSyncRecord) else e).model_dump_json() + "\n"
+            for e in pendientes
+        )
+
+    async def procesar():
+        pendientes: List[Union[SaleSyncRecord, SaleSyncResult]] = []
+        registros = 0
+        for entrada in entradas:
+            pendientes.append(entrada)
+            if isinstance(entrada, SaleSyncRecord):
+                registros += 1
+            if registros >= settings.SALES_SYNC_CHUNK_SIZE:
+                yield await procesar_lote(pendientes)
+                pendientes, registros = [], 0
+
+        if pendientes:
+            yield await procesar_lote(pendientes)
+
+    return StreamingResponse(procesar(), media_type=NDJSON_MEDIA_TYPE)
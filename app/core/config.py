@@ -34,6 +34,91 @@ class Settings(BaseSettings):
 
     SENDGRID_API_KEY: str
 
+    # Outbox de correo: transporte (sendgrid | smtp | memory), workers y reintentos
+    MAIL_TRANSPORT: str = "sendgrid"
+    MAIL_OUTBOX_WORKERS: int = 2
+    MAIL_OUTBOX_MAX_SIZE: int = 1000
+    MAIL_OUTBOX_BATCH_SIZE: int = 50
+    MAIL_MAX_RETRIES: int = 5
+    MAIL_RETRY_BASE_SECONDS: float = 2.0
+
+    # Pool compartido para bcrypt (0 = número de núcleos); Retry-After del 503 al saturarse
+    HASHING_WORKERS: int = 0
+    HASHING_MAX_PENDING: int = 256
+    HASHING_RETRY_AFTER_SECONDS: int = 2
+
+    # Idempotencia de POST /sales y /purchases (header Idempotency-Key)
+    IDEMPOTENCY_TTL_SECONDS: int = 86400
+
+    # Sincronización de ventas sin conexión: ventas por transacción
+    SALES_SYNC_CHUNK_SIZE: int = 200
+
+    # Alertas de stock bajo agrupadas
+    STOCK_ALERT_WINDOW_SECONDS: int = 60
+    STOCK_ALERT_RECIPIENTS_TTL_SECONDS: int = 300
+    STOCK_ALERT_MAX_CONCURRENT_SENDS: int = 2
+
+    # Caché de sesiones y escritura diferida de ultima_actividad
+    SESSION_CACHE_TTL_SECONDS: int = 30
+    SESSION_CACHE_MAX_ENTRIES: int = 10000
+    SESSION_ACTIVITY_FLUSH_SECONDS: int = 5
+
+    # Caché de permisos por usuario
+    PERMISSION_CACHE_TTL_SECONDS: int = 300
+    PERMISSION_CACHE_MAX_ENTRIES: int = 10000
+
+    # Elección de líder del scheduler (auto | postgres | file)
+    SCHEDULER_LOCK_BACKEND: str = "auto"
+    SCHEDULER_LOCK_FILE: str = ""
+    SCHEDULER_LEADER_CHECK_SECONDS: int = 15
+
+    # Exportación de reportes por partes (format=csv|ndjson): filas por lectura del cursor
+    REPORT_STREAM_BATCH_SIZE: int = 1000
+
+    # Caché de resultados de reportes (por proceso; el TTL acota cambios hechos en otros workers)
+    REPORT_CACHE_TTL_SECONDS: int = 60
+    REPORT_CACHE_MAX_ENTRIES: int = 256
+    REPORT_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+
+    # Reportes en segundo plano (POST /reportes/jobs); REPORT_JOBS_DIR vacío = directorio temporal.
+    # Con varios workers o servidores, REPORT_JOBS_DIR debe ser un directorio compartido
+    REPORT_JOBS_WORKERS: int = 2
+    REPORT_JOBS_MAX_PENDING: int = 100
+    REPORT_JOBS_TTL_SECONDS: int = 3600
+    REPORT_JOBS_DIR: str = ""
+
+    # Escritura en lote del historial de acciones (@log_action)
+    AUDIT_QUEUE_MAX_SIZE: int = 10000
+    AUDIT_BATCH_SIZE: int = 200
+    AUDIT_FLUSH_SECONDS: float = 1.0
+
+    # Historial de acciones particionado por mes: los meses más viejos que la retención
+    # se mueven a archivos gzip JSONL en HISTORIAL_ARCHIVE_DIR
+    HISTORIAL_RETENTION_MONTHS: int = 12
+    HISTORIAL_PARTITIONS_AHEAD: int = 2
+    HISTORIAL_ARCHIVE_DIR: str = "archivo_historial"
+
+    # Instrumentación SQL: sentencias por petición en el log de LoggingMiddleware
+    SQL_ECHO: bool = False
+    SQL_SLOW_QUERY_MS: float = 200.0
+    SQL_N_PLUS_ONE_THRESHOLD: int = 5
+
+    # Pool de conexiones del engine principal (el de reportes usa REPORT_JOBS_WORKERS, sin overflow)
+    DB_POOL_SIZE: int = 50
+    DB_MAX_OVERFLOW: int = 50
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = False
+    DB_POOL_WARMUP: bool = True                 # abrir DB_POOL_SIZE conexiones al iniciar
+    DB_SSL: bool = True
+    DB_STATEMENT_CACHE_SIZE: int = 100          # sentencias preparadas por conexión (0 = sin caché)
+
+    # Réplica de lectura opcional (vacío = todo a la primaria); mismos pools que la primaria:
+    # DB_POOL_SIZE para las peticiones y REPORT_JOBS_WORKERS para los jobs de reportes
+    DATABASE_REPLICA_URL: str = ""
+    DB_REPLICA_MAX_LAG_SECONDS: float = 30.0
+    DB_REPLICA_CHECK_SECONDS: float = 10.0
+
     class Config:
         env_file = ".env"   # indica de dónde leer variables
 
@@ -0,0 +1,7 @@
+from enum import Enum
+
+class SummaryGroupBy(str, Enum):
+    dia = "dia"               # Un renglón por día
+    producto = "producto"     # Un renglón por producto
+    usuario = "usuario"       # Un renglón por vendedor
+    categoria = "categoria"   # Un renglón por categoría
@@ -0,0 +1,7 @@
+from enum import Enum
+
+class ReportJobStatus(str, Enum):
+    pendiente = "pendiente"     # En cola, esperando un worker
+    en_proceso = "en_proceso"   # Generándose
+    terminado = "terminado"     # Archivo listo para descargar
+    error = "error"             # Falló; ver el campo error
@@ -0,0 +1,6 @@
+from enum import Enum
+
+class ReportFormat(str, Enum):
+    json = "json"       # Respuesta APIResponse completa (por defecto)
+    csv = "csv"         # Archivo CSV enviado por partes
+    ndjson = "ndjson"   # Un objeto JSON por línea, enviado por partes
@@ -0,0 +1,6 @@
+from enum import Enum
+
+class TotalMode(str, Enum):
+    ninguno = "ninguno"     # Sin total (la opción más rápida)
+    estimado = "estimado"   # Estimación del planificador de Postgres, sin recorrer la tabla
+    exacto = "exacto"       # COUNT(*) exacto sobre los filtros
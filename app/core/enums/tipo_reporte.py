@@ -0,0 +1,5 @@
+from enum import Enum
+
+class ReportType(str, Enum):
+    ventas = "ventas"           # Reporte de ventas (filtros de ReporteVentasRequest)
+    inventario = "inventario"   # Reporte de inventario (filtros de ReporteInventarioRequest)
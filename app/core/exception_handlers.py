@@ -5,9 +5,11 @@ from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
 from slowapi.errors import RateLimitExceeded
 
+from app.core.config import settings
 from app.schemas.api_response import APIResponse
 from app.core.enums.responses import ResponseCode
 from app.dependencies.auth import AdminSessionError, PermissionDeniedError, UserSessionError  
+from app.core.security import HashingBusyError
 
 logger = logging.getLogger(__name__)
 
@@ -99,6 +101,18 @@ async def permission_exception_handler(request: Request, exc: PermissionDeniedEr
     )
 
 
+async def hashing_busy_exception_handler(request: Request, exc: HashingBusyError):
+    """Maneja la saturación del pool de hashing de contraseñas."""
+    return JSONResponse(
+        status_code=503,
+        content=APIResponse.from_enum(
+            ResponseCode.SERVER_ERROR,
+            detail=exc.detail
+        ).model_dump(),
+        headers={"Retry-After": str(settings.HASHING_RETRY_AFTER_SECONDS)}
+    )
+
+
 async def value_error_exception_handler(request: Request, exc: ValueError):
     """Maneja ValueError y devuelve un APIResponse estándar."""
     return JSONResponse(
@@ -123,3 +137,4 @@ def register_exception_handlers(app: FastAPI):
     app.add_exception_handler(UserSessionError, user_session_exception_handler)
     app.add_exception_handler(ValueError, value_error_exception_handler)
     app.add_exception_handler(PermissionDeniedError, permission_exception_handler)
+    app.add_exception_handler(HashingBusyError, hashing_busy_exception_handler)
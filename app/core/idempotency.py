@@ -0,0 +1,120 @@
+# app/core/idempotency.py
+import hashlib
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Type
+
+from pydantic import BaseModel
+from sqlalchemy import delete, select, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.idempotency_keys import ClaveIdempotencia
+
+# Lock de transacción por clave: se libera solo al confirmar o revertir
+LOCK_CLAVE = text("SELECT pg_advisory_xact_lock(hashtextextended(:clave, 0))")
+
+
+class IdempotencyStore:
+    """
+    Resultados por clave de idempotencia (header Idempotency-Key) en la tabla
+    claves_idempotencia, compartidos por todos los workers.
+
+    - La clave se inserta en la misma transacción que la operación (ver `registrar`
+      en `ejecutar`): o se confirman las dos o ninguna.
+    - Un reintento con la misma clave devuelve el resultado guardado sin volver a ejecutar.
+    - En PostgreSQL, las peticiones concurrentes con la misma clave esperan a la primera
+      con un advisory lock de transacción; sin él, la restricción única sobre `clave`
+      rechaza la segunda inserción y se devuelve el resultado de la primera.
+    - Las claves expiran tras `ttl_seconds` (las purga `purgar_registros_vencidos`).
+    - Solo se guardan resultados exitosos: si la primera ejecución falla, la siguiente
+      petición con esa clave vuelve a intentarlo.
+    """
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+
+    @staticmethod
+    def huella(payload: str) -> str:
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    async def _bloquear(db: AsyncSession, clave: str):
+        conn = await db.connection()
+        if conn.dialect.name == "postgresql":
+            await db.execute(LOCK_CLAVE, {"clave": clave})
+
+    async def buscar(self, db: AsyncSession, claves: List[str]) -> Dict[str, ClaveIdempotencia]:
+        """
+        Claves vigentes de `claves` en una sola consulta. Las vencidas se borran en la
+        misma transacción para que la operación pueda volver a registrar la clave.
+        """
+        filas = (await db.execute(
+            select(ClaveIdempotencia).where(ClaveIdempotencia.clave.in_(claves))
+        )).scalars().all()
+        ahora = datetime.utcnow()
+        vencidas = [fila.id for fila in filas if fila.expires_at <= ahora]
+        if vencidas:
+            await db.execute(
+                delete(ClaveIdempotencia)
+                .where(ClaveIdempotencia.id.in_(vencidas))
+                .execution_options(synchronize_session=False)
+            )
+        return {fila.clave: fila for fila in filas if fila.expires_at > ahora}
+
+    def resultado(self, fila: ClaveIdempotencia, payload: str) -> Any:
+        """Resultado guardado; ValueError si la clave se usó con otra solicitud."""
+        if fila.huella != self.huella(payload):
+            raise ValueError("La clave de idempotencia ya fue usada con una solicitud distinta.")
+        return fila.resultado
+
+    def agregar(self, db: AsyncSession, clave: str, payload: str, resultado: BaseModel) -> ClaveIdempotencia:
+        """Agrega la clave a la transacción en curso de `db`; se inserta con el siguiente flush."""
+        fila = ClaveIdempotencia(
+            clave=clave,
+            huella=self.huella(payload),
+            resultado=resultado.model_dump(mode="json"),
+            expires_at=datetime.utcnow() + timedelta(seconds=self.ttl_seconds)
+        )
+        db.add(fila)
+        return fila
+
+    async def _buscar(self, db: AsyncSession, clave: str, payload: str) -> Optional[Any]:
+        fila = (await self.buscar(db, [clave])).get(clave)
+        return self.resultado(fila, payload) if fila is not None else None
+
+    async def ejecutar(
+        self,
+        db: AsyncSession,
+        clave: Optional[str],
+        payload: str,
+        modelo: Type[BaseModel],
+        funcion: Callable[[Optional[Callable[[BaseModel], None]]], Awaitable[Any]]
+    ) -> Any:
+        """
+        Ejecuta `funcion(registrar)` una sola vez por clave. `funcion` debe llamar a
+        `registrar(resultado)` antes de confirmar su transacción en `db`.
+        Si `clave` es None se ejecuta sin más (`registrar` es None).
+        `payload` identifica el contenido de la solicitud para detectar claves reutilizadas;
+        `modelo` reconstruye el resultado guardado.
+        """
+        if not clave:
+            return await funcion(None)
+
+        await self._bloquear(db, clave)
+        guardado = await self._buscar(db, clave, payload)
+        if guardado is not None:
+            return modelo.model_validate(guardado)
+
+        try:
+            return await funcion(lambda resultado: self.agregar(db, clave, payload, resultado))
+        except IntegrityError:
+            # Otra petición con la misma clave se confirmó primero
+            await db.rollback()
+            guardado = await self._buscar(db, clave, payload)
+            if guardado is None:
+                raise
+            return modelo.model_validate(guardado)
+
+
+idempotency_store = IdempotencyStore(ttl_seconds=settings.IDEMPOTENCY_TTL_SECONDS)
@@ -0,0 +1,109 @@
+# app/core/permission_cache.py
+import time
+from collections import OrderedDict
+from typing import Dict, FrozenSet
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.associations.usuario_permisos import usuario_permisos
+from app.models.permiso import Permiso
+
+
+class PermissionCache:
+    """
+    Caché en memoria de los permisos de cada usuario como frozenset de nombres.
+
+    - Los permisos de un usuario se consultan una vez; después la validación es
+      solo pertenencia a un conjunto.
+    - Invalidación con contador: cada invalidación lo incrementa y, si hay cargas en
+      curso para ese usuario, anota en qué valor ocurrió. Una carga que empezó antes
+      de una invalidación no se guarda, aunque termine después. Esas anotaciones solo
+      viven mientras el usuario tiene cargas en curso, así que no crecen sin límite.
+    - Los cambios hechos en otros workers llegan por los avisos de `session_cache`
+      (NOTIFY); las entradas viven `ttl_seconds` (acota cambios si la escucha se cae)
+      y se limitan a `max_entries` (LRU).
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entradas: "OrderedDict[int, tuple[float, FrozenSet[str]]]" = OrderedDict()
+        self._contador = 0
+        self._invalidado_en: Dict[int, int] = {}   # solo usuarios con cargas en curso
+        self._cargas_en_curso: Dict[int, int] = {}
+        self._version_global = 0
+        self.aciertos = 0
+        self.fallos = 0
+
+    def _vigente(self, id_usuario: int):
+        entrada = self._entradas.get(id_usuario)
+        if entrada is None:
+            return None
+        expira, permisos = entrada
+        if expira <= time.monotonic():
+            del self._entradas[id_usuario]
+            return None
+        self._entradas.move_to_end(id_usuario)
+        return permisos
+
+    async def obtener(self, id_usuario: int, db: AsyncSession) -> FrozenSet[str]:
+        """Retorna los nombres de permisos del usuario, consultando la base de datos solo si no están en caché."""
+        permisos = self._vigente(id_usuario)
+        if permisos is not None:
+            self.aciertos += 1
+            return permisos
+
+        self.fallos += 1
+        version_global = self._version_global
+        inicio = self._contador
+        self._cargas_en_curso[id_usuario] = self._cargas_en_curso.get(id_usuario, 0) + 1
+        try:
+            result = await db.execute(
+                select(Permiso.nombre)
+                .join(usuario_permisos, usuario_permisos.c.id_permiso == Permiso.id_permiso)
+                .where(usuario_permisos.c.id_usuario == id_usuario)
+            )
+            permisos = frozenset(result.scalars().all())
+
+            # Solo guardar si nadie invalidó mientras se consultaba
+            if version_global == self._version_global and self._invalidado_en.get(id_usuario, inicio) <= inicio:
+                self._entradas[id_usuario] = (time.monotonic() + self.ttl_seconds, permisos)
+                self._entradas.move_to_end(id_usuario)
+                while len(self._entradas) > self.max_entries:
+                    self._entradas.popitem(last=False)
+            return permisos
+        finally:
+            restantes = self._cargas_en_curso[id_usuario] - 1
+            if restantes:
+                self._cargas_en_curso[id_usuario] = restantes
+            else:
+                del self._cargas_en_curso[id_usuario]
+                self._invalidado_en.pop(id_usuario, None)
+
+    def invalidar_usuario(self, id_usuario: int):
+        self._contador += 1
+        if id_usuario in self._cargas_en_curso:
+            self._invalidado_en[id_usuario] = self._contador
+        self._entradas.pop(id_usuario, None)
+
+    def invalidar_todo(self):
+        """Para cambios que afectan a varios usuarios (roles o catálogo de permisos)."""
+        self._version_global += 1
+        self._entradas.clear()
+
+    def metricas(self) -> dict:
+        total = self.aciertos + self.fallos
+        return {
+            "entradas": len(self._entradas),
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "tasa_aciertos": round(self.aciertos / total, 4) if total else 0.0,
+        }
+
+
+permission_cache = PermissionCache(
+    ttl_seconds=settings.PERMISSION_CACHE_TTL_SECONDS,
+    max_entries=settings.PERMISSION_CACHE_MAX_ENTRIES
+)
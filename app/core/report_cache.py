@@ -0,0 +1,187 @@
+# app/core/report_cache.py
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Awaitable, Callable, FrozenSet, Optional, Tuple, TypeVar
+
+from pydantic import BaseModel
+
+from app.core.config import settings
+
+REPORTE_VENTAS = "ventas"
+REPORTE_INVENTARIO = "inventario"
+
+T = TypeVar("T", bound=BaseModel)
+
+
+@dataclass(frozen=True)
+class AlcanceReporte:
+    """
+    Filtros normalizados de un reporte; es a la vez la llave de la caché.
+    Las listas se guardan como frozenset (sin orden ni duplicados) y una lista
+    vacía equivale a no filtrar, igual que en las consultas.
+    """
+    reporte: str
+    usuarios: Optional[FrozenSet[str]] = None
+    categorias: Optional[FrozenSet[str]] = None
+    productos: Optional[FrozenSet[str]] = None
+    inicio: Optional[datetime] = None
+    fin: Optional[datetime] = None
+    tipo_inventario: Optional[str] = None
+
+    @staticmethod
+    def conjunto(valores) -> Optional[FrozenSet[str]]:
+        return frozenset(valores) if valores else None
+
+    def afectado_por(self, cambio: "CambioReporte") -> bool:
+        if self.reporte not in cambio.reportes:
+            return False
+        if cambio.fecha is not None:
+            try:
+                if (self.inicio and cambio.fecha < self.inicio) or (self.fin and cambio.fecha > self.fin):
+                    return False
+            except TypeError:
+                pass  # fechas con y sin zona horaria: se considera dentro del rango
+        if self.usuarios is not None and cambio.usuario is not None and cambio.usuario not in self.usuarios:
+            return False
+        # Un mismo producto debe pasar los filtros de producto y de categoría
+        return any(
+            (self.productos is None or nombre in self.productos)
+            and (self.categorias is None or categoria in self.categorias)
+            for nombre, categoria in cambio.productos
+        )
+
+
+@dataclass(frozen=True)
+class CambioReporte:
+    """
+    Cambio en los datos que puede alterar reportes ya calculados.
+    `fecha` y `usuario` en None significan "cualquiera" (p. ej. al editar un producto).
+    """
+    reportes: FrozenSet[str]
+    productos: Tuple[Tuple[str, Optional[str]], ...]   # (nombre, categoría)
+    fecha: Optional[datetime] = None
+    usuario: Optional[str] = None
+
+    @classmethod
+    def de_productos(cls, reportes, productos, fecha: Optional[datetime] = None, usuario: Optional[str] = None):
+        """Construye el cambio a partir de objetos Product con la categoría ya cargada."""
+        return cls(
+            reportes=frozenset(reportes),
+            productos=tuple({(p.name, p.category.name if p.category else None) for p in productos}),
+            fecha=fecha,
+            usuario=usuario
+        )
+
+
+class ReportCache:
+    """
+    Caché en memoria de reportes ya calculados, con llave en los filtros normalizados.
+
+    - LRU con TTL, límite de entradas y límite de memoria (tamaño estimado como el
+      largo del JSON del reporte).
+    - Invalidación precisa: cada venta, compra o cambio de producto descarta solo
+      las entradas cuyos filtros (fechas, usuarios, categorías, productos) lo incluyen.
+    - Un cálculo que empezó antes de un cambio que lo afecta no se guarda, aunque
+      termine después.
+    - Los cambios hechos en otros procesos no se ven: el TTL acota ese desfase.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int, max_bytes: int, historial_cambios: int = 1000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entradas: "OrderedDict[AlcanceReporte, tuple[float, int, BaseModel]]" = OrderedDict()
+        self._bytes = 0
+        # Cambios recientes (generación, cambio) para validar cálculos en curso
+        self._generacion = 0
+        self._cambios: deque = deque(maxlen=historial_cambios)
+        self.aciertos = 0
+        self.fallos = 0
+        self.invalidadas = 0
+        self.expulsadas = 0
+
+    def _quitar(self, alcance: AlcanceReporte):
+        _, tamano, _ = self._entradas.pop(alcance)
+        self._bytes -= tamano
+
+    def _vigente(self, alcance: AlcanceReporte):
+        entrada = self._entradas.get(alcance)
+        if entrada is None:
+            return None
+        if entrada[0] <= time.monotonic():
+            self._quitar(alcance)
+            return None
+        self._entradas.move_to_end(alcance)
+        return entrada[2]
+
+    def _cambio_desde(self, generacion: int, alcance: AlcanceReporte) -> bool:
+        """True si algún cambio posterior a `generacion` afecta al alcance (o ya no se puede saber)."""
+        if generacion == self._generacion:
+            return False
+        if not self._cambios or self._cambios[0][0] > generacion + 1:
+            return True  # el historial ya no cubre el cálculo: no arriesgar
+        return any(g > generacion and (c is None or alcance.afectado_por(c)) for g, c in self._cambios)
+
+    def _guardar(self, alcance: AlcanceReporte, valor: BaseModel):
+        tamano = len(valor.model_dump_json())
+        if tamano > self.max_bytes:
+            return
+        if alcance in self._entradas:
+            self._quitar(alcance)
+        self._entradas[alcance] = (time.monotonic() + self.ttl_seconds, tamano, valor)
+        self._bytes += tamano
+        while len(self._entradas) > self.max_entries or self._bytes > self.max_bytes:
+            self._quitar(next(iter(self._entradas)))
+            self.expulsadas += 1
+
+    async def obtener_o_calcular(self, alcance: AlcanceReporte, calcular: Callable[[], Awaitable[T]]) -> T:
+        """Retorna el reporte en caché o lo calcula con `calcular` y lo guarda."""
+        valor = self._vigente(alcance)
+        if valor is not None:
+            self.aciertos += 1
+            return valor
+
+        self.fallos += 1
+        generacion = self._generacion
+        valor = await calcular()
+        if not self._cambio_desde(generacion, alcance):
+            self._guardar(alcance, valor)
+        return valor
+
+    def invalidar(self, *cambios: CambioReporte):
+        """Descarta las entradas afectadas por los cambios. Llamar después del commit."""
+        for cambio in cambios:
+            self._generacion += 1
+            self._cambios.append((self._generacion, cambio))
+            for alcance in [a for a in self._entradas if a.afectado_por(cambio)]:
+                self._quitar(alcance)
+                self.invalidadas += 1
+
+    def invalidar_todo(self):
+        """Para cambios que afectan a cualquier reporte (p. ej. renombrar una categoría o un usuario)."""
+        self._generacion += 1
+        self._cambios.append((self._generacion, None))
+        self.invalidadas += len(self._entradas)
+        self._entradas.clear()
+        self._bytes = 0
+
+    def metricas(self) -> dict:
+        total = self.aciertos + self.fallos
+        return {
+            "entradas": len(self._entradas),
+            "bytes": self._bytes,
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "tasa_aciertos": round(self.aciertos / total, 4) if total else 0.0,
+            "invalidadas": self.invalidadas,
+            "expulsadas": self.expulsadas,
+        }
+
+
+report_cache = ReportCache(
+    ttl_seconds=settings.REPORT_CACHE_TTL_SECONDS,
+    max_entries=settings.REPORT_CACHE_MAX_ENTRIES,
+    max_bytes=settings.REPORT_CACHE_MAX_BYTES
+)
@@ -1,7 +1,9 @@
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+import os
 import secrets
+import time
 from fastapi import Request
 from jose import jwt, JWTError
 from passlib.context import CryptContext
@@ -12,16 +14,93 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
 
-async def hash_password_async(password: str) -> str:
-    loop = asyncio.get_running_loop()
-    with ThreadPoolExecutor() as pool:
-        # Ejecuta la función de hashing en un hilo separado
-        hashed = await loop.run_in_executor(pool, hash_password, password)
-    return hashed
-
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+
+class HashingBusyError(Exception):
+    def __init__(self, detail: str):
+        self.detail = detail
+
+
+class HashingExecutor:
+    """
+    Pool de hilos compartido por toda la aplicación para bcrypt.
+
+    bcrypt libera el GIL, así que un pool de hilos del tamaño de los núcleos basta
+    para no bloquear el event loop. `max_pendientes` acota cuántos hashes pueden
+    estar en cola o ejecutándose a la vez; por encima se rechaza con HashingBusyError.
+    """
+
+    def __init__(self, workers: int, max_pendientes: int):
+        self.workers = workers
+        self.max_pendientes = max_pendientes
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hashing")
+        self._pendientes = 0
+        self._total = 0
+        self._rechazados = 0
+        self._tiempo_total = 0.0
+        self._tiempo_max = 0.0
+        self._espera_total = 0.0
+
+    async def _ejecutar(self, funcion, *args):
+        if self._pendientes >= self.max_pendientes:
+            self._rechazados += 1
+            raise HashingBusyError("Servidor ocupado procesando contraseñas, intenta nuevamente.")
+
+        encolado = time.perf_counter()
+
+        def medir():
+            inicio = time.perf_counter()
+            resultado = funcion(*args)
+            return resultado, inicio - encolado, time.perf_counter() - inicio
+
+        self._pendientes += 1
+        try:
+            loop = asyncio.get_running_loop()
+            resultado, espera, duracion = await loop.run_in_executor(self._executor, medir)
+        finally:
+            self._pendientes -= 1
+
+        self._total += 1
+        self._espera_total += espera
+        self._tiempo_total += duracion
+        self._tiempo_max = max(self._tiempo_max, duracion)
+        return resultado
+
+    async def hash(self, password: str) -> str:
+        return await self._ejecutar(hash_password, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._ejecutar(verify_password, plain_password, hashed_password)
+
+    def metricas(self) -> dict:
+        return {
+            "workers": self.workers,
+            "en_cola": self._pendientes,
+            "max_en_cola": self.max_pendientes,
+            "total": self._total,
+            "rechazados": self._rechazados,
+            "tiempo_promedio_ms": round(self._tiempo_total / self._total * 1000, 2) if self._total else 0.0,
+            "tiempo_max_ms": round(self._tiempo_max * 1000, 2),
+            "espera_promedio_ms": round(self._espera_total / self._total * 1000, 2) if self._total else 0.0,
+        }
+
+    def cerrar(self):
+        self._executor.shutdown(wait=True)
+
+
+hashing_executor = HashingExecutor(
+    workers=settings.HASHING_WORKERS or os.cpu_count() or 1,
+    max_pendientes=settings.HASHING_MAX_PENDING
+)
+
+async def hash_password_async(password: str) -> str:
+    return await hashing_executor.hash(password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await hashing_executor.verify(plain_password, hashed_password)
+
 def create_session_token() -> str:
     return secrets.token_urlsafe(64)
     
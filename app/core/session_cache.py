@@ -0,0 +1,260 @@
+# app/core/session_cache.py
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import bindparam, text, update
+
+from app.core.config import settings
+from app.core.permission_cache import permission_cache
+from app.db.database import async_session, engine
+from app.models.sesion import Sesion
+from app.models.user import Usuario
+
+logger = logging.getLogger(__name__)
+
+# Canal de PostgreSQL por el que los workers se avisan de sesiones revocadas
+CANAL_REVOCACIONES = "sesiones_revocadas"
+NOTIFICAR = text("SELECT pg_notify(:canal, :payload)")
+# Ids de sesión por aviso: el payload de NOTIFY admite menos de 8000 bytes
+SESIONES_POR_AVISO = 500
+
+
+@dataclass
+class SesionCacheada:
+    id_sesion: int
+    id_usuario: int
+    ultima_actividad: datetime
+    expiracion_inactividad: timedelta
+    usuario: Usuario
+    expira: float
+
+    def expirada(self, ahora: datetime) -> bool:
+        return self.ultima_actividad + self.expiracion_inactividad < ahora
+
+
+def copiar_usuario(usuario: Usuario) -> Usuario:
+    """Copia solo las columnas del usuario en una instancia sin sesión, segura de compartir entre peticiones."""
+    return Usuario(**{col.key: getattr(usuario, col.key) for col in Usuario.__table__.columns})
+
+
+class SessionCache:
+    """
+    Caché en memoria de sesiones válidas por token (sesión + usuario).
+
+    - Las entradas viven `ttl_seconds` y se limitan a `max_entries` (LRU).
+    - `ultima_actividad` se actualiza en memoria y se escribe en la base de datos
+      en lotes cada `flush_interval` segundos (un solo UPDATE por lote).
+    - Cierre de sesión, expiración y cambios de usuario invalidan las entradas al momento.
+      La caché es por proceso: con PostgreSQL (`engine`), `publicar` avisa a los demás
+      workers con NOTIFY en la misma transacción del cambio y cada worker escucha el
+      canal con una conexión dedicada. Si esa conexión se cae, la caché se vacía al
+      reconectar (pudo perder avisos) y mientras tanto el TTL acota cuánto tarda en verse el cambio.
+    - Los mismos avisos invalidan `permission_cache` en cada worker: los permisos del
+      usuario afectado, o todos si cambió el catálogo de roles y permisos.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int, flush_interval: float, engine=None):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.flush_interval = flush_interval
+        self.engine = engine
+        self._entradas: "OrderedDict[str, SesionCacheada]" = OrderedDict()
+        self._actividad: Dict[int, datetime] = {}
+        self._tarea: Optional[asyncio.Task] = None
+        self._escucha: Optional[asyncio.Task] = None
+        self.escuchando = False
+        self.aciertos = 0
+        self.fallos = 0
+        self.avisos_recibidos = 0
+
+    # ------------------------------
+    # Lectura y escritura de entradas
+    # ------------------------------
+    def obtener(self, token: str) -> Optional[SesionCacheada]:
+        entrada = self._entradas.get(token)
+        if entrada is None or entrada.expira <= time.monotonic():
+            if entrada is not None:
+                del self._entradas[token]
+            self.fallos += 1
+            return None
+        self._entradas.move_to_end(token)
+        self.aciertos += 1
+        return entrada
+
+    def guardar(self, token: str, sesion: Sesion, usuario: Usuario) -> SesionCacheada:
+        # Si hay actividad pendiente de escribir, es más reciente que la leída de la base de datos
+        ultima_actividad = max(sesion.ultima_actividad, self._actividad.get(sesion.id, sesion.ultima_actividad))
+        entrada = SesionCacheada(
+            id_sesion=sesion.id,
+            id_usuario=sesion.id_usuario,
+            ultima_actividad=ultima_actividad,
+            expiracion_inactividad=sesion.expiracion_inactividad,
+            usuario=copiar_usuario(usuario),
+            expira=time.monotonic() + self.ttl_seconds
+        )
+        self._entradas[token] = entrada
+        self._entradas.move_to_end(token)
+        while len(self._entradas) > self.max_entries:
+            self._entradas.popitem(last=False)
+        return entrada
+
+    def registrar_actividad(self, entrada: SesionCacheada, ahora: datetime):
+        entrada.ultima_actividad = ahora
+        self._actividad[entrada.id_sesion] = ahora
+
+    # ------------------------------
+    # Invalidación
+    # ------------------------------
+    def invalidar(self, token: str):
+        entrada = self._entradas.pop(token, None)
+        if entrada is not None:
+            self._actividad.pop(entrada.id_sesion, None)
+
+    def invalidar_usuario(self, id_usuario: int):
+        for token in [t for t, e in self._entradas.items() if e.id_usuario == id_usuario]:
+            self.invalidar(token)
+
+    def invalidar_sesiones(self, ids_sesion: Iterable[int]):
+        ids = set(ids_sesion)
+        for token in [t for t, e in self._entradas.items() if e.id_sesion in ids]:
+            self.invalidar(token)
+
+    def limpiar(self):
+        self._entradas.clear()
+
+    # ------------------------------
+    # Revocación entre workers (PostgreSQL LISTEN/NOTIFY)
+    # ------------------------------
+    async def publicar(self, db, sesiones: Iterable[int] = (), usuarios: Iterable[int] = (),
+                       todos_los_permisos: bool = False):
+        """
+        Avisa a todos los workers que descarten estas sesiones o todas las de estos usuarios
+        (con sus permisos en caché), o todos los permisos en caché si `todos_los_permisos`.
+        El NOTIFY va en la transacción de `db`: solo se entrega si el cambio se confirma.
+        """
+        if self.engine is None:
+            return
+        sesiones, usuarios = list(sesiones), list(usuarios)
+        avisos = [{"todos_los_permisos": True}] if todos_los_permisos else []
+        avisos += [{"usuarios": usuarios}] if usuarios else []
+        avisos += [
+            {"sesiones": sesiones[i:i + SESIONES_POR_AVISO]}
+            for i in range(0, len(sesiones), SESIONES_POR_AVISO)
+        ]
+        for aviso in avisos:
+            await db.execute(NOTIFICAR, {"canal": CANAL_REVOCACIONES, "payload": json.dumps(aviso)})
+
+    def _al_notificar(self, conexion, pid, canal, payload):
+        self.avisos_recibidos += 1
+        try:
+            aviso = json.loads(payload)
+        except ValueError:
+            logger.warning(f"Aviso de revocación inválido: {payload!r}")
+            return
+        self.invalidar_sesiones(aviso.get("sesiones", []))
+        for id_usuario in aviso.get("usuarios", []):
+            self.invalidar_usuario(id_usuario)
+            permission_cache.invalidar_usuario(id_usuario)
+        if aviso.get("todos_los_permisos"):
+            permission_cache.invalidar_todo()
+
+    async def _ciclo_escucha(self, intervalo: float = 5.0):
+        while True:
+            try:
+                # Conexión del pool retenida mientras el worker vive: LISTEN es por conexión
+                async with self.engine.connect() as conn:
+                    crudo = (await conn.get_raw_connection()).driver_connection
+                    await crudo.add_listener(CANAL_REVOCACIONES, self._al_notificar)
+                    # Los avisos enviados mientras no escuchábamos se perdieron
+                    self.limpiar()
+                    permission_cache.invalidar_todo()
+                    self.escuchando = True
+                    try:
+                        while True:
+                            await asyncio.sleep(intervalo)
+                            await crudo.execute("SELECT 1")  # detecta una conexión caída
+                    finally:
+                        self.escuchando = False
+                        if not crudo.is_closed():
+                            await crudo.remove_listener(CANAL_REVOCACIONES, self._al_notificar)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Escucha de revocaciones de sesión interrumpida, reintentando: {e}")
+            await asyncio.sleep(intervalo)
+
+    # ------------------------------
+    # Escritura diferida de ultima_actividad
+    # ------------------------------
+    async def flush(self) -> int:
+        """Escribe la actividad pendiente en un solo UPDATE. Retorna cuántas sesiones incluyó."""
+        if not self._actividad:
+            return 0
+        pendientes, self._actividad = self._actividad, {}
+        sesiones = Sesion.__table__
+        stmt = (
+            update(sesiones)
+            .where(sesiones.c.id == bindparam("b_id"))
+            .where(sesiones.c.estado.is_(True))
+            .where(sesiones.c.ultima_actividad < bindparam("b_actividad"))
+            .values(ultima_actividad=bindparam("b_actividad"))
+        )
+        try:
+            async with async_session() as db:
+                await db.execute(
+                    stmt,
+                    [{"b_id": id_sesion, "b_actividad": momento} for id_sesion, momento in pendientes.items()]
+                )
+                await db.commit()
+        except Exception as e:
+            # Se reintenta en el siguiente ciclo sin pisar actividad más reciente
+            for id_sesion, momento in pendientes.items():
+                self._actividad[id_sesion] = max(momento, self._actividad.get(id_sesion, momento))
+            logger.error(f"Error al guardar la última actividad de {len(pendientes)} sesiones: {e}")
+            return 0
+        return len(pendientes)
+
+    async def _ciclo_flush(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def iniciar(self):
+        if self._tarea is None or self._tarea.done():
+            self._tarea = asyncio.create_task(self._ciclo_flush())
+        if self.engine is not None and (self._escucha is None or self._escucha.done()):
+            self._escucha = asyncio.create_task(self._ciclo_escucha())
+
+    async def cerrar(self):
+        for tarea in (self._tarea, self._escucha):
+            if tarea:
+                tarea.cancel()
+                await asyncio.gather(tarea, return_exceptions=True)
+        self._tarea = self._escucha = None
+        await self.flush()
+
+    def metricas(self) -> dict:
+        total = self.aciertos + self.fallos
+        return {
+            "entradas": len(self._entradas),
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "tasa_aciertos": round(self.aciertos / total, 4) if total else 0.0,
+            "actividad_pendiente": len(self._actividad),
+            "escuchando_revocaciones": self.escuchando,
+            "avisos_recibidos": self.avisos_recibidos,
+        }
+
+
+session_cache = SessionCache(
+    ttl_seconds=settings.SESSION_CACHE_TTL_SECONDS,
+    max_entries=settings.SESSION_CACHE_MAX_ENTRIES,
+    flush_interval=settings.SESSION_ACTIVITY_FLUSH_SECONDS,
+    engine=engine if engine.dialect.name == "postgresql" else None
+)
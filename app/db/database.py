@@ -1,18 +1,23 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
 from app.core.config import settings
+from app.db.instrumentacion import instrumentar
+from app.db.pool import opciones_engine
+from app.db.replica import EstadoReplica, SelectorLectura
 from typing import AsyncGenerator
-import ssl
 
 # Usamos la URL desde .env
 DATABASE_URL = settings.DATABASE_URL
 
-ssl_context = ssl.create_default_context()
-ssl_args = {
-    "ssl": ssl_context
-}
-# Crear motor asíncrono
-engine = create_async_engine(DATABASE_URL, echo=True, future=True, pool_size=50, max_overflow=50, connect_args=ssl_args)
+# Crear motor asíncrono: pool, SSL y caché de sentencias según Settings (DB_*)
+# (SQL_ECHO imprime cada sentencia; para medir usar el log por petición)
+engine = create_async_engine(
+    DATABASE_URL,
+    echo=settings.SQL_ECHO,
+    future=True,
+    **opciones_engine(DATABASE_URL, settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW, "principal")
+)
+instrumentar(engine)
 # Crear session local
 async_session = sessionmaker(
     bind=engine,
@@ -20,6 +25,59 @@ async_session = sessionmaker(
     class_=AsyncSession
 )
 
+# Motor aparte para los jobs de reportes: su pool (una conexión por worker, sin
+# overflow) es el presupuesto de conexiones de los reportes en segundo plano
+reportes_engine = create_async_engine(
+    DATABASE_URL, future=True, **opciones_engine(DATABASE_URL, settings.REPORT_JOBS_WORKERS, 0, "reportes")
+)
+instrumentar(reportes_engine)
+reportes_session = sessionmaker(
+    bind=reportes_engine,
+    expire_on_commit=False,
+    class_=AsyncSession
+)
+
+# Réplica de lectura opcional (DATABASE_REPLICA_URL) para reportes y listados;
+# si no está configurada, está caída o atrasada, las lecturas van a la primaria
+replica_engine = None
+replica_session = None
+replica_reportes_engine = None
+replica_reportes_session = None
+estado_replica = None
+if settings.DATABASE_REPLICA_URL:
+    replica_engine = create_async_engine(
+        settings.DATABASE_REPLICA_URL,
+        future=True,
+        **opciones_engine(settings.DATABASE_REPLICA_URL, settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW, "replica")
+    )
+    instrumentar(replica_engine)
+    replica_session = sessionmaker(
+        bind=replica_engine,
+        expire_on_commit=False,
+        class_=AsyncSession
+    )
+    # Los jobs de reportes también tienen su propio pool en la réplica, con el mismo
+    # presupuesto que en la primaria (REPORT_JOBS_WORKERS, sin overflow)
+    replica_reportes_engine = create_async_engine(
+        settings.DATABASE_REPLICA_URL,
+        future=True,
+        **opciones_engine(settings.DATABASE_REPLICA_URL, settings.REPORT_JOBS_WORKERS, 0, "replica_reportes")
+    )
+    instrumentar(replica_reportes_engine)
+    replica_reportes_session = sessionmaker(
+        bind=replica_reportes_engine,
+        expire_on_commit=False,
+        class_=AsyncSession
+    )
+    estado_replica = EstadoReplica(
+        replica_engine,
+        max_retraso=settings.DB_REPLICA_MAX_LAG_SECONDS,
+        intervalo=settings.DB_REPLICA_CHECK_SECONDS
+    )
+
+sesion_lectura = SelectorLectura(async_session, replica_session, estado_replica)
+sesion_lectura_reportes = SelectorLectura(reportes_session, replica_reportes_session, estado_replica)
+
 # Base para modelos
 Base = declarative_base()
 
@@ -30,3 +88,8 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
             yield session
         finally:
             await session.close()
+
+# Dependency de solo lectura (réplica si está disponible): reportes y listados
+async def get_db_lectura() -> AsyncGenerator[AsyncSession, None]:
+    async with sesion_lectura() as session:
+        yield session
@@ -0,0 +1,143 @@
+# app/db/instrumentacion.py
+import heapq
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from sqlalchemy import event
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Sentencias más lentas que se reportan por petición
+MAX_LENTAS = 3
+# Largo máximo del SQL en logs y resúmenes
+MAX_LARGO_SQL = 300
+
+_PARAMETRO = re.compile(r"\$\d+|\?|%\(\w+\)s")
+_LISTA = re.compile(r"\((?:\s*\?\s*,)+\s*\?\s*\)")
+_ESPACIOS = re.compile(r"\s+")
+
+
+def forma_sentencia(sql: str) -> str:
+    """SQL sin valores: parámetros como `?` y listas IN colapsadas, para agrupar sentencias repetidas."""
+    sql = _PARAMETRO.sub("?", sql)
+    sql = _LISTA.sub("(?...)", sql)
+    return _ESPACIOS.sub(" ", sql).strip()
+
+
+def _recortar(sql: str) -> str:
+    return sql if len(sql) <= MAX_LARGO_SQL else sql[:MAX_LARGO_SQL] + "..."
+
+
+@dataclass
+class EstadisticasSQL:
+    """Sentencias ejecutadas durante una petición (o bloque medido)."""
+    padre: Optional["EstadisticasSQL"] = None     # bloque medido que contiene a este
+    consultas: int = 0
+    tiempo_ms: float = 0.0
+    lentas: List[Tuple[float, str]] = field(default_factory=list)   # heap de las MAX_LENTAS más lentas
+    formas: Counter = field(default_factory=Counter)
+
+    def registrar(self, sql: str, duracion_ms: float):
+        self.consultas += 1
+        self.tiempo_ms += duracion_ms
+        forma = forma_sentencia(sql)
+        self.formas[forma] += 1
+        if len(self.lentas) < MAX_LENTAS:
+            heapq.heappush(self.lentas, (duracion_ms, forma))
+        elif duracion_ms > self.lentas[0][0]:
+            heapq.heapreplace(self.lentas, (duracion_ms, forma))
+        if self.padre is not None:
+            self.padre.registrar(sql, duracion_ms)
+
+    def repetidas(self, minimo: Optional[int] = None) -> List[Tuple[str, int]]:
+        """Formas ejecutadas al menos `minimo` veces: candidatas a N+1."""
+        minimo = settings.SQL_N_PLUS_ONE_THRESHOLD if minimo is None else minimo
+        return [(forma, veces) for forma, veces in self.formas.most_common() if veces >= minimo]
+
+    def resumen(self) -> dict:
+        return {
+            "consultas": self.consultas,
+            "tiempo_ms": round(self.tiempo_ms, 2),
+            "mas_lentas": [
+                {"ms": round(ms, 2), "sql": _recortar(forma)} for ms, forma in sorted(self.lentas, reverse=True)
+            ],
+            "repetidas": [{"veces": veces, "sql": _recortar(forma)} for forma, veces in self.repetidas()],
+        }
+
+
+_actuales: ContextVar[Optional[EstadisticasSQL]] = ContextVar("estadisticas_sql", default=None)
+
+
+@contextmanager
+def medir_sql():
+    """
+    Registra en un EstadisticasSQL nuevo las sentencias ejecutadas dentro del bloque
+    (en la misma tarea o en las que se creen desde él). Los bloques anidados también
+    suman en el bloque que los contiene.
+    """
+    estadisticas = EstadisticasSQL(padre=_actuales.get())
+    token = _actuales.set(estadisticas)
+    try:
+        yield estadisticas
+    finally:
+        _actuales.reset(token)
+
+
+def _antes(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("inicio_sentencias", []).append(time.perf_counter())
+
+
+def _despues(conn, cursor, statement, parameters, context, executemany):
+    duracion_ms = (time.perf_counter() - conn.info["inicio_sentencias"].pop()) * 1000
+    estadisticas = _actuales.get()
+    if estadisticas is not None:
+        estadisticas.registrar(statement, duracion_ms)
+    if duracion_ms >= settings.SQL_SLOW_QUERY_MS:
+        logger.warning(f"Consulta lenta ({duracion_ms:.1f} ms): {_recortar(forma_sentencia(statement))}")
+
+
+def _error(contexto):
+    # La sentencia falló: after_cursor_execute no se llama, descartar su inicio
+    if contexto.connection is not None and contexto.connection.info.get("inicio_sentencias"):
+        contexto.connection.info["inicio_sentencias"].pop()
+
+
+def instrumentar(engine):
+    """Engancha la medición de sentencias a un engine (síncrono o asíncrono)."""
+    engine = getattr(engine, "sync_engine", engine)
+    if not event.contains(engine, "before_cursor_execute", _antes):
+        event.listen(engine, "before_cursor_execute", _antes)
+        event.listen(engine, "after_cursor_execute", _despues)
+        event.listen(engine, "handle_error", _error)
+    return engine
+
+
+@contextmanager
+def presupuesto_sql(max_consultas: int, max_repeticiones: Optional[int] = None):
+    """
+    Para pruebas: falla si el bloque ejecuta más de `max_consultas` sentencias o si
+    alguna forma de sentencia se repite más de `max_repeticiones` veces (N+1).
+    La app debe correr en la misma tarea (httpx.AsyncClient con ASGITransport; el
+    TestClient síncrono la corre en otro hilo y no se ven sus sentencias).
+
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            with presupuesto_sql(max_consultas=3, max_repeticiones=1):
+                await client.get("/products/")
+    """
+    with medir_sql() as estadisticas:
+        yield estadisticas
+    assert estadisticas.consultas <= max_consultas, (
+        f"Se ejecutaron {estadisticas.consultas} sentencias (presupuesto: {max_consultas}): "
+        f"{dict(estadisticas.formas)}"
+    )
+    if max_repeticiones is not None:
+        excedidas = estadisticas.repetidas(max_repeticiones + 1)
+        assert not excedidas, f"Sentencias repetidas más de {max_repeticiones} veces: {excedidas}"
@@ -0,0 +1,117 @@
+# app/db/pool.py
+import asyncio
+import logging
+import ssl
+import time
+from typing import Dict
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class MetricasPool:
+    """Esperas por una conexión del pool y timeouts."""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.espera_total_ms = 0.0
+        self.espera_max_ms = 0.0
+        self.timeouts = 0
+
+    def registrar_espera(self, espera_ms: float):
+        self.checkouts += 1
+        self.espera_total_ms += espera_ms
+        self.espera_max_ms = max(self.espera_max_ms, espera_ms)
+
+    def a_dict(self) -> dict:
+        return {
+            "checkouts": self.checkouts,
+            "espera_promedio_ms": round(self.espera_total_ms / self.checkouts, 3) if self.checkouts else 0.0,
+            "espera_max_ms": round(self.espera_max_ms, 3),
+            "timeouts": self.timeouts,
+        }
+
+
+class PoolMedido(AsyncAdaptedQueuePool):
+    """
+    Pool que mide cuánto espera cada checkout y cuántos terminan en timeout.
+    Las métricas viven en la clase (ver `clase_pool`) para sobrevivir a `engine.dispose()`,
+    que reemplaza la instancia del pool.
+    """
+    metricas: MetricasPool
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.metricas.timeouts += 1
+            logger.warning(f"Timeout esperando una conexión del pool ({self.timeout()}s, {self.status()})")
+            raise
+        finally:
+            self.metricas.registrar_espera((time.perf_counter() - inicio) * 1000)
+
+
+def clase_pool(nombre: str) -> type:
+    """Subclase de PoolMedido con sus propias métricas, una por engine."""
+    return type(f"PoolMedido_{nombre}", (PoolMedido,), {"metricas": MetricasPool()})
+
+
+def opciones_engine(url: str, pool_size: int, max_overflow: int, nombre: str) -> dict:
+    """Argumentos de create_async_engine para el pool y el driver según Settings."""
+    connect_args = {}
+    if url.startswith("postgresql+asyncpg"):
+        if settings.DB_SSL:
+            connect_args["ssl"] = ssl.create_default_context()
+        # Caché de sentencias preparadas por conexión (asyncpg y el adaptador de SQLAlchemy);
+        # 0 la desactiva, necesario detrás de pgbouncer en modo transacción
+        connect_args["statement_cache_size"] = settings.DB_STATEMENT_CACHE_SIZE
+        connect_args["prepared_statement_cache_size"] = settings.DB_STATEMENT_CACHE_SIZE
+    return {
+        "poolclass": clase_pool(nombre),
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "connect_args": connect_args,
+    }
+
+
+def metricas_pool(engine) -> Dict[str, float]:
+    """Estado actual del pool (en uso, libres, overflow) más esperas y timeouts acumulados."""
+    pool = engine.sync_engine.pool
+    datos = {
+        "tamano": pool.size(),
+        "en_uso": pool.checkedout(),
+        "libres": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": pool._max_overflow,
+    }
+    if isinstance(pool, PoolMedido):
+        datos.update(pool.metricas.a_dict())
+    return datos
+
+
+async def precalentar_pool(engine, conexiones: int) -> int:
+    """
+    Abre `conexiones` conexiones a la vez y las devuelve al pool, para que las primeras
+    peticiones no paguen el handshake (TCP + TLS + autenticación). Retorna cuántas abrió.
+    """
+    async def abrir():
+        conn = await engine.connect()
+        await conn.exec_driver_sql("SELECT 1")
+        return conn
+
+    resultados = await asyncio.gather(*(abrir() for _ in range(conexiones)), return_exceptions=True)
+    abiertas = [r for r in resultados if not isinstance(r, BaseException)]
+    for conn in abiertas:
+        await conn.close()
+    errores = [r for r in resultados if isinstance(r, BaseException)]
+    if errores:
+        logger.warning(f"Precalentamiento del pool: {len(errores)} conexiones fallaron ({errores[0]})")
+    return len(abiertas)
@@ -0,0 +1,144 @@
+# app/db/replica.py
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Segundos de retraso de la réplica; 0 si ya reprodujo todo lo que recibió
+CONSULTA_RETRASO = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+
+class SesionSoloLecturaError(Exception):
+    def __init__(self, detail: str):
+        self.detail = detail
+
+
+@event.listens_for(Session, "before_flush")
+def _bloquear_escrituras(session, flush_context, instances):
+    # Sesiones de get_db_lectura: las escrituras deben ir por get_db (primaria)
+    if session.info.get("solo_lectura"):
+        raise SesionSoloLecturaError("Esta sesión es de solo lectura; use get_db para escribir.")
+
+
+class EstadoReplica:
+    """
+    Salud y retraso de la réplica de lectura.
+
+    - Una tarea revisa la réplica cada `intervalo` segundos: está disponible si
+      responde y su retraso no supera `max_retraso`.
+    - Una falla de conexión al abrir una sesión la marca caída de inmediato; la
+      siguiente revisión la vuelve a habilitar si ya responde.
+    """
+
+    def __init__(self, engine, max_retraso: float, intervalo: float):
+        self.engine = engine
+        self.max_retraso = max_retraso
+        self.intervalo = intervalo
+        self.disponible = False
+        self.retraso: Optional[float] = None
+        self.caidas = 0
+        self.lecturas_replica = 0
+        self.lecturas_primaria = 0
+        self._tarea: Optional[asyncio.Task] = None
+
+    async def _medir_retraso(self) -> float:
+        async with self.engine.connect() as conn:
+            if self.engine.dialect.name != "postgresql":
+                await conn.execute(text("SELECT 1"))
+                return 0.0
+            return float((await conn.execute(CONSULTA_RETRASO)).scalar() or 0)
+
+    async def revisar(self) -> bool:
+        try:
+            self.retraso = await self._medir_retraso()
+        except Exception as e:
+            self.marcar_caida(e)
+            return False
+        disponible = self.retraso <= self.max_retraso
+        if disponible != self.disponible:
+            if disponible:
+                logger.info(f"Réplica de lectura disponible (retraso {self.retraso:.1f}s)")
+            else:
+                logger.warning(f"Réplica con {self.retraso:.1f}s de retraso (máximo {self.max_retraso}s): lecturas a la primaria")
+        self.disponible = disponible
+        return disponible
+
+    def marcar_caida(self, error: Exception):
+        if self.disponible:
+            self.caidas += 1
+            logger.warning(f"Réplica de lectura no disponible, lecturas a la primaria: {error}")
+        self.disponible = False
+
+    async def _ciclo(self):
+        while True:
+            await self.revisar()
+            await asyncio.sleep(self.intervalo)
+
+    def iniciar(self):
+        if self._tarea is None or self._tarea.done():
+            self._tarea = asyncio.create_task(self._ciclo())
+
+    async def cerrar(self):
+        if self._tarea:
+            self._tarea.cancel()
+            await asyncio.gather(self._tarea, return_exceptions=True)
+            self._tarea = None
+
+    def metricas(self) -> dict:
+        return {
+            "configurada": True,
+            "disponible": self.disponible,
+            "retraso_s": round(self.retraso, 3) if self.retraso is not None else None,
+            "max_retraso_s": self.max_retraso,
+            "caidas": self.caidas,
+            "lecturas_replica": self.lecturas_replica,
+            "lecturas_primaria": self.lecturas_primaria,
+        }
+
+
+class SelectorLectura:
+    """
+    Fábrica de sesiones de solo lectura: `async with selector() as db`.
+    Usa la réplica si está disponible y, si no (o si no se puede conectar), la primaria.
+    """
+
+    def __init__(self, primaria, replica=None, estado: Optional[EstadoReplica] = None):
+        self.primaria = primaria
+        self.replica = replica
+        self.estado = estado
+
+    async def _sesion_replica(self):
+        if self.replica is None or self.estado is None or not self.estado.disponible:
+            return None
+        session = self.replica(info={"solo_lectura": True})
+        try:
+            await session.connection()
+        except Exception as e:
+            await session.close()
+            self.estado.marcar_caida(e)
+            return None
+        self.estado.lecturas_replica += 1
+        return session
+
+    @asynccontextmanager
+    async def __call__(self):
+        session = await self._sesion_replica()
+        if session is None:
+            if self.estado is not None:
+                self.estado.lecturas_primaria += 1
+            session = self.primaria(info={"solo_lectura": True})
+        try:
+            yield session
+        finally:
+            await session.close()
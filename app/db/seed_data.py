@@ -7,6 +7,8 @@ from app.models.category import Category
 from app.models.product import Product
 from app.models.rol import Rol
 from app.models.permiso import Permiso
+from app.core.permission_cache import permission_cache
+from app.core.session_cache import session_cache
 from app.core.security import hash_password
 from app.models.user import Usuario
 from faker import Faker
@@ -56,7 +58,11 @@ async def seed_roles_and_permissions(db: AsyncSession):
         if not permiso:
             db.add(Permiso(**perm_info))
 
+    # El catálogo de roles y permisos pudo cambiar: descartar los permisos en caché
+    # de este y de los demás workers
+    await session_cache.publicar(db, todos_los_permisos=True)
     await db.commit()
+    permission_cache.invalidar_todo()
 
     # Crear usuario admin si no existe
     result = await db.execute(select(Usuario).filter_by(nombre_usuario="admin"))
@@ -1,16 +1,57 @@
 import logging
+from typing import Type
 from fastapi import Depends, Security
 from fastapi.security import APIKeyHeader
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import update
 from sqlalchemy.future import select
 from datetime import datetime
 from app.db.database import get_db
-from app.models.permiso import Permiso
 from app.models.user import Usuario
 from app.models.sesion import Sesion
 from app.core.enums.roles_enum import UserRole
+from app.core.session_cache import session_cache
+from app.core.permission_cache import permission_cache
 
 api_key_header = APIKeyHeader(name="Authorization", auto_error=False)
+
+
+async def _usuario_de_sesion(token: str, db: AsyncSession, error: Type[Exception]) -> Usuario:
+    """
+    Valida la sesión del token y retorna su usuario.
+    Usa la caché de sesiones; solo consulta la base de datos si el token no está en caché.
+    La última actividad se registra en memoria y se escribe en lote (ver session_cache).
+    """
+    entrada = session_cache.obtener(token)
+    if entrada is None:
+        # Sesión y usuario en una sola consulta
+        result = await db.execute(
+            select(Sesion, Usuario)
+            .outerjoin(Usuario, Usuario.id_usuario == Sesion.id_usuario)
+            .where(Sesion.token == token)
+        )
+        fila = result.first()
+        if not fila or not fila[0].estado:
+            raise error("Sesión inválida o expirada")
+        sesion, usuario = fila
+        if usuario is None:
+            raise error("Usuario no encontrado")
+        entrada = session_cache.guardar(token, sesion, usuario)
+
+    ahora = datetime.utcnow()
+
+    # Verificar inactividad
+    if entrada.expirada(ahora):
+        session_cache.invalidar(token)
+        await db.execute(update(Sesion).where(Sesion.id == entrada.id_sesion).values(estado=False))
+        await session_cache.publicar(db, sesiones=[entrada.id_sesion])
+        await db.commit()
+        raise error("Sesión expirada por inactividad")
+
+    # Actualizar última actividad (escritura diferida)
+    session_cache.registrar_actividad(entrada, ahora)
+    return entrada.usuario
+
 # Excepción personalizada
 class AdminSessionError(Exception):
     def __init__(self, detail: str):
@@ -23,26 +64,9 @@ async def admin_session_required(
 ):
     if not token:
         raise AdminSessionError("Token no proporcionado")
-    # Buscar la sesión por token
-    result = await db.execute(select(Sesion).where(Sesion.token == token))
-    sesion = result.scalars().first()
-    
-    if not sesion or not sesion.estado:
-        raise AdminSessionError("Sesión inválida o expirada")
-
-    # Verificar inactividad
-    if sesion.ultima_actividad + sesion.expiracion_inactividad < datetime.utcnow():
-        sesion.estado = False
-        await db.commit()
-        raise AdminSessionError("Sesión expirada por inactividad")
-
-    # Actualizar última actividad
-    sesion.ultima_actividad = datetime.utcnow()
-    await db.commit()
 
-    # Traer usuario y validar rol
-    usuario = await db.get(Usuario, sesion.id_usuario)
-    if not usuario or usuario.rol != UserRole.ADMIN:
+    usuario = await _usuario_de_sesion(token, db, AdminSessionError)
+    if usuario.rol != UserRole.ADMIN:
         raise AdminSessionError("No autorizado")
 
     return usuario
@@ -60,30 +84,8 @@ async def user_session_required(
 ):
     if not token:
         raise UserSessionError("Token no proporcionado")
-    
-    # Buscar la sesión por token
-    result = await db.execute(select(Sesion).where(Sesion.token == token))
-    sesion = result.scalars().first()
-    
-    if not sesion or not sesion.estado:
-        raise UserSessionError("Sesión inválida o expirada")
-
-    # Verificar inactividad
-    if sesion.ultima_actividad + sesion.expiracion_inactividad < datetime.utcnow():
-        sesion.estado = False
-        await db.commit()
-        raise UserSessionError("Sesión expirada por inactividad")
 
-    # Actualizar última actividad
-    sesion.ultima_actividad = datetime.utcnow()
-    await db.commit()
-
-    # Traer usuario (sin validar rol)
-    usuario = await db.get(Usuario, sesion.id_usuario)
-    if not usuario:
-        raise UserSessionError("Usuario no encontrado")
-
-    return usuario
+    return await _usuario_de_sesion(token, db, UserSessionError)
 
 class PermissionDeniedError(Exception):
     def __init__(self, detail: str):
@@ -98,14 +100,9 @@ def permission_required(permission_name: str):
         if usuario.rol == UserRole.ADMIN:
             return usuario  # Los admins tienen todos los permisos
         
-        result = await db.execute(
-            select(Permiso)
-            .join(Permiso.usuarios)
-            .where(Permiso.nombre == permission_name)
-            .where(Usuario.id_usuario == usuario.id_usuario)
-        )
-        permiso = result.scalars().first()
-        if not permiso:
+        # Permisos del usuario desde caché: solo pertenencia a un conjunto
+        permisos = await permission_cache.obtener(usuario.id_usuario, db)
+        if permission_name not in permisos:
             raise PermissionDeniedError(f"No tienes permisos para '{permission_name}'")
 
         return usuario
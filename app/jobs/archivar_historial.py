@@ -0,0 +1,169 @@
+"""
+Particiones mensuales y archivo del historial de acciones.
+
+Uso:
+    python -m app.jobs.archivar_historial particiones [--meses-adelante N]
+    python -m app.jobs.archivar_historial archivar [--retencion N]
+
+`particiones` crea las particiones del mes actual y de los N siguientes (y mueve a
+ellas las filas que hayan caído en la partición por defecto). `archivar` escribe cada
+partición más vieja que la retención a un archivo gzip JSONL (con sus conteos por
+usuario, acción y módulo) y la elimina de la base.
+"""
+import argparse
+import asyncio
+import logging
+import re
+import sys
+from datetime import date
+from typing import List
+
+from sqlalchemy import JSON, text
+
+from app.core.config import settings
+from app.db.database import async_session, engine
+from app.services.archivo_historial import ArchivoHistorial, archivo_historial, inicio_mes, sumar_meses
+
+logger = logging.getLogger(__name__)
+
+PATRON_PARTICION = re.compile(r"^historial_acciones_(\d{4})_(\d{2})$")
+
+# Filas por lectura del cursor al archivar una partición
+TAMANO_LOTE_ARCHIVO = 5000
+
+
+def nombre_particion(mes: date) -> str:
+    return f"historial_acciones_{mes:%Y_%m}"
+
+
+def _es_postgres() -> bool:
+    return engine.dialect.name == "postgresql"
+
+
+async def _particiones(db) -> List[date]:
+    result = await db.execute(text("""
+        SELECT hija.relname
+        FROM pg_inherits
+        JOIN pg_class padre ON padre.oid = pg_inherits.inhparent
+        JOIN pg_class hija ON hija.oid = pg_inherits.inhrelid
+        WHERE padre.relname = 'historial_acciones'
+    """))
+    meses = []
+    for nombre in result.scalars():
+        coincidencia = PATRON_PARTICION.match(nombre)
+        if coincidencia:
+            meses.append(date(int(coincidencia.group(1)), int(coincidencia.group(2)), 1))
+    return sorted(meses)
+
+
+async def crear_particion(db, mes: date):
+    """
+    Crea la partición del mes. Las filas de ese mes que estén en la partición por
+    defecto se mueven a la nueva en la misma transacción (si no, ATTACH fallaría).
+    """
+    nombre = nombre_particion(mes)
+    desde, hasta = mes.isoformat(), sumar_meses(mes, 1).isoformat()
+    await db.execute(text(f"CREATE TABLE {nombre} (LIKE historial_acciones INCLUDING DEFAULTS)"))
+    await db.execute(text(f"""
+        WITH movidas AS (
+            DELETE FROM historial_acciones_default
+            WHERE fecha_accion >= '{desde}' AND fecha_accion < '{hasta}'
+            RETURNING *
+        )
+        INSERT INTO {nombre} SELECT * FROM movidas
+    """))
+    await db.execute(text(
+        f"ALTER TABLE historial_acciones ATTACH PARTITION {nombre} FOR VALUES FROM ('{desde}') TO ('{hasta}')"
+    ))
+    await db.commit()
+
+
+async def asegurar_particiones(meses_adelante: int = None) -> int:
+    """Job: crea las particiones que falten del mes actual a `meses_adelante`. Retorna cuántas creó."""
+    if not _es_postgres():
+        return 0
+    meses_adelante = settings.HISTORIAL_PARTITIONS_AHEAD if meses_adelante is None else meses_adelante
+    actual = inicio_mes(date.today())
+    creadas = 0
+    async with async_session() as db:
+        existentes = set(await _particiones(db))
+        for i in range(meses_adelante + 1):
+            mes = sumar_meses(actual, i)
+            if mes not in existentes:
+                await crear_particion(db, mes)
+                creadas += 1
+                logger.info(f"Partición {nombre_particion(mes)} creada")
+    return creadas
+
+
+async def _lotes_particion(db, mes: date):
+    """Filas de la partición en el orden del listado, con el nombre del usuario."""
+    result = await db.stream(
+        text(f"""
+            SELECT h.id_historial, h.id_usuario, u.nombre_usuario, h.accion, h.modulo, h.descripcion,
+                   h.datos_anteriores, h.datos_nuevos, h.fecha_accion, h.entidad, h.es_diferencia
+            FROM {nombre_particion(mes)} h
+            LEFT JOIN usuarios u ON u.id_usuario = h.id_usuario
+            ORDER BY h.fecha_accion DESC, h.id_historial DESC
+        """)
+        .columns(datos_anteriores=JSON, datos_nuevos=JSON)
+        .execution_options(yield_per=TAMANO_LOTE_ARCHIVO)
+    )
+    async for lote in result.mappings().partitions(TAMANO_LOTE_ARCHIVO):
+        yield [dict(fila) for fila in lote]
+
+
+async def archivar_particion(db, mes: date, archivo: ArchivoHistorial) -> int:
+    """Escribe la partición a su archivo y, solo si se escribió completo, la elimina."""
+    filas = await archivo.escribir(mes, _lotes_particion(db, mes))
+    await db.execute(text(f"ALTER TABLE historial_acciones DETACH PARTITION {nombre_particion(mes)}"))
+    await db.execute(text(f"DROP TABLE {nombre_particion(mes)}"))
+    await db.commit()
+    return filas
+
+
+async def archivar_historial(meses_retencion: int = None, archivo: ArchivoHistorial = archivo_historial) -> dict:
+    """
+    Job: archiva las particiones de meses anteriores a la retención.
+    Retorna {mes: filas archivadas}.
+    """
+    if not _es_postgres():
+        return {}
+    meses_retencion = settings.HISTORIAL_RETENTION_MONTHS if meses_retencion is None else meses_retencion
+    corte = sumar_meses(inicio_mes(date.today()), -meses_retencion)
+    archivados = {}
+    async with async_session() as db:
+        for mes in await _particiones(db):
+            if mes >= corte:
+                break
+            filas = await archivar_particion(db, mes, archivo)
+            archivados[f"{mes:%Y-%m}"] = filas
+            logger.info(f"Partición {nombre_particion(mes)} archivada en {archivo.ruta(mes)}: {filas} filas")
+    return archivados
+
+
+async def _main(accion: str, meses: int) -> int:
+    engine.echo = False
+    try:
+        if not _es_postgres():
+            print("El particionado del historial requiere PostgreSQL")
+            return 1
+        if accion == "particiones":
+            print(f"Particiones creadas: {await asegurar_particiones(meses)}")
+        else:
+            archivados = await archivar_historial(meses)
+            for mes, filas in archivados.items():
+                print(f"{mes}: {filas} filas archivadas")
+            print("Nada que archivar" if not archivados else f"{len(archivados)} meses archivados")
+        return 0
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("accion", choices=["particiones", "archivar"])
+    parser.add_argument("--meses-adelante", dest="meses", type=int, default=None)
+    parser.add_argument("--retencion", dest="meses", type=int, default=None)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(_main(args.accion, args.meses)))
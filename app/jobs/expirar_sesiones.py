@@ -1,21 +1,75 @@
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from sqlalchemy import select
+import logging
+from sqlalchemy import delete, select, update
 from datetime import datetime
 from app.models.sesion import Sesion
+from app.models.user_otp import UserOTP
+from app.models.password_resets import PasswordReset
+from app.models.idempotency_keys import ClaveIdempotencia
 from app.db.database import async_session
+from app.core.session_cache import session_cache
 
-async def expirar_sesiones():
+logger = logging.getLogger(__name__)
+
+# Filas borradas por transacción al purgar OTPs y tokens de recuperación vencidos
+TAMANO_LOTE_PURGA = 1000
+
+
+async def expirar_sesiones() -> int:
+    """
+    Marca como inactivas todas las sesiones vencidas con un solo UPDATE en el servidor
+    (apoyado en el índice ix_sesiones_activas_expiracion). Retorna cuántas expiraron.
+    """
+    # Escribir primero la actividad pendiente para no expirar sesiones que sí están en uso
+    await session_cache.flush()
     async with async_session() as db:
-        result = await db.execute(select(Sesion).where(Sesion.estado.is_(True)))
-        sesiones = result.scalars().all()
-        for sesion in sesiones:
-            if sesion.ultima_actividad + sesion.expiracion_inactividad < datetime.utcnow():
-                sesion.estado = False
-                db.add(sesion)
+        result = await db.execute(
+            update(Sesion)
+            .where(Sesion.estado.is_(True))
+            .where(Sesion.ultima_actividad + Sesion.expiracion_inactividad < datetime.utcnow())
+            # Conservar la última actividad real (evita el onupdate de la columna)
+            .values(estado=False, ultima_actividad=Sesion.ultima_actividad)
+            .returning(Sesion.id, Sesion.token)
+            .execution_options(synchronize_session=False)
+        )
+        expiradas = result.all()
+        # Los demás workers descartan estas sesiones de su caché al confirmar
+        await session_cache.publicar(db, sesiones=[id_sesion for id_sesion, _ in expiradas])
         await db.commit()
 
-def iniciar_scheduler():
-    scheduler = AsyncIOScheduler()
-    scheduler.add_job(expirar_sesiones, "interval", minutes=1)
-    scheduler.start()
-    return scheduler
+    for _, token in expiradas:
+        session_cache.invalidar(token)
+    if expiradas:
+        logger.info(f"Sesiones expiradas por inactividad: {len(expiradas)}")
+    return len(expiradas)
+
+
+async def _purgar_vencidos(modelo, tamano_lote: int) -> int:
+    total = 0
+    while True:
+        async with async_session() as db:
+            ids = select(modelo.id).where(modelo.expires_at < datetime.utcnow()).limit(tamano_lote)
+            result = await db.execute(
+                delete(modelo)
+                .where(modelo.id.in_(ids.scalar_subquery()))
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+        total += result.rowcount
+        if result.rowcount < tamano_lote:
+            return total
+
+
+async def purgar_registros_vencidos(tamano_lote: int = TAMANO_LOTE_PURGA) -> dict:
+    """
+    Borra OTPs, tokens de recuperación de contraseña y claves de idempotencia vencidos en lotes acotados,
+    una transacción por lote para no bloquear las tablas mucho tiempo.
+    """
+    borrados = {
+        "user_otp": await _purgar_vencidos(UserOTP, tamano_lote),
+        "password_resets": await _purgar_vencidos(PasswordReset, tamano_lote),
+        "claves_idempotencia": await _purgar_vencidos(ClaveIdempotencia, tamano_lote),
+    }
+    if any(borrados.values()):
+        logger.info(f"Registros vencidos purgados: {borrados}")
+    return borrados
+
@@ -0,0 +1,183 @@
+# app/jobs/leader_election.py
+import asyncio
+import logging
+import os
+from abc import ABC, abstractmethod
+from typing import Callable, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+
+# ==============================
+# CANDADOS
+# ==============================
+
+class LeaderLock(ABC):
+    """Candado exclusivo entre procesos. Se libera solo si el proceso que lo tiene muere."""
+
+    @abstractmethod
+    async def adquirir(self) -> bool:
+        ...
+
+    @abstractmethod
+    async def sigue_activo(self) -> bool:
+        ...
+
+    @abstractmethod
+    async def liberar(self):
+        ...
+
+
+class PostgresAdvisoryLock(LeaderLock):
+    """
+    Advisory lock de sesión en Postgres sobre una conexión dedicada.
+    Si el proceso muere se cierra la conexión y Postgres libera el candado.
+    """
+
+    def __init__(self, engine: AsyncEngine, clave: int):
+        self.engine = engine
+        self.clave = clave
+        self._conexion: Optional[AsyncConnection] = None
+
+    async def adquirir(self) -> bool:
+        conexion = await self.engine.connect()
+        try:
+            conexion = await conexion.execution_options(isolation_level="AUTOCOMMIT")
+            obtenido = (await conexion.execute(
+                text("SELECT pg_try_advisory_lock(:clave)"), {"clave": self.clave}
+            )).scalar()
+        except Exception:
+            await conexion.close()
+            raise
+        if not obtenido:
+            await conexion.close()
+            return False
+        self._conexion = conexion
+        return True
+
+    async def sigue_activo(self) -> bool:
+        if self._conexion is None:
+            return False
+        try:
+            await self._conexion.execute(text("SELECT 1"))
+            return True
+        except Exception:
+            return False
+
+    async def liberar(self):
+        conexion, self._conexion = self._conexion, None
+        if conexion is None:
+            return
+        try:
+            await conexion.execute(text("SELECT pg_advisory_unlock(:clave)"), {"clave": self.clave})
+        except Exception:
+            pass  # la conexión ya no existe: el candado se liberó con ella
+        finally:
+            await conexion.close()
+
+
+class FileLock(LeaderLock):
+    """Candado sobre un archivo local (desarrollo o un solo servidor sin Postgres)."""
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        self._fd: Optional[int] = None
+
+    async def adquirir(self) -> bool:
+        fd = os.open(self.ruta, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        except OSError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    async def sigue_activo(self) -> bool:
+        return self._fd is not None
+
+    async def liberar(self):
+        fd, self._fd = self._fd, None
+        if fd is None:
+            return
+        try:
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(fd)
+
+
+# ==============================
+# ELECCIÓN DE LÍDER
+# ==============================
+
+class LeaderElection:
+    """
+    Elige un solo proceso líder entre todos los workers.
+
+    - Cada `intervalo` segundos los seguidores intentan tomar el candado; así, si el
+      líder muere, otro worker lo reemplaza en el siguiente intento.
+    - El líder verifica que sigue teniendo el candado; si lo pierde deja de ser líder.
+    - `al_ganar` y `al_perder` se llaman al cambiar de estado (p. ej. reanudar o pausar el scheduler).
+    """
+
+    def __init__(self, lock: LeaderLock, intervalo: float,
+                 al_ganar: Callable[[], None], al_perder: Callable[[], None]):
+        self.lock = lock
+        self.intervalo = intervalo
+        self.al_ganar = al_ganar
+        self.al_perder = al_perder
+        self.es_lider = False
+        self._tarea: Optional[asyncio.Task] = None
+
+    async def verificar(self):
+        """Un ciclo de elección: intenta ser líder o confirma que lo sigue siendo."""
+        try:
+            if self.es_lider:
+                if not await self.lock.sigue_activo():
+                    logger.warning("Se perdió el liderazgo del scheduler")
+                    await self._dejar_liderazgo()
+            elif await self.lock.adquirir():
+                self.es_lider = True
+                logger.info(f"Proceso {os.getpid()} elegido líder del scheduler")
+                self.al_ganar()
+        except Exception as e:
+            logger.error(f"Error en la elección de líder del scheduler: {e}")
+            if self.es_lider:
+                await self._dejar_liderazgo()
+
+    async def _dejar_liderazgo(self):
+        self.es_lider = False
+        self.al_perder()
+        await self.lock.liberar()
+
+    async def _ciclo(self):
+        while True:
+            await self.verificar()
+            await asyncio.sleep(self.intervalo)
+
+    def iniciar(self):
+        if self._tarea is None or self._tarea.done():
+            self._tarea = asyncio.create_task(self._ciclo())
+
+    async def cerrar(self):
+        if self._tarea:
+            self._tarea.cancel()
+            await asyncio.gather(self._tarea, return_exceptions=True)
+            self._tarea = None
+        if self.es_lider:
+            await self._dejar_liderazgo()
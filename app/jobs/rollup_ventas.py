@@ -0,0 +1,59 @@
+"""
+Mantenimiento de las tablas de acumulados ventas_diarias y tickets_diarios.
+
+Uso:
+    python -m app.jobs.rollup_ventas reconstruir [--desde YYYY-MM-DD] [--hasta YYYY-MM-DD]
+    python -m app.jobs.rollup_ventas verificar [--desde YYYY-MM-DD] [--hasta YYYY-MM-DD]
+
+`reconstruir` recalcula los acumulados desde sales/sale_items (todo el historial si no
+se indica rango). `verificar` compara por día los acumulados contra las ventas y
+termina con código 1 si encuentra diferencias.
+"""
+import argparse
+import asyncio
+import logging
+import sys
+from datetime import date, timedelta
+from typing import Optional
+
+from app.db.database import async_session, engine
+from app.services.rollup_ventas_service import reconstruir_rollup, verificar_rollup
+
+logger = logging.getLogger(__name__)
+
+
+async def verificar_rollup_dia_anterior() -> int:
+    """Job diario: verifica los acumulados de ayer y registra las diferencias encontradas."""
+    ayer = date.today() - timedelta(days=1)
+    async with async_session() as db:
+        diferencias = await verificar_rollup(db, ayer, ayer)
+    for diferencia in diferencias:
+        logger.error(f"Acumulados diarios no coinciden con las ventas: {diferencia}")
+    return len(diferencias)
+
+
+async def _main(accion: str, desde: Optional[date], hasta: Optional[date]) -> int:
+    engine.echo = False
+    try:
+        async with async_session() as db:
+            if accion == "reconstruir":
+                filas = await reconstruir_rollup(db, desde, hasta)
+                print(f"ventas_diarias reconstruida: {filas} filas")
+                return 0
+
+            diferencias = await verificar_rollup(db, desde, hasta)
+            for diferencia in diferencias:
+                print(f"{diferencia['dia']}: ventas={diferencia['ventas']} rollup={diferencia['rollup']}")
+            print("Sin diferencias" if not diferencias else f"{len(diferencias)} días con diferencias")
+            return 1 if diferencias else 0
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("accion", choices=["reconstruir", "verificar"])
+    parser.add_argument("--desde", type=date.fromisoformat, default=None)
+    parser.add_argument("--hasta", type=date.fromisoformat, default=None)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(_main(args.accion, args.desde, args.hasta)))
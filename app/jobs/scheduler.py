@@ -0,0 +1,111 @@
+# app/jobs/scheduler.py
+import functools
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+from app.core.config import settings
+from app.db.database import engine
+from app.jobs.expirar_sesiones import expirar_sesiones, purgar_registros_vencidos
+from app.jobs.rollup_ventas import verificar_rollup_dia_anterior
+from app.jobs.archivar_historial import archivar_historial, asegurar_particiones
+from app.jobs.leader_election import FileLock, LeaderElection, LeaderLock, PostgresAdvisoryLock
+
+logger = logging.getLogger(__name__)
+
+# Clave del advisory lock compartida por todos los workers
+CLAVE_LOCK_SCHEDULER = 7342_0001
+
+# Duración y resultado de cada job en este proceso
+_ejecuciones: Dict[str, dict] = {}
+
+scheduler: Optional[AsyncIOScheduler] = None
+eleccion: Optional[LeaderElection] = None
+
+
+def registrar_ejecucion(funcion):
+    """Envuelve un job para guardar duración, resultado y error de cada ejecución."""
+    nombre = funcion.__name__
+
+    @functools.wraps(funcion)
+    async def wrapper(*args, **kwargs):
+        stats = _ejecuciones.setdefault(nombre, {"ejecuciones": 0, "errores": 0})
+        inicio = time.perf_counter()
+        try:
+            resultado = await funcion(*args, **kwargs)
+        except Exception as e:
+            stats["errores"] += 1
+            stats["ultimo_error"] = str(e)
+            stats["ultimo_estado"] = "error"
+            logger.error(f"Job '{nombre}' falló: {e}")
+            raise
+        else:
+            stats["ultimo_estado"] = "ok"
+            stats["ultimo_resultado"] = resultado
+        finally:
+            duracion_ms = round((time.perf_counter() - inicio) * 1000, 2)
+            stats["ejecuciones"] += 1
+            stats["ultima_ejecucion"] = datetime.utcnow().isoformat()
+            stats["ultima_duracion_ms"] = duracion_ms
+            logger.info(f"Job '{nombre}' terminó en {duracion_ms} ms ({stats['ultimo_estado']})")
+        return resultado
+    return wrapper
+
+
+def crear_lock(backend: str) -> LeaderLock:
+    if backend == "auto":
+        backend = "postgres" if engine.dialect.name == "postgresql" else "file"
+    if backend == "postgres":
+        return PostgresAdvisoryLock(engine, CLAVE_LOCK_SCHEDULER)
+    ruta = settings.SCHEDULER_LOCK_FILE or os.path.join(tempfile.gettempdir(), "back_logistica_scheduler.lock")
+    return FileLock(ruta)
+
+
+def iniciar_scheduler():
+    """
+    Crea el scheduler pausado en cada worker; solo el líder electo lo reanuda.
+    Si el líder muere, otro worker toma el candado y reanuda su scheduler.
+    """
+    global scheduler, eleccion
+    scheduler = AsyncIOScheduler(job_defaults={
+        "coalesce": True,            # al tomar el liderazgo, una sola ejecución atrasada
+        "max_instances": 1,
+        "misfire_grace_time": None,
+    })
+    scheduler.add_job(registrar_ejecucion(expirar_sesiones), "interval", minutes=1, id="expirar_sesiones")
+    scheduler.add_job(registrar_ejecucion(purgar_registros_vencidos), "interval", minutes=30, id="purgar_registros_vencidos")
+    scheduler.add_job(registrar_ejecucion(verificar_rollup_dia_anterior), "cron", hour=3, id="verificar_rollup_dia_anterior")
+    scheduler.add_job(registrar_ejecucion(asegurar_particiones), "cron", hour=1, id="asegurar_particiones")
+    scheduler.add_job(registrar_ejecucion(archivar_historial), "cron", hour=2, id="archivar_historial")
+    scheduler.start(paused=True)
+
+    eleccion = LeaderElection(
+        lock=crear_lock(settings.SCHEDULER_LOCK_BACKEND),
+        intervalo=settings.SCHEDULER_LEADER_CHECK_SECONDS,
+        al_ganar=scheduler.resume,
+        al_perder=scheduler.pause
+    )
+    eleccion.iniciar()
+    return scheduler
+
+
+async def detener_scheduler():
+    global scheduler, eleccion
+    if eleccion:
+        await eleccion.cerrar()
+        eleccion = None
+    if scheduler:
+        scheduler.shutdown(wait=False)
+        scheduler = None
+
+
+def metricas() -> dict:
+    return {
+        "es_lider": bool(eleccion and eleccion.es_lider),
+        "jobs": {nombre: dict(stats) for nombre, stats in _ejecuciones.items()},
+    }
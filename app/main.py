@@ -8,15 +8,24 @@ from app.api.v1 import routes_reportes
 from app.api.v1 import routes_purchase 
 from app.api.v1 import routes_user
 from app.api.v1 import routes_ticket_config
+from app.api.v1 import routes_metrics
 from app.db.init_db import init_db
 from contextlib import asynccontextmanager
 from app.db.seed_data import seed_roles_and_permissions, seed_categories_and_products
-from app.jobs.expirar_sesiones import iniciar_scheduler
+from app.jobs.scheduler import iniciar_scheduler, detener_scheduler
 from app.middleware.logging import LoggingMiddleware
 from app.core.limiter import limiter
 from app.core.exception_handlers import register_exception_handlers
 from app.middleware.security import basic_auth_middleware 
-from app.db.database import async_session
+from app.db.database import async_session, engine, estado_replica
+from app.db.pool import precalentar_pool
+from app.core.config import settings
+from app.services.stock_alert_service import stock_alert_aggregator
+from app.services.mail_outbox import mail_outbox
+from app.core.security import hashing_executor
+from app.core.session_cache import session_cache
+from app.services.report_jobs import report_jobs
+from app.services.audit_writer import audit_writer
 
 
 
@@ -25,17 +34,57 @@ async def lifespan(app: FastAPI):
     # Inicializar la base de datos al iniciar la aplicación
     await init_db()
 
+    # Abrir las conexiones mínimas del pool antes de recibir tráfico
+    if settings.DB_POOL_WARMUP:
+        await precalentar_pool(engine, settings.DB_POOL_SIZE)
+
+    # Revisar salud y retraso de la réplica de lectura (si está configurada)
+    if estado_replica:
+        await estado_replica.revisar()
+        estado_replica.iniciar()
+
     # Sembrar datos iniciales
     async with async_session() as session:
         await seed_roles_and_permissions(session)
         #await seed_categories_and_products(session)
 
-    # Iniciar el scheduler para tareas periódicas
+    # Iniciar el scheduler para tareas periódicas (solo corre en el worker líder)
     iniciar_scheduler()
+
+    # Iniciar los workers de envío de correo
+    mail_outbox.iniciar()
+
+    # Iniciar la escritura en lote de la última actividad de sesiones
+    session_cache.iniciar()
+
+    # Iniciar los workers de reportes en segundo plano
+    report_jobs.iniciar()
+
+    # Iniciar la escritura en lote del historial de acciones
+    audit_writer.iniciar()
     yield
-    
-    
-    
+
+    # Escribir el historial de acciones pendiente
+    await audit_writer.cerrar()
+
+    # Detener los reportes en segundo plano
+    await report_jobs.cerrar()
+
+    # Detener la revisión de la réplica
+    if estado_replica:
+        await estado_replica.cerrar()
+
+    # Detener el scheduler y liberar el liderazgo para que otro worker lo tome
+    await detener_scheduler()
+
+    # Guardar la última actividad pendiente de las sesiones
+    await session_cache.cerrar()
+
+    # Enviar alertas de stock pendientes y vaciar la cola de correo antes de cerrar
+    await stock_alert_aggregator.cerrar()
+    await mail_outbox.cerrar()
+    hashing_executor.cerrar()
+
     print("App cerrada")
 
 app = FastAPI(
@@ -70,6 +119,7 @@ app.include_router(routes_reportes.router)
 app.include_router(routes_purchase.router)
 app.include_router(routes_user.router)
 app.include_router(routes_ticket_config.router)
+app.include_router(routes_metrics.router)
 
 
 
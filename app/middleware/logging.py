@@ -3,6 +3,7 @@ import json
 import logging
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
+from app.db.instrumentacion import medir_sql
 
 # Configuración de logging estructurado
 logging.basicConfig(
@@ -15,7 +16,9 @@ class LoggingMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next):
         start_time = time.time()
 
-        response = await call_next(request)
+        # Sentencias SQL de la petición: cantidad, tiempo, las más lentas y repetidas (N+1)
+        with medir_sql() as sql:
+            response = await call_next(request)
 
         process_time = (time.time() - start_time) * 1000
         log_data = {
@@ -23,7 +26,8 @@ class LoggingMiddleware(BaseHTTPMiddleware):
             "url": str(request.url),
             "status_code": response.status_code,
             "process_time_ms": round(process_time, 2),
-            "client": request.client.host
+            "client": request.client.host,
+            "db": sql.resumen()
         }
 
         logger.info(json.dumps(log_data))
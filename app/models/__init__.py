@@ -9,8 +9,12 @@ from app.models.historial_acciones import HistorialAccion
 from app.models.sales.sales import Sale
 from app.models.inventory_movements import InventoryMovement
 from app.models.sales.sale_items import SaleItem
+from app.models.sales.ventas_diarias import VentaDiaria
+from app.models.sales.tickets_diarios import TicketDiario
 from app.models.product import Product
 from app.models.category import Category
+from app.models.idempotency_keys import ClaveIdempotencia
+from app.models.jobs_reportes import JobReporte
 
 # Importar tablas de asociación (no clases)
 from app.models.associations.usuario_permisos import usuario_permisos
@@ -25,7 +29,11 @@ __all__ = [
     "rol_permisos",
     "Sale",
     "SaleItem",
+    "VentaDiaria",
+    "TicketDiario",
     "Product",
     "Category",
     "InventoryMovement",
+    "ClaveIdempotencia",
+    "JobReporte",
 ]
@@ -1,17 +1,42 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON, func
+from sqlalchemy import DDL, Boolean, Column, Integer, Index, String, DateTime, ForeignKey, JSON, event, false, func
 from sqlalchemy.orm import relationship
 from app.db.database import Base  
 
 class HistorialAccion(Base):
     __tablename__ = "historial_acciones"
 
-    id_historial = Column(Integer, primary_key=True, index=True)
+    # En Postgres la tabla está particionada por mes (RANGE sobre fecha_accion), por eso
+    # fecha_accion forma parte de la llave primaria; para el ORM la identidad es id_historial
+    id_historial = Column(Integer, primary_key=True, autoincrement=True, index=True)
     id_usuario = Column(Integer, ForeignKey("usuarios.id_usuario"), nullable=False)
     accion = Column(String(50), nullable=False)  # crear, actualizar, eliminar, listar, etc.
     modulo = Column(String(50), nullable=False)  # productos, categorías, ventas, etc.
     descripcion = Column(String(255), nullable=True)  # detalle libre
     datos_anteriores = Column(JSON, nullable=True)  # estado previo (opcional)
     datos_nuevos = Column(JSON, nullable=True)      # estado nuevo (opcional)
-    fecha_accion = Column(DateTime, server_default=func.now(), nullable=False)
+    fecha_accion = Column(DateTime, server_default=func.now(), nullable=False, primary_key=True)
+    entidad = Column(String(100), nullable=True)  # id del objeto afectado (para reconstruir sus cambios)
+    es_diferencia = Column(Boolean, nullable=False, server_default=false())  # datos_* solo con los campos que cambiaron
 
-    usuario = relationship("Usuario", backref="historial_acciones")
\ No newline at end of file
+    __table_args__ = (
+        Index("ix_historial_acciones_modulo_entidad", "modulo", "entidad", "id_historial"),
+        # Listado por cursor: cada filtro exacto seguido del orden (fecha_accion, id_historial)
+        Index("ix_historial_acciones_fecha_id", "fecha_accion", "id_historial"),
+        Index("ix_historial_acciones_usuario_fecha_id", "id_usuario", "fecha_accion", "id_historial"),
+        Index("ix_historial_acciones_modulo_fecha_id", "modulo", "fecha_accion", "id_historial"),
+        Index("ix_historial_acciones_accion_fecha_id", "accion", "fecha_accion", "id_historial"),
+        {"postgresql_partition_by": "RANGE (fecha_accion)"},
+    )
+    __mapper_args__ = {"primary_key": [id_historial]}
+
+    usuario = relationship("Usuario", backref="historial_acciones")
+
+
+# Partición por defecto al crear la tabla con create_all; el job de particiones crea
+# los meses y mueve a ellos lo que haya caído aquí
+event.listen(
+    HistorialAccion.__table__,
+    "after_create",
+    DDL("CREATE TABLE IF NOT EXISTS historial_acciones_default PARTITION OF historial_acciones DEFAULT")
+    .execute_if(dialect="postgresql")
+)
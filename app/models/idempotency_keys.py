@@ -0,0 +1,21 @@
+from sqlalchemy import Column, DateTime, Integer, JSON, String, UniqueConstraint, func
+from app.db.database import Base
+
+class ClaveIdempotencia(Base):
+    """
+    Resultado de una operación por clave de idempotencia (header Idempotency-Key).
+    Se inserta en la misma transacción que la operación: si la venta o compra se
+    confirma, la clave también, y la restricción única impide registrarla dos veces.
+    """
+    __tablename__ = "claves_idempotencia"
+
+    id = Column(Integer, primary_key=True, index=True)
+    clave = Column(String(255), nullable=False)
+    huella = Column(String(64), nullable=False)        # sha256 del cuerpo de la solicitud
+    resultado = Column(JSON, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("clave", name="uq_claves_idempotencia_clave"),
+    )
@@ -8,7 +8,7 @@ from app.core.enums.tipo_movimiento import MovementType
 class InventoryMovement(Base):
     __tablename__ = "inventory_movements"
 
-    __table_args = (
+    __table_args__ = (
         Index("ix_inventory_movements_product_date", "id_product", "date"),
     )
     
@@ -0,0 +1,47 @@
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Enum as SQLEnum, ForeignKey, Index, Integer, JSON, String, Text, text
+from app.db.database import Base
+from app.core.enums.estado_job import ReportJobStatus
+from app.core.enums.formato_reporte import ReportFormat
+from app.core.enums.tipo_reporte import ReportType
+
+class JobReporte(Base):
+    """
+    Reporte en segundo plano (POST /reportes/jobs). El registro es compartido por
+    todos los workers: cualquiera puede responder el estado o la descarga, aunque
+    el reporte lo genere el worker que lo recibió.
+    """
+    __tablename__ = "jobs_reportes"
+
+    id = Column(String(32), primary_key=True)
+    id_usuario = Column(
+        Integer,
+        ForeignKey("usuarios.id_usuario", ondelete="CASCADE"),
+        nullable=False,
+        index=True
+    )
+    tipo = Column(SQLEnum(ReportType, native_enum=False, length=20), nullable=False)
+    formato = Column(SQLEnum(ReportFormat, native_enum=False, length=10), nullable=False)
+    filtros = Column(JSON, nullable=False)
+    llave = Column(String(64), nullable=False)         # sha256 de usuario, tipo, formato y filtros normalizados
+    estado = Column(
+        SQLEnum(ReportJobStatus, native_enum=False, length=20),
+        nullable=False,
+        default=ReportJobStatus.pendiente
+    )
+    bytes_generados = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    ruta = Column(String(500), nullable=True)          # archivo gzip en REPORT_JOBS_DIR
+    creado = Column(DateTime, nullable=False, default=datetime.utcnow)
+    iniciado = Column(DateTime, nullable=True)
+    terminado = Column(DateTime, nullable=True)
+    expira = Column(DateTime, nullable=True, index=True)
+
+    __table_args__ = (
+        # Un solo job pendiente o en proceso por llave, entre todos los workers
+        Index(
+            "uq_jobs_reportes_activo", "llave", unique=True,
+            postgresql_where=text("estado IN ('pendiente', 'en_proceso')"),
+            sqlite_where=text("estado IN ('pendiente', 'en_proceso')")
+        ),
+    )
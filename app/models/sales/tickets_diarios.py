@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Date, ForeignKey, Integer
+from app.db.database import Base
+
+class TicketDiario(Base):
+    """
+    Ventas (tickets) por día × usuario.
+    A diferencia de ventas_diarias.tickets, se puede sumar entre filas: cada venta
+    cuenta una sola vez aunque incluya varios productos.
+    Se actualiza en la misma transacción que registra cada venta.
+    """
+    __tablename__ = "tickets_diarios"
+
+    dia = Column(Date, primary_key=True)
+    id_user = Column(Integer, ForeignKey("usuarios.id_usuario", ondelete="CASCADE"), primary_key=True)
+    tickets = Column(Integer, nullable=False, default=0)
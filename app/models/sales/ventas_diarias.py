@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Date, ForeignKey, Index, Integer, Numeric
+from app.db.database import Base
+
+class VentaDiaria(Base):
+    """
+    Acumulado de ventas por día × producto × usuario.
+    Se actualiza en la misma transacción que registra cada venta.
+    """
+    __tablename__ = "ventas_diarias"
+
+    dia = Column(Date, primary_key=True)
+    id_product = Column(Integer, ForeignKey("products.id_product", ondelete="CASCADE"), primary_key=True)
+    id_user = Column(Integer, ForeignKey("usuarios.id_usuario", ondelete="CASCADE"), primary_key=True)
+    cantidad = Column(Integer, nullable=False, default=0)          # unidades vendidas
+    ingresos = Column(Numeric(14, 2), nullable=False, default=0)   # suma de precio × cantidad
+    tickets = Column(Integer, nullable=False, default=0)           # ventas que incluyen el producto; no sumar entre productos
+
+    __table_args__ = (
+        Index("ix_ventas_diarias_producto_dia", "id_product", "dia"),
+        Index("ix_ventas_diarias_usuario_dia", "id_user", "dia"),
+    )
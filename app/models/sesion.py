@@ -1,5 +1,5 @@
 from datetime import timedelta
-from sqlalchemy import Column, Integer, Numeric, DateTime, Interval, Boolean, ForeignKey, String, func, text
+from sqlalchemy import Index, Column, Integer, Numeric, DateTime, Interval, Boolean, ForeignKey, String, func, text
 from app.db.database import Base
 from app.core.config import settings
 
@@ -29,3 +29,12 @@ class Sesion(Base):
     latitud = Column(Numeric(9, 6), nullable=True)
     longitud = Column(Numeric(9, 6), nullable=True)
     token = Column(String, unique=True, nullable=False, index=True)
+
+    # Índice parcial para el job de expiración: solo sesiones activas, por momento de vencimiento
+    __table_args__ = (
+        Index(
+            "ix_sesiones_activas_expiracion",
+            ultima_actividad + expiracion_inactividad,
+            postgresql_where=estado.is_(True)
+        ),
+    )
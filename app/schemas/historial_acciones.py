@@ -2,6 +2,8 @@ from typing import List, Optional
 from datetime import datetime
 from pydantic import BaseModel
 
+from app.core.enums.modo_total import TotalMode
+
 # --- Schema para un item del historial ---
 class HistorialAccionItem(BaseModel):
     id_historial: int
@@ -12,17 +14,28 @@ class HistorialAccionItem(BaseModel):
     descripcion: Optional[str] = None
     datos_anteriores: Optional[dict] = None
     datos_nuevos: Optional[dict] = None
+    es_diferencia: bool = False                       # datos_* solo con los campos que cambiaron
     fecha_accion: datetime
 
     class Config:
         orm_mode = True
 
+# --- Schema para una página del historial ---
+class HistorialPagina(BaseModel):
+    items: List[HistorialAccionItem]
+    per_page: int
+    next_cursor: Optional[str] = None                 # Enviar en `cursor` para pedir la página siguiente
+    total_items: Optional[int] = None                 # Solo si se pidió `total`
+    total_estimado: bool = False                      # True si total_items es una estimación
+
 # --- Schema para request de filtros y paginación ---
 class HistorialAccionQuery(BaseModel):
-    page: int = 1
     per_page: int = 10
-    usuario_nombre: Optional[str] = None
+    cursor: Optional[str] = None                      # next_cursor de la página anterior
+    usuario_nombre: Optional[str] = None              # Filtros exactos
     accion: Optional[str] = None
     modulo: Optional[str] = None
     fecha_inicio: Optional[str] = None
     fecha_fin: Optional[str] = None
+    completo: bool = False                            # Reconstruir el estado completo antes/después de cada cambio
+    total: TotalMode = TotalMode.ninguno
@@ -0,0 +1,26 @@
+from datetime import datetime
+from typing import Any, Dict, Optional
+from pydantic import BaseModel
+
+from app.core.enums.estado_job import ReportJobStatus
+from app.core.enums.formato_reporte import ReportFormat
+from app.core.enums.tipo_reporte import ReportType
+
+class ReporteJobRequest(BaseModel):
+    tipo: ReportType
+    formato: ReportFormat = ReportFormat.json
+    filtros: Dict[str, Any] = {}                      # Mismos campos que el reporte síncrono del tipo
+
+
+class ReporteJobResponse(BaseModel):
+    id: str
+    tipo: ReportType
+    formato: ReportFormat
+    estado: ReportJobStatus
+    posicion_en_cola: Optional[int] = None            # Solo mientras está pendiente
+    bytes_generados: int = 0                          # Avance: bytes del reporte ya escritos
+    creado: datetime
+    iniciado: Optional[datetime] = None
+    terminado: Optional[datetime] = None
+    expira: Optional[datetime] = None                 # Después de esta fecha el archivo se elimina
+    error: Optional[str] = None
@@ -2,6 +2,7 @@ from decimal import Decimal
 from typing import Optional, List
 from pydantic import BaseModel
 from datetime import date, datetime
+from app.core.enums.agrupacion_resumen import SummaryGroupBy
 
 class ReporteVentasRequest(BaseModel):
     nombres_usuario: Optional[List[str]] = None                  # Si se omite, se muestran todas las ventas
@@ -25,9 +26,29 @@ class VentaReporte(BaseModel):
     usuario: str
     cliente: Optional[str]
     total: Decimal
+    subtotal: Decimal                                 # Suma de las líneas que pasan los filtros
     productos: List[ProductoReporte]
 
 class ReporteVentasResponse(BaseModel):
     ventas: List[VentaReporte]
     total_general: Decimal
-    total_ventas: int
\ No newline at end of file
+    total_ventas: int
+
+class ResumenVentasRequest(BaseModel):
+    nombres_usuario: Optional[List[str]] = None
+    fecha_inicio: Optional[str] = None
+    fecha_fin: Optional[str] = None
+    categorias: Optional[List[str]] = None
+    productos: Optional[List[str]] = None
+    agrupar_por: SummaryGroupBy = SummaryGroupBy.dia
+
+class FilaResumenVentas(BaseModel):
+    clave: str                                        # Día, producto, usuario o categoría
+    cantidad: int
+    ingresos: Decimal
+    tickets: int                                      # Ventas distintas; una venta con varios productos cuenta una vez
+
+class ResumenVentasResponse(BaseModel):
+    filas: List[FilaResumenVentas]
+    total_cantidad: int
+    total_ingresos: Decimal
@@ -2,6 +2,7 @@ from datetime import datetime
 from pydantic import BaseModel, Field, model_validator
 from typing import Optional, List
 
+from app.core.enums.responses import ResponseCode
 from app.schemas.base import BaseValidatedModel
 from app.validators.common_validators import validar_lista_minima, validar_positivo
 
@@ -54,3 +55,29 @@ class SaleCreateResponse(BaseValidatedModel):
         orm_mode = True
 
 
+# -----------------------------
+# Sincronización de ventas sin conexión (NDJSON)
+# -----------------------------
+class SaleSyncRecord(SaleCreateRequest):
+    client_id: str = Field(..., description="Identificador de la venta asignado por el punto de venta")
+    date: Optional[datetime] = Field(None, description="Fecha en que se realizó la venta sin conexión")
+
+
+class SaleSyncResult(BaseModel):
+    client_id: Optional[str]
+    success: bool
+    code: int
+    message: str
+    detail: str
+    data: Optional[SaleCreateResponse] = None
+
+    @classmethod
+    def from_enum(cls, response_code: ResponseCode, client_id: Optional[str] = None, data: Optional[SaleCreateResponse] = None, detail: Optional[str] = None):
+        return cls(
+            client_id=client_id,
+            success=response_code == ResponseCode.SUCCESS,
+            code=response_code.code,
+            message=response_code.message,
+            detail=detail,
+            data=data
+        )
@@ -11,7 +11,11 @@ from app.models.rol import Rol
 from app.models.permiso import Permiso
 from app.schemas.api_response import PaginationData
 from app.schemas.user import UsuarioCreateRequest, UsuarioCreateResponse, UsuarioPaginationRequest, UsuarioUpdateRequest
-from app.core.security import hash_password
+from app.core.security import hash_password_async
+from app.services.stock_alert_service import stock_alert_aggregator
+from app.core.session_cache import session_cache
+from app.core.permission_cache import permission_cache
+from app.core.report_cache import report_cache
 
 class AdminUserService:
     def __init__(self, db: AsyncSession):
@@ -24,7 +28,7 @@ class AdminUserService:
         nuevo_usuario = Usuario(
             nombre_usuario=usuario_data.nombre_usuario,
             correo_electronico=usuario_data.correo_electronico,
-            contrasena=hash_password(usuario_data.contrasena),
+            contrasena=await hash_password_async(usuario_data.contrasena),
             rol=usuario_data.rol or "usuario",
             secret_2fa=pyotp.random_base32()
         )
@@ -47,6 +51,7 @@ class AdminUserService:
         self.db.add(nuevo_usuario)
         try:
             await self.db.commit()
+            stock_alert_aggregator.invalidar_destinatarios()
             # Refresh con selectinload para cargar permisos sin lazy-load
             await self.db.refresh(nuevo_usuario)
             # Recargar usuario con permisos usando eager loading
@@ -83,11 +88,16 @@ class AdminUserService:
                 )
             )
 
-            # 2️⃣ Eliminar el usuario
+            # 2️⃣ Eliminar el usuario y avisar a los demás workers que descarten sus sesiones
             await self.db.delete(usuario)
+            await session_cache.publicar(self.db, usuarios=[usuario.id_usuario])
 
             # 3️⃣ Confirmar cambios
             await self.db.commit()
+            stock_alert_aggregator.invalidar_destinatarios()
+            session_cache.invalidar_usuario(usuario.id_usuario)
+            permission_cache.invalidar_usuario(usuario.id_usuario)
+            report_cache.invalidar_todo()
             return True
 
         except IntegrityError:
@@ -121,7 +131,7 @@ class AdminUserService:
         if data.correo_electronico:
             usuario.correo_electronico = data.correo_electronico
         if data.contrasena:
-            usuario.contrasena = hash_password(data.contrasena)
+            usuario.contrasena = await hash_password_async(data.contrasena)
         if data.rol:
             usuario.rol = data.rol
 
@@ -140,7 +150,14 @@ class AdminUserService:
             usuario.permisos = permisos_encontrados
 
         try:
+            await session_cache.publicar(self.db, usuarios=[usuario.id_usuario])
             await self.db.commit()
+            stock_alert_aggregator.invalidar_destinatarios()
+            session_cache.invalidar_usuario(usuario.id_usuario)
+            permission_cache.invalidar_usuario(usuario.id_usuario)
+            if data.nuevo_nombre_usuario:
+                # El nombre aparece en el reporte de ventas y en sus filtros
+                report_cache.invalidar_todo()
             await self.db.refresh(usuario)
             return usuario
 
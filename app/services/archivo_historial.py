@@ -0,0 +1,217 @@
+# app/services/archivo_historial.py
+import asyncio
+import gzip
+import json
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass
+from datetime import date, datetime, time
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+# historial_2025_03.jsonl.gz -> marzo de 2025
+PATRON_ARCHIVO = re.compile(r"^historial_(\d{4})_(\d{2})\.jsonl\.gz$")
+
+
+def inicio_mes(fecha) -> date:
+    return date(fecha.year, fecha.month, 1)
+
+
+def sumar_meses(mes: date, meses: int) -> date:
+    indice = mes.year * 12 + mes.month - 1 + meses
+    return date(indice // 12, indice % 12 + 1, 1)
+
+
+def a_linea(fila: dict) -> bytes:
+    return json.dumps(fila, default=str, ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+def de_linea(linea: bytes) -> dict:
+    fila = json.loads(linea)
+    fila["fecha_accion"] = datetime.fromisoformat(fila["fecha_accion"])
+    return fila
+
+
+# Conteo por (id_usuario, accion, modulo) de un mes archivado
+Conteos = Dict[Tuple[int, str, str], int]
+
+
+def grupo(fila: dict) -> Tuple[int, str, str]:
+    return fila["id_usuario"], fila["accion"], fila["modulo"]
+
+
+@dataclass(frozen=True)
+class FiltroArchivo:
+    """Los filtros exactos y el rango de fechas del listado, aplicados a las filas archivadas."""
+    id_usuario: Optional[int] = None
+    por_usuario: bool = False          # se pidió un usuario (si no existe, id_usuario es None y no coincide nada)
+    accion: Optional[str] = None
+    modulo: Optional[str] = None
+    desde: Optional[datetime] = None
+    hasta: Optional[datetime] = None
+
+    def coincide_grupo(self, id_usuario: int, accion: str, modulo: str) -> bool:
+        return (
+            (not self.por_usuario or id_usuario == self.id_usuario)
+            and (self.accion is None or accion == self.accion)
+            and (self.modulo is None or modulo == self.modulo)
+        )
+
+    def cubre_mes(self, mes: date) -> bool:
+        """El rango de fechas incluye el mes completo: basta con sus conteos."""
+        return (
+            (self.desde is None or self.desde <= datetime.combine(mes, time.min))
+            and (self.hasta is None or self.hasta >= datetime.combine(sumar_meses(mes, 1), time.min))
+        )
+
+    def __call__(self, fila: dict) -> bool:
+        return (
+            self.coincide_grupo(*grupo(fila))
+            and (self.desde is None or fila["fecha_accion"] >= self.desde)
+            and (self.hasta is None or fila["fecha_accion"] <= self.hasta)
+        )
+
+
+class ArchivoHistorial:
+    """
+    Meses del historial de acciones que ya salieron de la tabla, en disco local.
+
+    - Un archivo gzip JSONL por mes, con las filas ordenadas de la más reciente a la
+      más antigua por (fecha_accion, id_historial), igual que el listado.
+    - Cada fila guarda también el nombre del usuario al momento de archivar.
+    - Junto a cada mes, un JSON con el conteo de filas por (id_usuario, accion, modulo):
+      los totales del listado no descomprimen los meses que el rango cubre completos.
+    - La lectura corre en un hilo y se detiene en cuanto junta las filas pedidas.
+    """
+
+    def __init__(self, directorio: str):
+        self.directorio = directorio
+        self._conteos: Dict[date, Conteos] = {}
+
+    def ruta(self, mes: date) -> str:
+        return os.path.join(self.directorio, f"historial_{mes:%Y_%m}.jsonl.gz")
+
+    def ruta_conteos(self, mes: date) -> str:
+        return os.path.join(self.directorio, f"historial_{mes:%Y_%m}.conteos.json")
+
+    def meses(self) -> List[date]:
+        """Meses archivados, del más reciente al más antiguo."""
+        if not os.path.isdir(self.directorio):
+            return []
+        meses = []
+        for nombre in os.listdir(self.directorio):
+            coincidencia = PATRON_ARCHIVO.match(nombre)
+            if coincidencia:
+                meses.append(date(int(coincidencia.group(1)), int(coincidencia.group(2)), 1))
+        return sorted(meses, reverse=True)
+
+    def meses_en_rango(self, desde: Optional[datetime], hasta: Optional[datetime]) -> List[date]:
+        """Meses archivados que se cruzan con [desde, hasta]."""
+        return [
+            mes for mes in self.meses()
+            if (desde is None or sumar_meses(mes, 1) > desde.date())
+            and (hasta is None or mes <= hasta.date())
+        ]
+
+    async def escribir(self, mes: date, partes: AsyncIterator[List[dict]]) -> int:
+        """
+        Escribe el archivo del mes (y sus conteos) a partir de lotes de filas ya ordenadas.
+        Se escribe a un temporal y se renombra al final: un archivo visible siempre está
+        completo y sus conteos ya existen.
+        """
+        os.makedirs(self.directorio, exist_ok=True)
+        ruta = self.ruta(mes)
+        temporal = ruta + ".tmp"
+        conteos: Conteos = Counter()
+        total = 0
+        try:
+            with gzip.open(temporal, "wb") as archivo:
+                async for filas in partes:
+                    # La compresión y escritura no bloquean el event loop
+                    await asyncio.to_thread(archivo.write, b"".join(a_linea(fila) for fila in filas))
+                    conteos.update(grupo(fila) for fila in filas)
+                    total += len(filas)
+            self._guardar_conteos(mes, conteos)
+            os.replace(temporal, ruta)
+        finally:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+        return total
+
+    def _guardar_conteos(self, mes: date, conteos: Conteos):
+        ruta = self.ruta_conteos(mes)
+        with open(ruta + ".tmp", "w", encoding="utf-8") as archivo:
+            json.dump([[*llave, n] for llave, n in conteos.items()], archivo, ensure_ascii=False)
+        os.replace(ruta + ".tmp", ruta)
+        self._conteos[mes] = dict(conteos)
+
+    def _leer_conteos(self, mes: date) -> Conteos:
+        if mes in self._conteos:
+            return self._conteos[mes]
+        try:
+            with open(self.ruta_conteos(mes), encoding="utf-8") as archivo:
+                conteos = {(id_usuario, accion, modulo): n for id_usuario, accion, modulo, n in json.load(archivo)}
+        except FileNotFoundError:
+            # Mes archivado antes de que existieran los conteos: se calculan una vez
+            conteos = Counter()
+            with gzip.open(self.ruta(mes), "rb") as archivo:
+                conteos.update(grupo(de_linea(linea)) for linea in archivo)
+            self._guardar_conteos(mes, conteos)
+        self._conteos[mes] = conteos
+        return conteos
+
+    def _recorrer(self, meses: List[date], filtro: Callable[[dict], bool],
+                  antes_de: Optional[Tuple[datetime, int]], limite: Optional[int]) -> Tuple[List[dict], int]:
+        encontradas = []
+        total = 0
+        for mes in meses:
+            if antes_de and mes > antes_de[0].date():
+                continue
+            with gzip.open(self.ruta(mes), "rb") as archivo:
+                for linea in archivo:
+                    fila = de_linea(linea)
+                    if antes_de and (fila["fecha_accion"], fila["id_historial"]) >= antes_de:
+                        continue
+                    if not filtro(fila):
+                        continue
+                    total += 1
+                    if limite is not None:
+                        encontradas.append(fila)
+                        if len(encontradas) >= limite:
+                            return encontradas, total
+        return encontradas, total
+
+    async def buscar(self, meses: List[date], filtro: Callable[[dict], bool],
+                     antes_de: Optional[Tuple[datetime, int]], limite: int) -> List[dict]:
+        """Hasta `limite` filas de `meses` (más recientes primero) que cumplen `filtro`, después del cursor."""
+        filas, _ = await asyncio.to_thread(self._recorrer, meses, filtro, antes_de, limite)
+        return filas
+
+    def _contar(self, meses: List[date], filtro: FiltroArchivo, exacto: bool) -> int:
+        total = 0
+        parciales = []
+        for mes in meses:
+            if filtro.cubre_mes(mes) or not exacto:
+                total += sum(
+                    n for (id_usuario, accion, modulo), n in self._leer_conteos(mes).items()
+                    if filtro.coincide_grupo(id_usuario, accion, modulo)
+                )
+            else:
+                parciales.append(mes)
+        if parciales:
+            _, en_rango = self._recorrer(parciales, filtro, None, None)
+            total += en_rango
+        return total
+
+    async def contar(self, meses: List[date], filtro: FiltroArchivo, exacto: bool = True) -> int:
+        """
+        Filas de `meses` que cumplen `filtro`, desde los conteos de cada mes.
+        Solo los meses que el rango de fechas cubre en parte (a lo más los dos extremos)
+        se recorren, y solo si `exacto`; si no, se cuentan completos (estimado por arriba).
+        """
+        return await asyncio.to_thread(self._contar, meses, filtro, exacto)
+
+
+archivo_historial = ArchivoHistorial(settings.HISTORIAL_ARCHIVE_DIR)
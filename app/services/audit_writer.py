@@ -0,0 +1,172 @@
+# app/services/audit_writer.py
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, List, Optional
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import insert
+
+from app.core.config import settings
+from app.db.database import async_session
+from app.models.historial_acciones import HistorialAccion
+from app.utils.diff_auditoria import clave_entidad, diferencia
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class EventoAuditoria:
+    id_usuario: int
+    accion: str
+    modulo: str
+    descripcion: Optional[str] = None
+    datos_anteriores: Any = None      # Se serializan en el writer, fuera de la petición
+    datos_nuevos: Any = None
+    fecha_accion: datetime = field(default_factory=datetime.now)
+
+
+class AuditWriter:
+    """
+    Escritura diferida del historial de acciones.
+
+    - `registrar` solo encola el evento; si la cola está llena espera a que haya
+      espacio (la memoria queda acotada y no se pierden eventos).
+    - Un worker escribe los eventos con un INSERT multi-fila en su propia sesión,
+      cuando junta `batch_size` eventos o cuando pasan `flush_interval` segundos.
+    - Un lote fallido se reintenta con backoff exponencial hasta `max_reintentos`.
+    - `cerrar` escribe todo lo pendiente antes de detener el worker.
+    """
+
+    def __init__(self, session_factory, max_size: int, batch_size: int, flush_interval: float,
+                 max_reintentos: int = 3, backoff_base: float = 1.0):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_reintentos = max_reintentos
+        self.backoff_base = backoff_base
+        self._cola: asyncio.Queue = asyncio.Queue(maxsize=max_size)
+        self._lote_listo = asyncio.Event()
+        self._cerrando = False
+        self._tarea: Optional[asyncio.Task] = None
+        self.encolados = 0
+        self.escritos = 0
+        self.lotes = 0
+        self.errores = 0
+
+    async def registrar(self, evento: EventoAuditoria):
+        try:
+            self._cola.put_nowait(evento)
+        except asyncio.QueueFull:
+            logger.warning("Cola de auditoría llena: la petición espera a que se libere espacio")
+            await self._cola.put(evento)
+        self.encolados += 1
+        if self._cola.qsize() >= self.batch_size - 1:
+            self._lote_listo.set()
+
+    @staticmethod
+    def _fila(evento: EventoAuditoria) -> dict:
+        anteriores = jsonable_encoder(evento.datos_anteriores) if evento.datos_anteriores else None
+        nuevos = jsonable_encoder(evento.datos_nuevos) if evento.datos_nuevos else None
+        entidad = clave_entidad(nuevos) or clave_entidad(anteriores)
+
+        # Al modificar solo se guardan los campos que cambiaron; la vista completa se reconstruye al leer
+        es_diferencia = evento.accion == "modificar" and isinstance(anteriores, dict) and isinstance(nuevos, dict)
+        if es_diferencia:
+            anteriores, nuevos = diferencia(anteriores, nuevos)
+
+        return {
+            "id_usuario": evento.id_usuario,
+            "accion": evento.accion,
+            "modulo": evento.modulo,
+            "descripcion": evento.descripcion,
+            "datos_anteriores": anteriores,
+            "datos_nuevos": nuevos,
+            "fecha_accion": evento.fecha_accion,
+            "entidad": entidad,
+            "es_diferencia": es_diferencia,
+        }
+
+    async def _escribir(self, lote: List[EventoAuditoria]):
+        filas = []
+        for evento in lote:
+            try:
+                filas.append(self._fila(evento))
+            except Exception as e:
+                self.errores += 1
+                logger.error(f"No se pudo serializar el evento de auditoría {evento.accion}/{evento.modulo}: {e}")
+        if not filas:
+            return
+
+        for intento in range(self.max_reintentos + 1):
+            try:
+                async with self.session_factory() as db:
+                    await db.execute(insert(HistorialAccion), filas)
+                    await db.commit()
+                self.escritos += len(filas)
+                self.lotes += 1
+                return
+            except Exception as e:
+                self.errores += 1
+                if intento == self.max_reintentos:
+                    logger.error(f"Se descartan {len(filas)} registros de auditoría tras {intento + 1} intentos: {e}. Registros: {filas}")
+                    return
+                espera = self.backoff_base * (2 ** intento)
+                logger.warning(f"Error al escribir auditoría (intento {intento + 1}), reintento en {espera}s: {e}")
+                await asyncio.sleep(espera)
+
+    async def _worker(self):
+        while True:
+            primero = await self._cola.get()
+            # Esperar a juntar un lote completo o a que pase el intervalo
+            if not self._cerrando and self._cola.qsize() + 1 < self.batch_size:
+                self._lote_listo.clear()
+                try:
+                    await asyncio.wait_for(self._lote_listo.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+            lote = [primero]
+            while len(lote) < self.batch_size and not self._cola.empty():
+                lote.append(self._cola.get_nowait())
+            try:
+                await self._escribir(lote)
+            finally:
+                for _ in lote:
+                    self._cola.task_done()
+
+    def iniciar(self):
+        if self._tarea is None or self._tarea.done():
+            self._cerrando = False
+            self._tarea = asyncio.create_task(self._worker())
+
+    async def cerrar(self, timeout: float = 10.0):
+        """Escribe los eventos pendientes (con límite de tiempo) y detiene el worker."""
+        self._cerrando = True
+        self._lote_listo.set()
+        if self._tarea:
+            try:
+                await asyncio.wait_for(self._cola.join(), timeout)
+            except asyncio.TimeoutError:
+                logger.error(f"Se cerró la auditoría con {self._cola.qsize()} eventos sin escribir")
+            self._tarea.cancel()
+            await asyncio.gather(self._tarea, return_exceptions=True)
+            self._tarea = None
+
+    def metricas(self) -> dict:
+        return {
+            "pendientes": self._cola.qsize(),
+            "encolados": self.encolados,
+            "escritos": self.escritos,
+            "lotes": self.lotes,
+            "errores": self.errores,
+        }
+
+
+audit_writer = AuditWriter(
+    session_factory=async_session,
+    max_size=settings.AUDIT_QUEUE_MAX_SIZE,
+    batch_size=settings.AUDIT_BATCH_SIZE,
+    flush_interval=settings.AUDIT_FLUSH_SECONDS
+)
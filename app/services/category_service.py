@@ -2,6 +2,7 @@ from math import ceil
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.exc import IntegrityError
+from app.core.report_cache import report_cache
 from app.models.category import Category
 from app.models.product import Product
 from app.schemas.api_response import PaginationData
@@ -127,6 +128,7 @@ class CategoryService:
             category.name = new_name
             self.db.add(category)
             await self.db.commit()
+            report_cache.invalidar_todo()
             await self.db.refresh(category)
 
             return CategoryResponse.from_orm(category)
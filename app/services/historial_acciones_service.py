@@ -1,34 +1,46 @@
+import base64
+import json
 from datetime import datetime
 from sqlalchemy.orm import Session
 from app.models.historial_acciones import HistorialAccion
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import func, and_
+from sqlalchemy import func, and_, tuple_
 from app.models import HistorialAccion, Usuario
+from app.core.enums.modo_total import TotalMode
 from app.core.enums.responses import ResponseCode
-from app.schemas.api_response import PaginatedResponse, PaginationData
-from app.schemas.historial_acciones import HistorialAccionItem
-
-async def registrar_accion_async(
-    db: AsyncSession,
-    id_usuario: int,
-    accion: str,
-    modulo: str,
-    descripcion: str = None,
-    datos_anteriores: dict = None,
-    datos_nuevos: dict = None,
-):
-    historial = HistorialAccion(
-        id_usuario=id_usuario,
-        accion=accion,
-        modulo=modulo,
-        descripcion=descripcion,
-        datos_anteriores=datos_anteriores,
-        datos_nuevos=datos_nuevos,
-    )
-    db.add(historial)
-    await db.commit()
+from app.schemas.api_response import APIResponse
+from app.schemas.historial_acciones import HistorialAccionItem, HistorialPagina
+from app.services.archivo_historial import FiltroArchivo, archivo_historial
+from app.utils.diff_auditoria import aplicar, datos_de_respuesta
+
+COLUMNAS_HISTORIAL = HistorialAccion.__table__.columns.keys()
+
+
+def reproducir_cambios(filas) -> Dict[int, Tuple[dict, dict]]:
+    """
+    Recorre en orden los registros de cada objeto (modulo, entidad) y reconstruye el
+    estado completo antes/después de cada modificación guardada como diferencia.
+    Parte del último estado completo conocido (crear o registros anteriores); si no
+    lo hay, la vista solo incluye los campos que alguna vez cambiaron.
+    """
+    estados: Dict[tuple, Optional[dict]] = {}
+    vistas = {}
+    for fila in filas:
+        objeto = (fila.modulo, fila.entidad)
+        if fila.es_diferencia:
+            antes = aplicar(estados.get(objeto), fila.datos_anteriores)
+            despues = aplicar(antes, fila.datos_nuevos)
+            vistas[fila.id_historial] = (antes, despues)
+            estados[objeto] = despues
+        elif fila.accion == "eliminar":
+            estados[objeto] = None
+        else:
+            completo = datos_de_respuesta(fila.datos_nuevos)
+            if isinstance(completo, dict):
+                estados[objeto] = completo
+    return vistas
 
 
 class HistorialService:
@@ -44,30 +56,123 @@ class HistorialService:
         except ValueError:
             raise ValueError(f"Formato de fecha inválido: {fecha_str}. Use dd-mm-yyyy")
 
+    async def reconstruir_vistas(self, items: List[HistorialAccion]) -> Dict[int, Tuple[dict, dict]]:
+        """
+        Estado completo antes/después de las modificaciones de `items` guardadas como diferencia.
+        Una sola consulta trae la historia de todos los objetos involucrados.
+        """
+        objetivos = [h for h in items if h.es_diferencia and h.entidad]
+        if not objetivos:
+            return {}
+        objetos = {(h.modulo, h.entidad) for h in objetivos}
+        result = await self.db.execute(
+            select(
+                HistorialAccion.id_historial,
+                HistorialAccion.modulo,
+                HistorialAccion.entidad,
+                HistorialAccion.accion,
+                HistorialAccion.es_diferencia,
+                HistorialAccion.datos_anteriores,
+                HistorialAccion.datos_nuevos,
+            )
+            .where(
+                tuple_(HistorialAccion.modulo, HistorialAccion.entidad).in_(objetos),
+                HistorialAccion.id_historial <= max(h.id_historial for h in objetivos)
+            )
+            .order_by(HistorialAccion.id_historial)
+        )
+        return reproducir_cambios(result.all())
+
+    @staticmethod
+    def codificar_cursor(fecha_accion: datetime, id_historial: int) -> str:
+        crudo = json.dumps([fecha_accion.isoformat(), id_historial]).encode("utf-8")
+        return base64.urlsafe_b64encode(crudo).decode("ascii")
+
+    @staticmethod
+    def decodificar_cursor(cursor: str) -> Tuple[datetime, int]:
+        try:
+            fecha, id_historial = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+            return datetime.fromisoformat(fecha), int(id_historial)
+        except (ValueError, TypeError):
+            raise ValueError("El cursor de paginación no es válido.")
+
+    async def _contar(self, consulta, modo: TotalMode) -> Tuple[Optional[int], bool]:
+        """Total de registros del filtro: exacto con COUNT o estimado con el plan de Postgres."""
+        if modo == TotalMode.ninguno:
+            return None, False
+        conteo = select(func.count()).select_from(consulta.subquery())
+        if modo == TotalMode.estimado and self.db.get_bind().dialect.name == "postgresql":
+            # Misma sentencia compilada con sus parámetros: los filtros nunca se escriben en el SQL
+            compilada = consulta.compile(dialect=self.db.get_bind().dialect, compile_kwargs={"render_postcompile": True})
+            parametros = compilada.construct_params()
+            if compilada.positional:
+                parametros = tuple(parametros[nombre] for nombre in compilada.positiontup)
+            conexion = await self.db.connection()
+            plan = (await conexion.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compilada.string}", parametros)).scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return int(plan[0]["Plan"]["Plan Rows"]), True
+        return (await self.db.execute(conteo)).scalar() or 0, False
+
+    async def _filtro_archivo(self, usuario_nombre, accion, modulo, fecha_inicio, fecha_fin) -> FiltroArchivo:
+        """Los mismos filtros del listado, aplicados a las filas de los archivos."""
+        id_usuario = None
+        if usuario_nombre:
+            id_usuario = (await self.db.execute(
+                select(Usuario.id_usuario).where(Usuario.nombre_usuario == usuario_nombre.strip())
+            )).scalar()
+        return FiltroArchivo(
+            id_usuario=id_usuario,
+            por_usuario=bool(usuario_nombre),
+            accion=accion.strip() if accion else None,
+            modulo=modulo.strip() if modulo else None,
+            desde=fecha_inicio or None,
+            hasta=fecha_fin or None
+        )
+
+    @staticmethod
+    def _de_archivo(fila: dict) -> HistorialAccion:
+        return HistorialAccion(**{columna: fila.get(columna) for columna in COLUMNAS_HISTORIAL})
+
     async def listar_historial(
         self,
-        page: int = 1,
         per_page: int = 10,
+        cursor: Optional[str] = None,
         usuario_nombre: Optional[str] = None,
         accion: Optional[str] = None,
         modulo: Optional[str] = None,
         fecha_inicio: Optional[str] = None,
-        fecha_fin: Optional[str] = None
-    ) -> PaginatedResponse[HistorialAccionItem]:
+        fecha_fin: Optional[str] = None,
+        completo: bool = False,
+        total: TotalMode = TotalMode.ninguno
+    ) -> APIResponse[HistorialPagina]:
         """
-        Lista el historial de acciones con filtros opcionales y paginación.
-        """
-
-        query = select(HistorialAccion).join(Usuario)
+        Lista el historial de acciones del más reciente al más antiguo, por cursor.
 
+        - La página siguiente empieza después del (fecha_accion, id_historial) del cursor,
+          así que cualquier página cuesta lo mismo que la primera (sin OFFSET).
+        - Usuario, acción y módulo son filtros exactos, cubiertos por índices compuestos
+          que terminan en (fecha_accion, id_historial).
+        - El nombre del usuario sale en la misma consulta.
+        - El total es opcional: exacto (COUNT) o estimado por el planificador de Postgres.
+        - Cuando la tabla ya no alcanza a llenar la página y el rango de fechas llega a
+          meses archivados, la página se completa leyendo esos archivos (ver
+          app/services/archivo_historial.py); el cursor sigue funcionando igual.
+        - Con `completo`, las modificaciones guardadas como diferencia se devuelven
+          con el estado completo del objeto antes y después del cambio; las que vienen
+          de meses archivados se devuelven como diferencia (es_diferencia=True).
+        """
+        per_page = min(max(per_page, 1), 100)
         filtros = []
 
         if usuario_nombre:
-            filtros.append(Usuario.nombre_usuario.ilike(f"%{usuario_nombre}%"))
+            filtros.append(HistorialAccion.id_usuario == (
+                select(Usuario.id_usuario).where(Usuario.nombre_usuario == usuario_nombre.strip()).scalar_subquery()
+            ))
         if accion:
-            filtros.append(HistorialAccion.accion.ilike(f"%{accion}%"))
+            filtros.append(HistorialAccion.accion == accion.strip())
         if modulo:
-            filtros.append(HistorialAccion.modulo.ilike(f"%{modulo}%"))
+            filtros.append(HistorialAccion.modulo == modulo.strip())
         if fecha_inicio:
             if isinstance(fecha_inicio, str):
                 fecha_inicio = self.parse_fecha(fecha_inicio)
@@ -80,45 +185,79 @@ class HistorialService:
             fecha_fin = fecha_fin.replace(tzinfo=None)
             filtros.append(HistorialAccion.fecha_accion <= fecha_fin)
 
+        # Total de registros (opcional), sin el cursor
+        total_items, total_estimado = await self._contar(
+            select(HistorialAccion.id_historial).where(and_(*filtros)) if filtros
+            else select(HistorialAccion.id_historial),
+            total
+        )
+
+        antes_de = self.decodificar_cursor(cursor) if cursor else None
+        if antes_de:
+            filtros.append(tuple_(HistorialAccion.fecha_accion, HistorialAccion.id_historial) < tuple_(*antes_de))
+
+        query = (
+            select(HistorialAccion, Usuario.nombre_usuario)
+            .join(Usuario, Usuario.id_usuario == HistorialAccion.id_usuario)
+            .order_by(HistorialAccion.fecha_accion.desc(), HistorialAccion.id_historial.desc())
+            .limit(per_page + 1)
+        )
         if filtros:
             query = query.where(and_(*filtros))
 
-        # Total de registros
-        total_result = await self.db.execute(
-            select(func.count()).select_from(query.subquery())
-        )
-        total_items = total_result.scalar() or 0
-        total_pages = (total_items // per_page) + (1 if total_items % per_page else 0)
+        filas = (await self.db.execute(query)).all()
+        calientes = len(filas)
 
-        # Aplicar paginación
-        offset = (page - 1) * per_page
-        result = await self.db.execute(
-            query.order_by(HistorialAccion.fecha_accion.desc()).offset(offset).limit(per_page)
-        )
-        items = result.scalars().all()
+        # Meses archivados: solo si la tabla no llenó la página y el rango de fechas los incluye
+        meses_archivo = archivo_historial.meses_en_rango(fecha_inicio, fecha_fin)
+        if meses_archivo and (calientes <= per_page or total_items is not None):
+            filtro = await self._filtro_archivo(usuario_nombre, accion, modulo, fecha_inicio, fecha_fin)
+            if calientes <= per_page:
+                desde = (filas[-1][0].fecha_accion, filas[-1][0].id_historial) if filas else antes_de
+                archivadas = await archivo_historial.buscar(meses_archivo, filtro, desde, per_page + 1 - calientes)
+                filas += [(self._de_archivo(fila), fila.get("nombre_usuario") or "") for fila in archivadas]
+            if total_items is not None:
+                # Estimado: conteos por mes, sin recorrer los meses que el rango cubre en parte
+                exacto = total == TotalMode.exacto
+                total_items += await archivo_historial.contar(meses_archivo, filtro, exacto=exacto)
+                total_estimado = total_estimado or not exacto
+
+        hay_siguiente = len(filas) > per_page
+        filas = filas[:per_page]
+
+        items = [h for h, _ in filas]
+        # Las diferencias archivadas no se reconstruyen (su historia está repartida en los
+        # archivos): se devuelven tal cual, con es_diferencia=True
+        vistas = await self.reconstruir_vistas(items[:calientes]) if completo else {}
 
         # --- Convertir a Pydantic schema ---
-        items_schema = [
-            HistorialAccionItem(
+        items_schema = []
+        for h, nombre_usuario in filas:
+            datos_anteriores, datos_nuevos = h.datos_anteriores, h.datos_nuevos
+            if completo:
+                datos_anteriores, datos_nuevos = vistas.get(
+                    h.id_historial, (datos_de_respuesta(datos_anteriores), datos_de_respuesta(datos_nuevos))
+                )
+            items_schema.append(HistorialAccionItem(
                 id_historial=h.id_historial,
                 id_usuario=h.id_usuario,
-                nombre_usuario=h.usuario.nombre_usuario,
+                nombre_usuario=nombre_usuario,
                 accion=h.accion,
                 modulo=h.modulo,
                 descripcion=h.descripcion,
-                datos_anteriores=h.datos_anteriores,
-                datos_nuevos=h.datos_nuevos,
+                datos_anteriores=datos_anteriores,
+                datos_nuevos=datos_nuevos,
+                es_diferencia=bool(h.es_diferencia) and h.id_historial not in vistas,
                 fecha_accion=h.fecha_accion
-            )
-            for h in items
-        ]
+            ))
 
-        pagination = PaginationData(
+        ultimo = items[-1] if items else None
+        pagina = HistorialPagina(
             items=items_schema,
-            page=page,
             per_page=per_page,
+            next_cursor=self.codificar_cursor(ultimo.fecha_accion, ultimo.id_historial) if hay_siguiente else None,
             total_items=total_items,
-            total_pages=total_pages
+            total_estimado=total_estimado
         )
 
-        return PaginatedResponse.from_enum(ResponseCode.SUCCESS, data=pagination, detail="Historial listado correctamente")
+        return APIResponse.from_enum(ResponseCode.SUCCESS, data=pagina, detail="Historial listado correctamente")
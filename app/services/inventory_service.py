@@ -0,0 +1,58 @@
+from typing import Dict, Tuple
+from sqlalchemy import Integer, column, update, values
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.product import Product
+
+
+def _cantidades(cantidades: Dict[int, int]):
+    """Tabla VALUES (id_product, cantidad) ordenada por id, para un UPDATE ... FROM."""
+    return values(
+        column("id_product", Integer), column("cantidad", Integer), name="v"
+    ).data(sorted(cantidades.items()))
+
+
+async def descontar_inventarios(db: AsyncSession, cantidades: Dict[int, int]) -> Dict[int, Tuple[int, int]]:
+    """
+    Descuenta inventario de varios productos con un solo UPDATE ... FROM (VALUES ...)
+    condicional en el servidor: cada fila solo se actualiza si queda stock suficiente
+    (inventory >= cantidad).
+
+    `cantidades` es {id_product: cantidad total a descontar}.
+    Retorna {id_product: (inventario_anterior, inventario_nuevo)} de las filas actualizadas;
+    un producto sin stock suficiente no aparece en el resultado.
+    """
+    v = _cantidades(cantidades)
+    result = await db.execute(
+        update(Product)
+        .where(Product.id_product == v.c.id_product)
+        .where(Product.inventory >= v.c.cantidad)
+        .values(inventory=Product.inventory - v.c.cantidad)
+        .returning(Product.id_product, Product.inventory)
+        .execution_options(synchronize_session=False)
+    )
+    return {
+        id_product: (nuevo + cantidades[id_product], nuevo)
+        for id_product, nuevo in result.all()
+    }
+
+
+async def incrementar_inventarios(db: AsyncSession, cantidades: Dict[int, int]) -> Dict[int, Tuple[int, int]]:
+    """
+    Incrementa inventario de varios productos con un solo UPDATE ... FROM (VALUES ...)
+    atómico en el servidor.
+
+    Retorna {id_product: (inventario_anterior, inventario_nuevo)}; un producto que ya
+    no existe no aparece en el resultado.
+    """
+    v = _cantidades(cantidades)
+    result = await db.execute(
+        update(Product)
+        .where(Product.id_product == v.c.id_product)
+        .values(inventory=Product.inventory + v.c.cantidad)
+        .returning(Product.id_product, Product.inventory)
+        .execution_options(synchronize_session=False)
+    )
+    return {
+        id_product: (nuevo - cantidades[id_product], nuevo)
+        for id_product, nuevo in result.all()
+    }
@@ -0,0 +1,226 @@
+# app/services/mail_outbox.py
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from email.message import EmailMessage
+from typing import Dict, List, Optional, Tuple
+
+import aiosmtplib
+from sendgrid import SendGridAPIClient
+from sendgrid.helpers.mail import Mail
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class MailMessage:
+    to_emails: List[str]
+    subject: str
+    html_content: str
+    intentos: int = field(default=0)
+
+
+# ==============================
+# TRANSPORTES
+# ==============================
+
+class MailTransport(ABC):
+    """Interfaz de transporte: envía un mismo correo a una lista de destinatarios."""
+
+    @abstractmethod
+    async def send(self, to_emails: List[str], subject: str, html_content: str):
+        ...
+
+
+class SendGridTransport(MailTransport):
+    def __init__(self, api_key: str, from_email: str):
+        self.sg = SendGridAPIClient(api_key)
+        self.from_email = from_email
+
+    async def send(self, to_emails: List[str], subject: str, html_content: str):
+        message = Mail(
+            from_email=self.from_email,
+            to_emails=to_emails,
+            subject=subject,
+            html_content=html_content,
+            is_multiple=True  # un correo por destinatario
+        )
+        # El cliente de SendGrid es síncrono: se ejecuta fuera del event loop
+        response = await asyncio.to_thread(self.sg.send, message)
+        if response.status_code >= 400:
+            raise RuntimeError(f"SendGrid respondió {response.status_code}")
+        logger.info(f"[SendGrid] Correo enviado a {to_emails}. Código: {response.status_code}")
+
+
+class SMTPTransport(MailTransport):
+    """Transporte SMTP; sirve también contra un servidor SMTP falso local."""
+
+    def __init__(self, host: str, port: int, username: Optional[str], password: Optional[str],
+                 from_email: str, start_tls: bool, use_tls: bool):
+        self.host = host
+        self.port = port
+        self.username = username or None
+        self.password = password or None
+        self.from_email = from_email
+        self.start_tls = start_tls
+        self.use_tls = use_tls
+
+    async def send(self, to_emails: List[str], subject: str, html_content: str):
+        for to_email in to_emails:
+            message = EmailMessage()
+            message["From"] = self.from_email
+            message["To"] = to_email
+            message["Subject"] = subject
+            message.set_content(html_content, subtype="html")
+            await aiosmtplib.send(
+                message,
+                hostname=self.host,
+                port=self.port,
+                username=self.username,
+                password=self.password,
+                start_tls=self.start_tls,
+                use_tls=self.use_tls
+            )
+
+
+class MemoryTransport(MailTransport):
+    """Guarda los correos en memoria (pruebas y desarrollo local)."""
+
+    def __init__(self):
+        self.enviados: List[Tuple[List[str], str, str]] = []
+
+    async def send(self, to_emails: List[str], subject: str, html_content: str):
+        self.enviados.append((list(to_emails), subject, html_content))
+
+
+def crear_transporte(nombre: str) -> MailTransport:
+    if nombre == "smtp":
+        return SMTPTransport(
+            host=settings.MAIL_SERVER,
+            port=settings.MAIL_PORT,
+            username=settings.MAIL_USERNAME,
+            password=settings.MAIL_PASSWORD,
+            from_email=settings.MAIL_FROM,
+            start_tls=settings.MAIL_STARTTLS,
+            use_tls=settings.MAIL_SSL_TLS
+        )
+    if nombre == "memory":
+        return MemoryTransport()
+    return SendGridTransport(settings.SENDGRID_API_KEY, settings.MAIL_FROM)
+
+
+# ==============================
+# OUTBOX
+# ==============================
+
+class MailOutbox:
+    """
+    Cola de salida de correos en memoria.
+
+    - `encolar` no bloquea: solo agrega el mensaje a la cola.
+    - Un grupo de workers consume la cola; los mensajes con el mismo asunto y contenido
+      que estén esperando se agrupan en un solo envío con todos sus destinatarios.
+    - Los envíos fallidos se reintentan con backoff exponencial hasta `max_reintentos`.
+    """
+
+    def __init__(self, transport: MailTransport, workers: int, max_size: int, batch_size: int,
+                 max_reintentos: int, backoff_base: float):
+        self.transport = transport
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_reintentos = max_reintentos
+        self.backoff_base = backoff_base
+        self._cola: asyncio.Queue = asyncio.Queue(maxsize=max_size)
+        self._tareas: List[asyncio.Task] = []
+        self._reintentos: set = set()
+
+    def encolar(self, to_emails, subject: str, html_content: str) -> bool:
+        """Encola un correo. Retorna False si la cola está llena."""
+        if isinstance(to_emails, str):
+            to_emails = [to_emails]
+        try:
+            self._cola.put_nowait(MailMessage(list(to_emails), subject, html_content))
+            return True
+        except asyncio.QueueFull:
+            logger.error(f"Cola de correo llena: se descarta el correo '{subject}' para {to_emails}")
+            return False
+
+    def iniciar(self):
+        if self._tareas:
+            return
+        self._tareas = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def cerrar(self, timeout: float = 10.0):
+        """Espera a que se vacíe la cola (con límite de tiempo) y detiene los workers."""
+        if self._reintentos:
+            logger.warning(f"Se cancelan {len(self._reintentos)} reintentos de correo pendientes")
+        for handle in self._reintentos:
+            handle.cancel()
+        self._reintentos.clear()
+        if self._tareas:
+            try:
+                await asyncio.wait_for(self._cola.join(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Se cerró la cola de correo con {self._cola.qsize()} mensajes pendientes")
+        for tarea in self._tareas:
+            tarea.cancel()
+        await asyncio.gather(*self._tareas, return_exceptions=True)
+        self._tareas = []
+
+    def _tomar_lote(self, primero: MailMessage) -> List[MailMessage]:
+        lote = [primero]
+        while len(lote) < self.batch_size and not self._cola.empty():
+            lote.append(self._cola.get_nowait())
+        return lote
+
+    async def _worker(self):
+        while True:
+            lote = self._tomar_lote(await self._cola.get())
+            try:
+                grupos: Dict[Tuple[str, str], List[MailMessage]] = {}
+                for mensaje in lote:
+                    grupos.setdefault((mensaje.subject, mensaje.html_content), []).append(mensaje)
+                for mensajes in grupos.values():
+                    await self._enviar_grupo(mensajes)
+            finally:
+                for _ in lote:
+                    self._cola.task_done()
+
+    async def _enviar_grupo(self, mensajes: List[MailMessage]):
+        destinatarios = list(dict.fromkeys(email for m in mensajes for email in m.to_emails))
+        try:
+            await self.transport.send(destinatarios, mensajes[0].subject, mensajes[0].html_content)
+        except Exception as e:
+            for mensaje in mensajes:
+                self._programar_reintento(mensaje, e)
+
+    def _programar_reintento(self, mensaje: MailMessage, error: Exception):
+        mensaje.intentos += 1
+        if mensaje.intentos > self.max_reintentos:
+            logger.error(f"Correo '{mensaje.subject}' para {mensaje.to_emails} descartado tras {self.max_reintentos} reintentos: {error}")
+            return
+        espera = self.backoff_base * (2 ** (mensaje.intentos - 1))
+        logger.warning(f"Error al enviar correo '{mensaje.subject}' (intento {mensaje.intentos}), reintento en {espera}s: {error}")
+
+        def reencolar():
+            self._reintentos.discard(handle)
+            try:
+                self._cola.put_nowait(mensaje)
+            except asyncio.QueueFull:
+                logger.error(f"Cola de correo llena: se descarta el reintento de '{mensaje.subject}'")
+
+        handle = asyncio.get_running_loop().call_later(espera, reencolar)
+        self._reintentos.add(handle)
+
+
+mail_outbox = MailOutbox(
+    transport=crear_transporte(settings.MAIL_TRANSPORT),
+    workers=settings.MAIL_OUTBOX_WORKERS,
+    max_size=settings.MAIL_OUTBOX_MAX_SIZE,
+    batch_size=settings.MAIL_OUTBOX_BATCH_SIZE,
+    max_reintentos=settings.MAIL_MAX_RETRIES,
+    backoff_base=settings.MAIL_RETRY_BASE_SECONDS
+)
@@ -1,11 +1,7 @@
 # app/services/mail_service.py
 from datetime import datetime
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail
-from fastapi import BackgroundTasks
-from app.core.config import settings
+from app.services.mail_outbox import MailOutbox, mail_outbox
 from jinja2 import Environment, FileSystemLoader, select_autoescape
-import os
 
 # Configura la carpeta donde están tus plantillas HTML
 templates_env = Environment(
@@ -14,29 +10,17 @@ templates_env = Environment(
 )
 
 class MailService:
-    def __init__(self):
-        self.sg = SendGridAPIClient(settings.SENDGRID_API_KEY)
-        self.from_email = settings.MAIL_FROM
+    def __init__(self, outbox: MailOutbox = mail_outbox):
+        self.outbox = outbox
 
     def _render_template(self, template_name: str, context: dict) -> str:
         """Renderiza el HTML usando Jinja2."""
         template = templates_env.get_template(template_name)
         return template.render(context)
 
-    async def _send_email(self, to_email: str, subject: str, html_content: str):
-        """Envía el correo usando SendGrid."""
-        message = Mail(
-            from_email=self.from_email,
-            to_emails=to_email,
-            subject=subject,
-            html_content=html_content
-        )
-
-        try:
-            response = self.sg.send(message)
-            print(f"[SendGrid] Correo enviado a {to_email}. Código: {response.status_code}")
-        except Exception as e:
-            print(f"[SendGrid] Error al enviar correo: {e}")
+    async def _send_email(self, to_email, subject: str, html_content: str):
+        """Encola el correo en el outbox; el envío real lo hacen sus workers."""
+        self.outbox.encolar(to_email, subject, html_content)
 
     async def send_otp_email(self, email: str, otp: str, nombre_usuario: str):
         html_content = self._render_template("otp_email.html", {
@@ -4,6 +4,7 @@ from sqlalchemy import func
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.exc import IntegrityError
+from app.core.report_cache import REPORTE_INVENTARIO, REPORTE_VENTAS, CambioReporte, report_cache
 from app.models.product import Product
 from app.models.category import Category
 from app.schemas.api_response import PaginationData
@@ -53,6 +54,10 @@ class ProductService:
             raise ValueError("Error al registrar el producto. Verifique los datos.")
         
         await self.db.refresh(nuevo_producto)
+        # Un producto nuevo aparece en el reporte de inventario aunque no tenga movimientos
+        report_cache.invalidar(CambioReporte(
+            reportes=frozenset([REPORTE_INVENTARIO]), productos=((nuevo_producto.name, category.name),)
+        ))
         return ProductResponse(
             id_product=nuevo_producto.id_product,
             code=nuevo_producto.code,
@@ -157,6 +162,10 @@ class ProductService:
 
         await self.db.delete(product)
         await self.db.commit()
+        report_cache.invalidar(CambioReporte(
+            reportes=frozenset([REPORTE_VENTAS, REPORTE_INVENTARIO]),
+            productos=((product.name, category.name if category else None),)
+        ))
 
         return ProductResponse(
             id_product=product.id_product,
@@ -178,10 +187,14 @@ class ProductService:
             raise ValueError("El nombre actual del producto no puede estar vacío.")
 
         # Buscar producto exacto
-        result = await self.db.execute(select(Product).filter(Product.name == current_name))
+        result = await self.db.execute(
+            select(Product).options(selectinload(Product.category)).filter(Product.name == current_name)
+        )
         product = result.scalars().first()
         if not product:
             raise ValueError(f"No se encontró el producto con nombre '{current_name}'.")
+        # Nombre y categoría antes del cambio, para invalidar los reportes que los incluían
+        anterior = (product.name, product.category.name if product.category else None)
 
         # Convertimos request a dict y eliminamos campos None o strings vacías
         update_fields = {
@@ -233,6 +246,11 @@ class ProductService:
         category = result.scalars().first()
         category_name = category.name if category else "Sin Categoría"
 
+        report_cache.invalidar(CambioReporte(
+            reportes=frozenset([REPORTE_VENTAS, REPORTE_INVENTARIO]),
+            productos=(anterior, (product.name, category.name if category else None))
+        ))
+
         return ProductResponse(
             id_product=product.id_product,
             code=product.code,
@@ -1,15 +1,20 @@
 import asyncio
 from datetime import datetime
+from typing import Callable, Optional
+from sqlalchemy import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 
 from app.models.product import Product
 from app.models.purchases.purchases import Purchase
 from app.models.purchases.purchase_items import PurchaseItem
 from app.models.inventory_movements import InventoryMovement
 from app.core.enums.tipo_movimiento import MovementType
+from app.core.report_cache import REPORTE_INVENTARIO, CambioReporte, report_cache
 from app.schemas.purchases import PurchaseCreateRequest, PurchaseCreateResponse, PurchaseProductResponse
+from app.services.inventory_service import incrementar_inventarios
 from app.services.mail_service import MailService  # Opcional: si quieres alertas de inventario
 
 class PurchaseService:
@@ -17,7 +22,15 @@ class PurchaseService:
         self.db = db
         self.user_id = current_user_id
 
-    async def create_purchase(self, purchase_request: PurchaseCreateRequest) -> PurchaseCreateResponse:
+    async def create_purchase(
+        self,
+        purchase_request: PurchaseCreateRequest,
+        antes_de_confirmar: Optional[Callable[[PurchaseCreateResponse], None]] = None
+    ) -> PurchaseCreateResponse:
+        """
+        Registra una compra y suma su inventario. `antes_de_confirmar` recibe la respuesta
+        antes del commit (p. ej. para guardar la clave de idempotencia en la misma transacción).
+        """
         total_purchase = 0
         purchase_items_response = []
 
@@ -31,66 +44,106 @@ class PurchaseService:
         self.db.add(purchase)
         await self.db.flush()  # Para obtener el ID antes del commit
 
-        # 2️⃣ Iterar productos
+        purchase_items_rows = []
+        movement_rows = []
+        lineas = []  # (producto, inventario anterior, inventario nuevo) por cada item
+
+        # 2️⃣ Resolver todos los productos por nombre en una sola consulta,
+        # bloqueando las filas (FOR UPDATE) en orden de id para evitar deadlocks
+        nombres = {item.product_name for item in purchase_request.products}
+        result = await self.db.execute(
+            select(Product)
+            .where(Product.name.in_(nombres))
+            .options(selectinload(Product.category))
+            .order_by(Product.id_product)
+            .with_for_update(of=Product)
+        )
+        por_nombre = {}
+        for product in result.scalars().all():
+            if product.name in por_nombre:
+                raise ValueError(f"Hay más de un producto con el nombre '{product.name}'")
+            por_nombre[product.name] = product
+
+        cantidades = {}
         for item in purchase_request.products:
-            result = await self.db.execute(
-                select(Product).where(Product.name == item.product_name).options(selectinload(Product.category))
-            )
-            product: Product = result.scalar_one_or_none()
+            product = por_nombre.get(item.product_name)
             if not product:
                 raise ValueError(f"Producto '{item.product_name}' no encontrado")
+            cantidades[product.id_product] = cantidades.get(product.id_product, 0) + item.quantity
 
-            previous_inventory = product.inventory
-            new_inventory = previous_inventory + item.quantity  # ✅ Sumar al inventario
+        # ✅ Sumar al inventario de todos los productos con un solo UPDATE atómico en el servidor
+        inventarios = await incrementar_inventarios(self.db, cantidades)
+        if len(inventarios) != len(cantidades):
+            faltante = next(p for p in por_nombre.values() if p.id_product in cantidades and p.id_product not in inventarios)
+            raise ValueError(f"Producto '{faltante.name}' no encontrado")
+
+        restante = {id_product: anterior for id_product, (anterior, _) in inventarios.items()}
+        for item in purchase_request.products:
+            product = por_nombre[item.product_name]
+            previous_inventory = restante[product.id_product]
+            new_inventory = previous_inventory + item.quantity
+            restante[product.id_product] = new_inventory
+            set_committed_value(product, "inventory", new_inventory)
+            lineas.append((product, previous_inventory, new_inventory))
 
             # 3️⃣ Detalle de compra
-            purchase_item = PurchaseItem(
-                id_purchase=purchase.id_purchase,
-                id_product=product.id_product,
-                quantity=item.quantity,
-                price=item.price
-            )
-            self.db.add(purchase_item)
-
-            # 4️⃣ Actualizar inventario
-            product.inventory = new_inventory
-            self.db.add(product)
-
-            # 5️⃣ Movimiento de inventario
-            movement = InventoryMovement(
-                id_product=product.id_product,
-                movement_type=MovementType.ENTRADA,
-                quantity=item.quantity,
-                reason="compra",
-                related_id=purchase.id_purchase,
-                previous_inventory=previous_inventory,
-                new_inventory=new_inventory,
-                user_id=self.user_id,
-                date=datetime.utcnow()
-            )
-            self.db.add(movement)
+            purchase_items_rows.append({
+                "id_purchase": purchase.id_purchase,
+                "id_product": product.id_product,
+                "quantity": item.quantity,
+                "price": item.price
+            })
 
-            total_purchase += item.quantity * item.price
+            # 4️⃣ Movimiento de inventario
+            movement_rows.append({
+                "id_product": product.id_product,
+                "movement_type": MovementType.ENTRADA,
+                "quantity": item.quantity,
+                "reason": "compra",
+                "related_id": purchase.id_purchase,
+                "previous_inventory": previous_inventory,
+                "new_inventory": new_inventory,
+                "user_id": self.user_id,
+                "date": datetime.utcnow()
+            })
+
+        # Insertar detalle y movimientos con un INSERT multi-fila por tabla
+        result = await self.db.execute(
+            insert(PurchaseItem).returning(
+                PurchaseItem.quantity, PurchaseItem.price, sort_by_parameter_order=True
+            ),
+            purchase_items_rows
+        )
+        await self.db.execute(insert(InventoryMovement), movement_rows)
+
+        for row, (product, previous_inventory, new_inventory) in zip(result.all(), lineas):
+            total_purchase += row.quantity * row.price
             purchase_items_response.append(
                 PurchaseProductResponse(
                     product=product.name,
-                    quantity=item.quantity,
-                    price=float(item.price),
+                    quantity=row.quantity,
+                    price=float(row.price),
                     previous_inventory=previous_inventory,
                     new_inventory=new_inventory
                 )
             )
 
-        # 6️⃣ Confirmar compra
         purchase.total = total_purchase
-        await self.db.commit()
-        await self.db.refresh(purchase)
-
-        # 7️⃣ Retornar response
-        return PurchaseCreateResponse(
+        response = PurchaseCreateResponse(
             purchase_id=purchase.id_purchase,
             total=float(total_purchase),
             date=purchase.date,
             supplier_name=purchase.supplier_name,
             products=purchase_items_response
         )
+        if antes_de_confirmar:
+            antes_de_confirmar(response)
+
+        # 5️⃣ Confirmar compra
+        await self.db.commit()
+        report_cache.invalidar(CambioReporte.de_productos(
+            [REPORTE_INVENTARIO], [product for product, _, _ in lineas]
+        ))
+
+        # 6️⃣ Retornar response
+        return response
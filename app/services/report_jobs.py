@@ -0,0 +1,373 @@
+# app/services/report_jobs.py
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+import uuid
+from dataclasses import asdict
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Callable, Dict, List, NamedTuple, Optional, Set
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app.core.config import settings
+from app.core.enums.estado_job import ReportJobStatus
+from app.core.enums.formato_reporte import ReportFormat
+from app.core.enums.tipo_reporte import ReportType
+from app.core.report_cache import AlcanceReporte
+from app.db.database import async_session, sesion_lectura_reportes
+from app.models.jobs_reportes import JobReporte
+from app.schemas.reporte_inventario import ReporteInventarioRequest
+from app.schemas.reporte_jobs import ReporteJobResponse
+from app.schemas.reporte_ventas import ReporteVentasRequest
+from app.services.reporte_inventario_service import (
+    alcance_reporte_inventario,
+    construir_consulta_inventario,
+    exportar_reporte_inventario,
+    generar_reporte_inventario
+)
+from app.services.reporte_ventas_service import (
+    alcance_reporte_ventas,
+    construir_consulta_ventas,
+    exportar_reporte_ventas,
+    generar_reporte_ventas
+)
+
+logger = logging.getLogger(__name__)
+
+
+class TipoReporte(NamedTuple):
+    request: type
+    alcance: Callable
+    generar: Callable
+    construir_consulta: Callable
+    exportar: Callable
+
+
+TIPOS_REPORTE: Dict[ReportType, TipoReporte] = {
+    ReportType.ventas: TipoReporte(
+        ReporteVentasRequest, alcance_reporte_ventas, generar_reporte_ventas,
+        construir_consulta_ventas, exportar_reporte_ventas
+    ),
+    ReportType.inventario: TipoReporte(
+        ReporteInventarioRequest, alcance_reporte_inventario, generar_reporte_inventario,
+        construir_consulta_inventario, exportar_reporte_inventario
+    ),
+}
+
+
+class ColaReportesLlenaError(Exception):
+    def __init__(self, detail: str):
+        self.detail = detail
+
+
+ACTIVOS = (ReportJobStatus.pendiente, ReportJobStatus.en_proceso)
+
+
+def llave_job(id_usuario: int, tipo: ReportType, formato: ReportFormat, alcance: AlcanceReporte) -> str:
+    """
+    Huella estable (igual en todos los workers) de una solicitud: los conjuntos del
+    alcance se ordenan para que el orden o los duplicados de los filtros no cambien la llave.
+    """
+    campos = {
+        nombre: sorted(valor) if isinstance(valor, frozenset) else valor
+        for nombre, valor in asdict(alcance).items()
+    }
+    contenido = json.dumps([id_usuario, tipo.value, formato.value, campos], sort_keys=True, default=str)
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+
+class ReportJobManager:
+    """
+    Reportes pesados fuera de la petición.
+
+    - `crear` registra el job en jobs_reportes y lo encola en el proceso que recibió la
+      solicitud; un grupo fijo de workers genera los reportes con su propio pool de
+      conexiones (tantas como workers), sin tomar conexiones de las peticiones, o en la
+      réplica de lectura si está disponible.
+    - El registro es compartido: cualquier worker responde el estado y la descarga, y
+      solo al usuario que creó el job (o a un admin).
+    - Una solicitud idéntica del mismo usuario (mismo tipo, formato y filtros normalizados)
+      a un job pendiente o en proceso devuelve ese mismo job; un índice único parcial
+      lo garantiza entre workers.
+    - El resultado se escribe comprimido con gzip en `directorio` (compartido por los
+      workers) y expira `ttl_seconds` después de terminar; una tarea periódica borra los
+      jobs y archivos vencidos.
+    """
+
+    def __init__(self, session_factory, registro_factory, workers: int, max_pendientes: int,
+                 ttl_seconds: int, directorio: str, intervalo_limpieza: float = 60,
+                 intervalo_avance: float = 2.0):
+        self.session_factory = session_factory
+        self.registro_factory = registro_factory
+        self.workers = workers
+        self.ttl_seconds = ttl_seconds
+        self.directorio = directorio
+        self.intervalo_limpieza = intervalo_limpieza
+        self.intervalo_avance = intervalo_avance
+        self._cola: asyncio.Queue = asyncio.Queue(maxsize=max_pendientes)
+        self._reservados = 0            # lugares de la cola apartados por un `crear` en curso
+        self._locales: Set[str] = set()  # jobs encolados o en proceso en este worker
+        self._tareas: List[asyncio.Task] = []
+        self.en_proceso = 0
+        self.deduplicados = 0
+        self.terminados = 0
+        self.errores = 0
+
+    # ------------------------------
+    # API
+    # ------------------------------
+
+    @staticmethod
+    async def _activo(db, llave: str) -> Optional[JobReporte]:
+        result = await db.execute(
+            select(JobReporte).where(JobReporte.llave == llave, JobReporte.estado.in_(ACTIVOS))
+        )
+        return result.scalars().first()
+
+    async def crear(self, tipo: ReportType, formato: ReportFormat, filtros: dict, id_usuario: int) -> JobReporte:
+        """
+        Registra y encola un reporte y retorna su job (o el job idéntico que ya está en curso).
+        Lanza ValueError si los filtros no son válidos y ColaReportesLlenaError si la cola está llena.
+        """
+        definicion = TIPOS_REPORTE[tipo]
+        filtros_modelo = definicion.request.model_validate(filtros)
+        llave = llave_job(id_usuario, tipo, formato, definicion.alcance(filtros_modelo))
+
+        async with self.registro_factory() as db:
+            existente = await self._activo(db, llave)
+            if existente is not None:
+                self.deduplicados += 1
+                return existente
+
+            if self._cola.qsize() + self._reservados >= self._cola.maxsize:
+                raise ColaReportesLlenaError("Hay demasiados reportes en cola. Intenta de nuevo más tarde.")
+
+            job = JobReporte(
+                id=uuid.uuid4().hex,
+                id_usuario=id_usuario,
+                tipo=tipo,
+                formato=formato,
+                filtros=filtros_modelo.model_dump(mode="json"),
+                llave=llave,
+                estado=ReportJobStatus.pendiente,
+                bytes_generados=0,
+                creado=datetime.utcnow()
+            )
+            db.add(job)
+            self._reservados += 1
+            try:
+                await db.commit()
+            except IntegrityError:
+                # Otro worker registró el mismo job entre la búsqueda y el commit
+                await db.rollback()
+                existente = await self._activo(db, llave)
+                if existente is None:
+                    raise
+                self.deduplicados += 1
+                return existente
+            finally:
+                self._reservados -= 1
+
+        self._locales.add(job.id)
+        self._cola.put_nowait(job.id)
+        return job
+
+    async def obtener(self, id_job: str, id_usuario: int, es_admin: bool = False) -> Optional[JobReporte]:
+        """Job vigente; None si no existe, ya expiró o no es del usuario (salvo admins)."""
+        async with self.registro_factory() as db:
+            job = await db.get(JobReporte, id_job)
+        if job is None or (job.expira and job.expira <= datetime.utcnow()):
+            return None
+        if job.id_usuario != id_usuario and not es_admin:
+            return None
+        return job
+
+    async def a_respuesta(self, job: JobReporte) -> ReporteJobResponse:
+        posicion = None
+        if job.estado == ReportJobStatus.pendiente:
+            async with self.registro_factory() as db:
+                anteriores = await db.execute(
+                    select(func.count()).select_from(JobReporte).where(
+                        JobReporte.estado == ReportJobStatus.pendiente,
+                        JobReporte.creado < job.creado
+                    )
+                )
+            posicion = anteriores.scalar() + 1
+        return ReporteJobResponse(
+            id=job.id,
+            tipo=job.tipo,
+            formato=job.formato,
+            estado=job.estado,
+            posicion_en_cola=posicion,
+            bytes_generados=job.bytes_generados,
+            creado=job.creado,
+            iniciado=job.iniciado,
+            terminado=job.terminado,
+            expira=job.expira,
+            error=job.error
+        )
+
+    # ------------------------------
+    # EJECUCIÓN
+    # ------------------------------
+
+    async def _contenido(self, db, job: JobReporte) -> AsyncIterator[bytes]:
+        definicion = TIPOS_REPORTE[job.tipo]
+        filtros = definicion.request.model_validate(job.filtros)
+        if job.formato == ReportFormat.json:
+            reporte = await definicion.generar(db, filtros)
+            yield reporte.model_dump_json().encode("utf-8")
+            return
+        async for parte in definicion.exportar(db, definicion.construir_consulta(filtros), job.formato):
+            yield parte
+
+    async def _ejecutar(self, id_job: str):
+        async with self.registro_factory() as registro:
+            job = await registro.get(JobReporte, id_job)
+            if job is None or job.estado != ReportJobStatus.pendiente:
+                return
+            job.estado = ReportJobStatus.en_proceso
+            job.iniciado = datetime.utcnow()
+            await registro.commit()
+
+            self.en_proceso += 1
+            ruta = os.path.join(self.directorio, f"{job.id}.{job.formato.value}.gz")
+            try:
+                os.makedirs(self.directorio, exist_ok=True)
+                ultimo_avance = time.monotonic()
+                async with self.session_factory() as db:
+                    with gzip.open(ruta, "wb") as archivo:
+                        async for parte in self._contenido(db, job):
+                            # La compresión y escritura no bloquean el event loop
+                            await asyncio.to_thread(archivo.write, parte)
+                            job.bytes_generados += len(parte)
+                            # El avance se publica cada `intervalo_avance` segundos, no por parte
+                            if time.monotonic() - ultimo_avance >= self.intervalo_avance:
+                                await registro.commit()
+                                ultimo_avance = time.monotonic()
+                job.ruta = ruta
+                job.estado = ReportJobStatus.terminado
+                self.terminados += 1
+            except Exception as e:
+                job.estado = ReportJobStatus.error
+                job.error = str(e)
+                self.errores += 1
+                logger.error(f"Reporte {job.id} ({job.tipo.value}/{job.formato.value}) falló: {e}")
+            finally:
+                self.en_proceso -= 1
+                if job.estado != ReportJobStatus.terminado and os.path.exists(ruta):
+                    os.remove(ruta)
+                job.terminado = datetime.utcnow()
+                job.expira = job.terminado + timedelta(seconds=self.ttl_seconds)
+                await registro.commit()
+
+    async def _worker(self):
+        while True:
+            id_job = await self._cola.get()
+            try:
+                await self._ejecutar(id_job)
+            except Exception as e:
+                logger.error(f"No se pudo ejecutar el reporte {id_job}: {e}")
+            finally:
+                self._locales.discard(id_job)
+                self._cola.task_done()
+
+    # ------------------------------
+    # LIMPIEZA
+    # ------------------------------
+
+    async def _abandonar(self, db, condicion, motivo: str):
+        ahora = datetime.utcnow()
+        await db.execute(
+            update(JobReporte)
+            .where(condicion, JobReporte.estado.in_(ACTIVOS))
+            .values(estado=ReportJobStatus.error, error=motivo, terminado=ahora, expira=ahora)
+        )
+
+    async def purgar_expirados(self) -> int:
+        """
+        Elimina los jobs vencidos y sus archivos, y los archivos huérfanos.
+        Un job activo por más de `ttl_seconds` se da por perdido (el worker que lo tenía
+        terminó sin cerrar) y se marca con error para que no bloquee solicitudes idénticas.
+        """
+        ahora = datetime.utcnow()
+        async with self.registro_factory() as db:
+            await self._abandonar(
+                db, JobReporte.creado < ahora - timedelta(seconds=self.ttl_seconds),
+                "El reporte no terminó a tiempo; vuelve a solicitarlo."
+            )
+            result = await db.execute(
+                delete(JobReporte).where(JobReporte.expira <= ahora).returning(JobReporte.ruta)
+            )
+            rutas = result.scalars().all()
+            await db.commit()
+
+        for ruta in rutas:
+            if ruta and os.path.exists(ruta):
+                os.remove(ruta)
+
+        if os.path.isdir(self.directorio):
+            limite = time.time() - self.ttl_seconds
+            for nombre in os.listdir(self.directorio):
+                ruta = os.path.join(self.directorio, nombre)
+                if nombre.endswith(".gz") and os.path.getmtime(ruta) < limite:
+                    os.remove(ruta)
+        return len(rutas)
+
+    async def _ciclo_limpieza(self):
+        while True:
+            await asyncio.sleep(self.intervalo_limpieza)
+            try:
+                await self.purgar_expirados()
+            except Exception as e:
+                logger.error(f"Error al limpiar reportes vencidos: {e}")
+
+    def iniciar(self):
+        if self._tareas:
+            return
+        self._tareas = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tareas.append(asyncio.create_task(self._ciclo_limpieza()))
+
+    async def cerrar(self):
+        """Detiene los workers; los reportes encolados o en curso en este worker quedan con error."""
+        for tarea in self._tareas:
+            tarea.cancel()
+        await asyncio.gather(*self._tareas, return_exceptions=True)
+        self._tareas = []
+
+        if self._locales:
+            try:
+                async with self.registro_factory() as db:
+                    await self._abandonar(
+                        db, JobReporte.id.in_(self._locales),
+                        "El servidor se reinició antes de terminar el reporte; vuelve a solicitarlo."
+                    )
+                    await db.commit()
+            except Exception as e:
+                logger.error(f"No se pudieron cerrar los reportes pendientes: {e}")
+            self._locales.clear()
+
+    def metricas(self) -> dict:
+        return {
+            "pendientes": self._cola.qsize(),
+            "en_proceso": self.en_proceso,
+            "terminados": self.terminados,
+            "errores": self.errores,
+            "deduplicados": self.deduplicados,
+        }
+
+
+report_jobs = ReportJobManager(
+    session_factory=sesion_lectura_reportes,
+    registro_factory=async_session,
+    workers=settings.REPORT_JOBS_WORKERS,
+    max_pendientes=settings.REPORT_JOBS_MAX_PENDING,
+    ttl_seconds=settings.REPORT_JOBS_TTL_SECONDS,
+    directorio=settings.REPORT_JOBS_DIR or os.path.join(tempfile.gettempdir(), "back_logistica_reportes")
+)
@@ -1,5 +1,9 @@
-from sqlalchemy import select, and_
-from sqlalchemy.orm import selectinload
+from typing import AsyncIterator
+from sqlalchemy import Select, select, and_, case, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.enums.formato_reporte import ReportFormat
+from app.core.report_cache import REPORTE_INVENTARIO, AlcanceReporte
 from app.models import Product, Category, InventoryMovement
 from app.core.enums.tipo_movimiento import MovementType
 from app.core.enums.tipo_inventario import InventoryFilterType
@@ -8,18 +12,49 @@ from app.schemas.reporte_inventario import (
     ReporteInventarioResponse,
     ProductoInventario
 )
+from app.utils.exportacion import codificar_csv, codificar_ndjson
 
+COLUMNAS_CSV = list(ProductoInventario.model_fields)
 
-async def generar_reporte_inventario(db, filtros: ReporteInventarioRequest) -> ReporteInventarioResponse:
+
+def _suma_por_tipo(tipo: MovementType):
+    return func.coalesce(
+        func.sum(case((InventoryMovement.movement_type == tipo, InventoryMovement.quantity), else_=0)),
+        0
+    )
+
+
+def alcance_reporte_inventario(filtros: ReporteInventarioRequest) -> AlcanceReporte:
+    """Llave de caché del reporte: listas sin orden ni duplicados."""
+    return AlcanceReporte(
+        reporte=REPORTE_INVENTARIO,
+        categorias=AlcanceReporte.conjunto(filtros.categorias),
+        productos=AlcanceReporte.conjunto(filtros.productos),
+        tipo_inventario=filtros.tipo_inventario
+    )
+
+
+def construir_consulta_inventario(filtros: ReporteInventarioRequest) -> Select:
     """
-    Genera un reporte de inventario filtrado por:
-    - Categorías
-    - Productos específicos
-    - Tipo de inventario (bajo, bueno o todos)
+    Una sola consulta agrupada por producto: entradas y salidas con sumas condicionales
+    por MovementType y la fecha del último movimiento, unida a productos y categorías.
     """
-
-    # ✅ Cargar categoría sin lazy load (evita greenlet error)
-    query = select(Product).options(selectinload(Product.category)).join(Category)
+    query = (
+        select(
+            Product.id_product,
+            Product.name.label("nombre"),
+            Category.name.label("categoria"),
+            _suma_por_tipo(MovementType.ENTRADA).label("total_entradas"),
+            _suma_por_tipo(MovementType.SALIDA).label("total_salidas"),
+            Product.inventory.label("stock_actual"),
+            Product.min_inventory.label("minimo"),
+            func.max(InventoryMovement.date).label("ultima_actualizacion"),
+        )
+        .join(Category, Category.id == Product.id_category)
+        .outerjoin(InventoryMovement, InventoryMovement.id_product == Product.id_product)
+        .group_by(Product.id_product, Product.name, Category.name, Product.inventory, Product.min_inventory)
+        .order_by(Product.id_product)
+    )
     condiciones = []
 
     # 🔹 Filtrar por categorías
@@ -37,43 +72,59 @@ async def generar_reporte_inventario(db, filtros: ReporteInventarioRequest) -> R
         condiciones.append(Product.inventory > Product.min_inventory)
     # Si es "todos", no agregamos filtro
 
-    # 🔹 Aplicar condiciones al query
+    # 🔹 Aplicar condiciones antes de agrupar
     if condiciones:
-        query = query.filter(and_(*condiciones))
-
-    result = await db.execute(query)
-    productos = result.scalars().all()
-
-    reporte = []
-    total_stock_general = 0
-
-    for producto in productos:
-        # Movimientos asociados (para mostrar totales)
-        mov_query = select(InventoryMovement).filter(InventoryMovement.id_product == producto.id_product)
-        movimientos: list[InventoryMovement] = (await db.execute(mov_query)).scalars().all()
-
-        entradas = sum(m.quantity for m in movimientos if m.movement_type == MovementType.ENTRADA)
-        salidas = sum(m.quantity for m in movimientos if m.movement_type == MovementType.SALIDA)
-        ultima_actualizacion = max((m.date for m in movimientos), default=None)
-
-        total_stock_general += producto.inventory
-
-        reporte.append(
-            ProductoInventario(
-                id_product=producto.id_product,
-                nombre=producto.name,
-                categoria=producto.category.name if producto.category else "Sin categoría",
-                total_entradas=entradas,
-                total_salidas=salidas,
-                stock_actual=producto.inventory,
-                minimo=producto.min_inventory,
-                ultima_actualizacion=ultima_actualizacion
-            )
-        )
+        query = query.where(and_(*condiciones))
+    return query
 
 
+def fila_a_producto(fila) -> ProductoInventario:
+    return ProductoInventario(
+        id_product=fila.id_product,
+        nombre=fila.nombre,
+        categoria=fila.categoria or "Sin categoría",
+        total_entradas=fila.total_entradas,
+        total_salidas=fila.total_salidas,
+        stock_actual=fila.stock_actual,
+        minimo=fila.minimo,
+        ultima_actualizacion=fila.ultima_actualizacion
+    )
+
+
+async def generar_reporte_inventario(db, filtros: ReporteInventarioRequest) -> ReporteInventarioResponse:
+    """
+    Genera un reporte de inventario filtrado por:
+    - Categorías
+    - Productos específicos
+    - Tipo de inventario (bajo, bueno o todos)
+    """
+    result = await db.execute(construir_consulta_inventario(filtros))
+    reporte = [fila_a_producto(fila) for fila in result.all()]
+
     return ReporteInventarioResponse(
         productos=reporte,
         total_productos=len(reporte),
-        total_stock_general=total_stock_general
+        total_stock_general=sum(p.stock_actual for p in reporte)
     )
+
+
+async def _productos(db: AsyncSession, query: Select) -> AsyncIterator[ProductoInventario]:
+    # Cursor del lado del servidor: se leen REPORT_STREAM_BATCH_SIZE filas a la vez
+    result = await db.stream(query.execution_options(yield_per=settings.REPORT_STREAM_BATCH_SIZE))
+    async for fila in result:
+        yield fila_a_producto(fila)
+
+
+async def _filas_csv(db: AsyncSession, query: Select) -> AsyncIterator[tuple]:
+    async for producto in _productos(db, query):
+        yield tuple(getattr(producto, columna) for columna in COLUMNAS_CSV)
+
+
+def exportar_reporte_inventario(db: AsyncSession, query: Select, formato: ReportFormat) -> AsyncIterator[bytes]:
+    """
+    Reporte de inventario en CSV o NDJSON, generado por partes a medida que se leen
+    las filas; la memoria usada no depende del número de productos.
+    """
+    if formato == ReportFormat.csv:
+        return codificar_csv(_filas_csv(db, query), COLUMNAS_CSV)
+    return codificar_ndjson(_productos(db, query))
@@ -1,126 +1,387 @@
-from sqlalchemy import select, and_
+from sqlalchemy import Date, Select, select, and_, cast, func, union_all
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
-from datetime import datetime
+from datetime import date, datetime, time, timedelta
 from decimal import Decimal
-from typing import List
+from typing import AsyncIterator, List, Optional
 
-from app.models import Sale, SaleItem, Product, Usuario, Category
+from app.core.config import settings
+from app.core.enums.agrupacion_resumen import SummaryGroupBy
+from app.core.enums.formato_reporte import ReportFormat
+from app.core.report_cache import REPORTE_VENTAS, AlcanceReporte
+from app.models import Sale, SaleItem, Product, Usuario, Category, TicketDiario, VentaDiaria
 from app.schemas.reporte_ventas import (
     ReporteVentasRequest,
     ReporteVentasResponse,
     VentaReporte,
-    ProductoReporte
+    ProductoReporte,
+    ResumenVentasRequest,
+    ResumenVentasResponse,
+    FilaResumenVentas
 )
+from app.services.rollup_ventas_service import (
+    COLUMNAS_ROLLUP, COLUMNAS_TICKETS, consulta_ventas_agrupadas, consulta_tickets_agrupados
+)
+from app.utils.exportacion import codificar_csv, codificar_ndjson
 
+# Una línea por producto vendido
+COLUMNAS_CSV = [
+    "id_sale", "fecha", "usuario", "cliente", "total", "subtotal_venta",
+    "id_product", "producto", "categoria", "cantidad", "precio_unitario", "subtotal"
+]
 
-async def generar_reporte_ventas(db: AsyncSession, filtros: ReporteVentasRequest) -> ReporteVentasResponse:
+
+def _parsear_fecha(valor: Optional[str], campo: str) -> Optional[datetime]:
+    if not valor:
+        return None
+    try:
+        return datetime.fromisoformat(valor)
+    except ValueError:
+        raise ValueError(f"El formato de {campo} no es válido. Usa ISO 8601 (YYYY-MM-DD).")
+
+
+def alcance_reporte_ventas(filtros: ReporteVentasRequest) -> AlcanceReporte:
+    """Llave de caché del reporte: listas sin orden ni duplicados y fechas ya interpretadas."""
+    return AlcanceReporte(
+        reporte=REPORTE_VENTAS,
+        usuarios=AlcanceReporte.conjunto(filtros.nombres_usuario),
+        categorias=AlcanceReporte.conjunto(filtros.categorias),
+        productos=AlcanceReporte.conjunto(filtros.productos),
+        inicio=_parsear_fecha(filtros.fecha_inicio, "fecha_inicio"),
+        fin=_parsear_fecha(filtros.fecha_fin, "fecha_fin")
+    )
+
+
+def construir_consulta_ventas(filtros: ReporteVentasRequest) -> Select:
     """
-    Genera un reporte de ventas con filtros opcionales:
-    - Lista de nombres de usuarios o todos
-    - Rango de fechas
-    - Categorías
-    - Productos
+    Una fila por producto vendido, solo con las columnas del reporte.
+    Todos los filtros (usuarios, fechas, categorías y productos) se aplican en SQL y el
+    subtotal de cada venta (solo de las líneas filtradas) se calcula en la base de datos.
+    Las filas salen ordenadas por venta para agruparlas en una sola pasada.
     """
+    fecha_inicio = _parsear_fecha(filtros.fecha_inicio, "fecha_inicio")
+    fecha_fin = _parsear_fecha(filtros.fecha_fin, "fecha_fin")
 
-    # 🔹 Consulta base con relaciones cargadas
+    subtotal = (SaleItem.price * SaleItem.quantity)
     query = (
-        select(Sale)
-        .options(
-            selectinload(Sale.items)
-            .selectinload(SaleItem.product)
-            .selectinload(Product.category),
-            selectinload(Sale.usuario)
+        select(
+            Sale.id_sale,
+            Sale.date.label("fecha"),
+            Sale.id_user,
+            Usuario.nombre_usuario,
+            Sale.customer_name.label("cliente"),
+            Sale.total,
+            func.sum(subtotal).over(partition_by=Sale.id_sale).label("subtotal_venta"),
+            Product.id_product,
+            Product.name.label("nombre"),
+            Category.name.label("categoria"),
+            SaleItem.quantity.label("cantidad"),
+            SaleItem.price.label("precio_unitario"),
+            subtotal.label("subtotal"),
         )
         .join(Usuario, Usuario.id_usuario == Sale.id_user)
+        .join(SaleItem, SaleItem.id_sale == Sale.id_sale)
+        .join(Product, Product.id_product == SaleItem.id_product)
+        .join(Category, Category.id == Product.id_category)
+        .order_by(Sale.id_sale, SaleItem.id_sale_item)
     )
 
     condiciones = []
 
-    # 🔹 Fechas (manejo seguro)
-    fecha_inicio = None
-    fecha_fin = None
-    if filtros.fecha_inicio:
-        try:
-            fecha_inicio = datetime.fromisoformat(filtros.fecha_inicio)
-        except ValueError:
-            raise ValueError("El formato de fecha_inicio no es válido. Usa ISO 8601 (YYYY-MM-DD).")
-
-    if filtros.fecha_fin:
-        try:
-            fecha_fin = datetime.fromisoformat(filtros.fecha_fin)
-        except ValueError:
-            raise ValueError("El formato de fecha_fin no es válido. Usa ISO 8601 (YYYY-MM-DD).")
-
     # 🔹 Filtro por usuarios (lista de nombres)
-    if filtros.nombres_usuario and len(filtros.nombres_usuario) > 0:
+    if filtros.nombres_usuario:
         condiciones.append(Usuario.nombre_usuario.in_(filtros.nombres_usuario))
 
     # 🔹 Filtros de fecha
-    if fecha_inicio and fecha_fin:
-        condiciones.append(and_(Sale.date >= fecha_inicio, Sale.date <= fecha_fin))
-    elif fecha_inicio:
+    if fecha_inicio:
         condiciones.append(Sale.date >= fecha_inicio)
-    elif fecha_fin:
+    if fecha_fin:
         condiciones.append(Sale.date <= fecha_fin)
 
+    # 🔹 Filtros por categoría y producto (sobre las líneas de la venta)
+    if filtros.categorias:
+        condiciones.append(Category.name.in_(filtros.categorias))
+    if filtros.productos:
+        condiciones.append(Product.name.in_(filtros.productos))
+
     # 🔹 Aplicar condiciones
     if condiciones:
-        query = query.filter(and_(*condiciones))
+        query = query.where(and_(*condiciones))
+    return query
+
+
+def fila_a_producto(fila) -> ProductoReporte:
+    return ProductoReporte(
+        id_product=fila.id_product,
+        nombre=fila.nombre,
+        categoria=fila.categoria,
+        cantidad=fila.cantidad,
+        precio_unitario=fila.precio_unitario,
+        subtotal=fila.subtotal
+    )
+
+
+def fila_a_venta(fila) -> VentaReporte:
+    """Encabezado de la venta a partir de su primera fila; los productos se agregan después."""
+    return VentaReporte(
+        id_sale=fila.id_sale,
+        fecha=fila.fecha,
+        usuario=fila.nombre_usuario or f"ID {fila.id_user}",
+        cliente=fila.cliente,
+        total=fila.total,
+        subtotal=fila.subtotal_venta,
+        productos=[]
+    )
+
 
-    # 🔹 Ejecutar consulta
-    result = await db.execute(query)
-    ventas = result.scalars().unique().all()
+async def generar_reporte_ventas(db: AsyncSession, filtros: ReporteVentasRequest) -> ReporteVentasResponse:
+    """
+    Genera un reporte de ventas con filtros opcionales:
+    - Lista de nombres de usuarios o todos
+    - Rango de fechas
+    - Categorías
+    - Productos
+    """
+    result = await db.execute(construir_consulta_ventas(filtros))
 
     resultado: List[VentaReporte] = []
     total_general = Decimal("0.00")
 
-    # 🔹 Procesar ventas
-    for venta in ventas:
-        productos: List[ProductoReporte] = []
-        subtotal_venta = Decimal("0.00")
-
-        for item in venta.items:
-            producto = item.product
-            categoria = producto.category
-
-            # Filtros adicionales
-            if filtros.categorias and categoria.name not in filtros.categorias:
-                continue
-            if filtros.productos and producto.name not in filtros.productos:
-                continue
-
-            subtotal = item.price * item.quantity
-            subtotal_venta += subtotal
-
-            productos.append(
-                ProductoReporte(
-                    id_product=producto.id_product,
-                    nombre=producto.name,
-                    categoria=categoria.name,
-                    cantidad=item.quantity,
-                    precio_unitario=item.price,
-                    subtotal=subtotal
-                )
-            )
-
-        if not productos:
-            continue
-
-        venta_reporte = VentaReporte(
-            id_sale=venta.id_sale,
-            fecha=venta.date,
-            usuario=venta.usuario.nombre_usuario if venta.usuario else f"ID {venta.id_user}",
-            cliente=venta.customer_name,
-            total=venta.total,
-            productos=productos
-        )
-
-        resultado.append(venta_reporte)
-        total_general += venta.total
+    # 🔹 Agrupar filas consecutivas de la misma venta
+    for fila in result.all():
+        if not resultado or resultado[-1].id_sale != fila.id_sale:
+            resultado.append(fila_a_venta(fila))
+            total_general += fila.total
+        resultado[-1].productos.append(fila_a_producto(fila))
 
     return ReporteVentasResponse(
         ventas=resultado,
         total_general=total_general,
         total_ventas=len(resultado)
-    )
\ No newline at end of file
+    )
+
+
+async def _filas(db: AsyncSession, query: Select):
+    # Cursor del lado del servidor: se leen REPORT_STREAM_BATCH_SIZE filas a la vez
+    result = await db.stream(query.execution_options(yield_per=settings.REPORT_STREAM_BATCH_SIZE))
+    async for fila in result:
+        yield fila
+
+
+async def _filas_csv(db: AsyncSession, query: Select) -> AsyncIterator[tuple]:
+    async for fila in _filas(db, query):
+        yield (
+            fila.id_sale, fila.fecha, fila.nombre_usuario or f"ID {fila.id_user}", fila.cliente,
+            fila.total, fila.subtotal_venta, fila.id_product, fila.nombre, fila.categoria,
+            fila.cantidad, fila.precio_unitario, fila.subtotal
+        )
+
+
+async def _ventas(db: AsyncSession, query: Select) -> AsyncIterator[VentaReporte]:
+    # Las filas llegan ordenadas por venta: solo se mantiene en memoria la venta actual
+    venta: Optional[VentaReporte] = None
+    async for fila in _filas(db, query):
+        if venta is None or venta.id_sale != fila.id_sale:
+            if venta is not None:
+                yield venta
+            venta = fila_a_venta(fila)
+        venta.productos.append(fila_a_producto(fila))
+    if venta is not None:
+        yield venta
+
+
+def exportar_reporte_ventas(db: AsyncSession, query: Select, formato: ReportFormat) -> AsyncIterator[bytes]:
+    """
+    Reporte de ventas por partes a medida que se leen las filas:
+    CSV con una línea por producto vendido o NDJSON con una venta por línea.
+    """
+    if formato == ReportFormat.csv:
+        return codificar_csv(_filas_csv(db, query), COLUMNAS_CSV)
+    return codificar_ndjson(_ventas(db, query))
+
+
+# ==============================
+# RESUMEN DESDE ACUMULADOS DIARIOS
+# ==============================
+
+def _dias_completos(inicio: Optional[datetime], fin: Optional[datetime]):
+    """Primer y último día cubiertos completos por [inicio, fin] (None = sin límite)."""
+    primer_dia = None
+    if inicio:
+        primer_dia = inicio.date() if inicio.time() == time.min else inicio.date() + timedelta(days=1)
+    ultimo_dia = None
+    if fin:
+        ultimo_dia = fin.date() if fin.time() == time.max else fin.date() - timedelta(days=1)
+    return primer_dia, ultimo_dia
+
+
+def _fuente_por_dias(tabla, columnas: List[str], consulta_ventas, inicio: Optional[datetime], fin: Optional[datetime]):
+    """
+    Filas con la forma de `tabla` (un acumulado diario) para el rango pedido:
+    - días completos desde la tabla;
+    - días parciales en los extremos del rango (horas de inicio/fin) desde las ventas,
+      con `consulta_ventas`, que hace el mismo cálculo que el acumulado.
+    """
+    primer_dia, ultimo_dia = _dias_completos(inicio, fin)
+
+    # Rango dentro de un mismo día: no hay días completos, todo sale de las ventas
+    if primer_dia and ultimo_dia and primer_dia > ultimo_dia:
+        return consulta_ventas([Sale.date >= inicio, Sale.date <= fin]).subquery()
+
+    condiciones_rollup = []
+    if primer_dia:
+        condiciones_rollup.append(tabla.dia >= primer_dia)
+    if ultimo_dia:
+        condiciones_rollup.append(tabla.dia <= ultimo_dia)
+    partes = [select(*[getattr(tabla, columna) for columna in columnas]).where(*condiciones_rollup)]
+
+    if inicio and inicio.time() != time.min:
+        partes.append(consulta_ventas([
+            Sale.date >= inicio, Sale.date < datetime.combine(primer_dia, time.min)
+        ]))
+    if fin and fin.time() != time.max:
+        partes.append(consulta_ventas([
+            Sale.date >= datetime.combine(ultimo_dia + timedelta(days=1), time.min), Sale.date <= fin
+        ]))
+    return union_all(*partes).subquery() if len(partes) > 1 else partes[0].subquery()
+
+
+def construir_fuente_resumen(inicio: Optional[datetime], fin: Optional[datetime]):
+    """Filas con la forma de ventas_diarias (día × producto × usuario) para el rango pedido."""
+    return _fuente_por_dias(VentaDiaria, COLUMNAS_ROLLUP, consulta_ventas_agrupadas, inicio, fin)
+
+
+def construir_fuente_tickets(inicio: Optional[datetime], fin: Optional[datetime]):
+    """Filas con la forma de tickets_diarios (día × usuario) para el rango pedido."""
+    return _fuente_por_dias(TicketDiario, COLUMNAS_TICKETS, consulta_tickets_agrupados, inicio, fin)
+
+
+def _condiciones_resumen(filtros: ResumenVentasRequest) -> list:
+    condiciones = []
+    if filtros.nombres_usuario:
+        condiciones.append(Usuario.nombre_usuario.in_(filtros.nombres_usuario))
+    if filtros.categorias:
+        condiciones.append(Category.name.in_(filtros.categorias))
+    if filtros.productos:
+        condiciones.append(Product.name.in_(filtros.productos))
+    return condiciones
+
+
+def construir_consulta_tickets(
+    filtros: ResumenVentasRequest, inicio: Optional[datetime], fin: Optional[datetime]
+) -> Select:
+    """
+    Tickets (ventas distintas) por día, usuario o categoría. Una venta con varios
+    productos cuenta una sola vez, así que no se suman los tickets por producto:
+    - por día o usuario, sin filtros de producto ni categoría: se suma tickets_diarios
+      (cada venta tiene un solo día y un solo usuario);
+    - si no: COUNT(DISTINCT id_sale) sobre las ventas del rango.
+    """
+    if filtros.agrupar_por in (SummaryGroupBy.dia, SummaryGroupBy.usuario) \
+            and not filtros.productos and not filtros.categorias:
+        fuente = construir_fuente_tickets(inicio, fin)
+        clave = fuente.c.dia if filtros.agrupar_por == SummaryGroupBy.dia else Usuario.nombre_usuario
+        query = (
+            select(clave.label("clave"), func.sum(fuente.c.tickets).label("tickets"))
+            .select_from(fuente)
+            .join(Usuario, Usuario.id_usuario == fuente.c.id_user)
+            .group_by(clave)
+        )
+    else:
+        claves = {
+            SummaryGroupBy.dia: cast(Sale.date, Date),
+            SummaryGroupBy.usuario: Usuario.nombre_usuario,
+            SummaryGroupBy.categoria: Category.name,
+        }
+        clave = claves[filtros.agrupar_por]
+        query = (
+            select(clave.label("clave"), func.count(func.distinct(Sale.id_sale)).label("tickets"))
+            .join(SaleItem, SaleItem.id_sale == Sale.id_sale)
+            .join(Product, Product.id_product == SaleItem.id_product)
+            .join(Category, Category.id == Product.id_category)
+            .join(Usuario, Usuario.id_usuario == Sale.id_user)
+            .group_by(clave)
+        )
+        if inicio:
+            query = query.where(Sale.date >= inicio)
+        if fin:
+            query = query.where(Sale.date <= fin)
+
+    condiciones = _condiciones_resumen(filtros)
+    if condiciones:
+        query = query.where(and_(*condiciones))
+    return query
+
+
+def construir_consulta_resumen(filtros: ResumenVentasRequest) -> Select:
+    inicio = _parsear_fecha(filtros.fecha_inicio, "fecha_inicio")
+    fin = _parsear_fecha(filtros.fecha_fin, "fecha_fin")
+    fuente = construir_fuente_resumen(inicio, fin)
+
+    agrupaciones = {
+        SummaryGroupBy.dia: (fuente.c.dia, [fuente.c.dia]),
+        SummaryGroupBy.producto: (Product.name, [Product.id_product, Product.name]),
+        SummaryGroupBy.usuario: (Usuario.nombre_usuario, [Usuario.nombre_usuario]),
+        SummaryGroupBy.categoria: (Category.name, [Category.name]),
+    }
+    clave, columnas_grupo = agrupaciones[filtros.agrupar_por]
+    por_producto = filtros.agrupar_por == SummaryGroupBy.producto
+
+    columnas = [
+        clave.label("clave"),
+        func.sum(fuente.c.cantidad).label("cantidad"),
+        func.sum(fuente.c.ingresos).label("ingresos"),
+    ]
+    if por_producto:
+        # Por producto los tickets de ventas_diarias sí se pueden sumar (entre días y usuarios)
+        columnas.append(func.sum(fuente.c.tickets).label("tickets"))
+
+    query = (
+        select(*columnas)
+        .select_from(fuente)
+        .join(Product, Product.id_product == fuente.c.id_product)
+        .join(Category, Category.id == Product.id_category)
+        .join(Usuario, Usuario.id_usuario == fuente.c.id_user)
+        .group_by(*columnas_grupo)
+    )
+    condiciones = _condiciones_resumen(filtros)
+    if condiciones:
+        query = query.where(and_(*condiciones))
+    if por_producto:
+        return query.order_by(*columnas_grupo)
+
+    totales = query.subquery()
+    tickets = construir_consulta_tickets(filtros, inicio, fin).subquery()
+    return (
+        select(
+            totales.c.clave,
+            totales.c.cantidad,
+            totales.c.ingresos,
+            func.coalesce(tickets.c.tickets, 0).label("tickets"),
+        )
+        .outerjoin(tickets, tickets.c.clave == totales.c.clave)
+        .order_by(totales.c.clave)
+    )
+
+
+async def generar_resumen_ventas(db: AsyncSession, filtros: ResumenVentasRequest) -> ResumenVentasResponse:
+    """
+    Totales de ventas (cantidad, ingresos y tickets) agrupados por día, producto, usuario o categoría.
+    Los días completos se leen de ventas_diarias y tickets_diarios; solo los días parciales del
+    rango se calculan desde las ventas, así que el costo no crece con el largo del rango.
+    Los tickets por categoría o con filtros de producto/categoría se cuentan desde las ventas.
+    """
+    result = await db.execute(construir_consulta_resumen(filtros))
+    filas = [
+        FilaResumenVentas(
+            clave=str(fila.clave),
+            cantidad=fila.cantidad or 0,
+            ingresos=fila.ingresos or Decimal("0.00"),
+            tickets=fila.tickets or 0
+        )
+        for fila in result.all()
+    ]
+    return ResumenVentasResponse(
+        filas=filas,
+        total_cantidad=sum(f.cantidad for f in filas),
+        total_ingresos=sum((f.ingresos for f in filas), Decimal("0.00"))
+    )
@@ -0,0 +1,217 @@
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import Date, Select, and_, cast, delete, func, insert, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Sale, SaleItem, TicketDiario, VentaDiaria
+
+COLUMNAS_ROLLUP = ["dia", "id_product", "id_user", "cantidad", "ingresos", "tickets"]
+COLUMNAS_TICKETS = ["dia", "id_user", "tickets"]
+
+
+# ==============================
+# MANTENIMIENTO EN LÍNEA
+# ==============================
+
+def _upsert_ventas_diarias():
+    stmt = pg_insert(VentaDiaria)
+    return stmt.on_conflict_do_update(
+        index_elements=[VentaDiaria.dia, VentaDiaria.id_product, VentaDiaria.id_user],
+        set_={
+            "cantidad": VentaDiaria.cantidad + stmt.excluded.cantidad,
+            "ingresos": VentaDiaria.ingresos + stmt.excluded.ingresos,
+            "tickets": VentaDiaria.tickets + stmt.excluded.tickets,
+        }
+    )
+
+
+def _upsert_tickets_diarios():
+    stmt = pg_insert(TicketDiario)
+    return stmt.on_conflict_do_update(
+        index_elements=[TicketDiario.dia, TicketDiario.id_user],
+        set_={"tickets": TicketDiario.tickets + stmt.excluded.tickets}
+    )
+
+
+async def acumular_venta(db: AsyncSession, fecha: datetime, id_user: int, lineas: List[Tuple[int, int, Decimal]]):
+    """
+    Suma una venta a ventas_diarias con un solo upsert multi-fila y cuenta su ticket
+    en tickets_diarios. `lineas` son (id_product, cantidad, precio). Se llama dentro
+    de la transacción de la venta: si la venta se revierte, los acumulados también.
+    """
+    por_producto: Dict[int, list] = {}
+    for id_product, cantidad, precio in lineas:
+        acumulado = por_producto.setdefault(id_product, [0, Decimal("0")])
+        acumulado[0] += cantidad
+        acumulado[1] += precio * cantidad
+
+    # Orden fijo de filas para que ventas concurrentes bloqueen en el mismo orden
+    filas = [
+        {
+            "dia": fecha.date(),
+            "id_product": id_product,
+            "id_user": id_user,
+            "cantidad": cantidad,
+            "ingresos": ingresos,
+            "tickets": 1,
+        }
+        for id_product, (cantidad, ingresos) in sorted(por_producto.items())
+    ]
+    if filas:
+        await db.execute(_upsert_ventas_diarias(), filas)
+        await db.execute(_upsert_tickets_diarios(), [{"dia": fecha.date(), "id_user": id_user, "tickets": 1}])
+
+
+# ==============================
+# LECTURA DESDE VENTAS
+# ==============================
+
+def rango_de_dias(desde: Optional[date], hasta: Optional[date]) -> list:
+    """Condiciones sobre Sale.date que cubren los días [desde, hasta] completos."""
+    condiciones = []
+    if desde:
+        condiciones.append(Sale.date >= datetime.combine(desde, time.min))
+    if hasta:
+        condiciones.append(Sale.date < datetime.combine(hasta + timedelta(days=1), time.min))
+    return condiciones
+
+
+def _rango_rollup(desde: Optional[date], hasta: Optional[date], tabla=VentaDiaria) -> list:
+    condiciones = []
+    if desde:
+        condiciones.append(tabla.dia >= desde)
+    if hasta:
+        condiciones.append(tabla.dia <= hasta)
+    return condiciones
+
+
+def consulta_ventas_agrupadas(condiciones: list) -> Select:
+    """
+    Mismo cálculo que ventas_diarias, hecho directamente sobre sales/sale_items.
+    `condiciones` filtra las ventas (normalmente por Sale.date).
+    """
+    dia = cast(Sale.date, Date)
+    query = (
+        select(
+            dia.label("dia"),
+            SaleItem.id_product,
+            Sale.id_user,
+            func.sum(SaleItem.quantity).label("cantidad"),
+            func.sum(SaleItem.price * SaleItem.quantity).label("ingresos"),
+            func.count(func.distinct(Sale.id_sale)).label("tickets"),
+        )
+        .join(SaleItem, SaleItem.id_sale == Sale.id_sale)
+        .group_by(dia, SaleItem.id_product, Sale.id_user)
+    )
+    if condiciones:
+        query = query.where(and_(*condiciones))
+    return query
+
+
+def consulta_tickets_agrupados(condiciones: list) -> Select:
+    """Mismo cálculo que tickets_diarios, hecho directamente sobre sales/sale_items."""
+    dia = cast(Sale.date, Date)
+    query = (
+        select(
+            dia.label("dia"),
+            Sale.id_user,
+            func.count(func.distinct(Sale.id_sale)).label("tickets"),
+        )
+        .join(SaleItem, SaleItem.id_sale == Sale.id_sale)
+        .group_by(dia, Sale.id_user)
+    )
+    if condiciones:
+        query = query.where(and_(*condiciones))
+    return query
+
+
+# ==============================
+# RECONSTRUCCIÓN Y VERIFICACIÓN
+# ==============================
+
+async def reconstruir_rollup(db: AsyncSession, desde: Optional[date] = None, hasta: Optional[date] = None) -> int:
+    """
+    Recalcula ventas_diarias y tickets_diarios desde las ventas para el rango de días
+    (todo si no se indica). Bloquea las tablas mientras tanto: las ventas concurrentes
+    esperan y se suman después.
+    Retorna el número de filas generadas en ventas_diarias.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        await db.execute(text("LOCK TABLE ventas_diarias, tickets_diarios IN EXCLUSIVE MODE"))
+
+    await db.execute(delete(VentaDiaria).where(*_rango_rollup(desde, hasta)))
+    await db.execute(delete(TicketDiario).where(*_rango_rollup(desde, hasta, TicketDiario)))
+
+    result = await db.execute(
+        insert(VentaDiaria).from_select(COLUMNAS_ROLLUP, consulta_ventas_agrupadas(rango_de_dias(desde, hasta)))
+    )
+    await db.execute(
+        insert(TicketDiario).from_select(COLUMNAS_TICKETS, consulta_tickets_agrupados(rango_de_dias(desde, hasta)))
+    )
+    await db.commit()
+    return result.rowcount
+
+
+def _totales_por_dia(fuente, tickets) -> Select:
+    """
+    Cantidad e ingresos de `fuente` (forma de ventas_diarias) y tickets de `tickets`
+    (forma de tickets_diarios) por día. Los tickets por producto no se suman: una venta
+    con varios productos contaría varias veces.
+    """
+    por_dia = (
+        select(
+            fuente.c.dia,
+            func.sum(fuente.c.cantidad).label("cantidad"),
+            func.sum(fuente.c.ingresos).label("ingresos"),
+        )
+        .group_by(fuente.c.dia)
+        .subquery()
+    )
+    tickets_por_dia = (
+        select(tickets.c.dia, func.sum(tickets.c.tickets).label("tickets"))
+        .group_by(tickets.c.dia)
+        .subquery()
+    )
+    return (
+        select(
+            func.coalesce(por_dia.c.dia, tickets_por_dia.c.dia).label("dia"),
+            por_dia.c.cantidad,
+            por_dia.c.ingresos,
+            tickets_por_dia.c.tickets,
+        )
+        .select_from(por_dia)
+        .join(tickets_por_dia, tickets_por_dia.c.dia == por_dia.c.dia, full=True)
+    )
+
+
+async def verificar_rollup(db: AsyncSession, desde: Optional[date] = None, hasta: Optional[date] = None) -> List[dict]:
+    """
+    Compara por día los totales de ventas_diarias y tickets_diarios contra las ventas.
+    Retorna los días con diferencias (lista vacía si todo cuadra).
+    """
+    rollup = select(VentaDiaria).where(*_rango_rollup(desde, hasta)).subquery()
+    rollup_tickets = select(TicketDiario).where(*_rango_rollup(desde, hasta, TicketDiario)).subquery()
+    ventas = consulta_ventas_agrupadas(rango_de_dias(desde, hasta)).subquery()
+    ventas_tickets = consulta_tickets_agrupados(rango_de_dias(desde, hasta)).subquery()
+
+    def a_dict(result):
+        return {
+            str(fila.dia): (int(fila.cantidad or 0), Decimal(fila.ingresos or 0), int(fila.tickets or 0))
+            for fila in result.all()
+        }
+
+    esperado = a_dict(await db.execute(_totales_por_dia(ventas, ventas_tickets)))
+    actual = a_dict(await db.execute(_totales_por_dia(rollup, rollup_tickets)))
+
+    diferencias = []
+    for dia in sorted(set(esperado) | set(actual)):
+        if esperado.get(dia) != actual.get(dia):
+            diferencias.append({
+                "dia": dia,
+                "ventas": esperado.get(dia),
+                "rollup": actual.get(dia),
+            })
+    return diferencias
@@ -1,27 +1,212 @@
-import asyncio
 from datetime import datetime
-from sqlalchemy import or_
+from typing import Callable, List, Optional
+from sqlalchemy import insert, or_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from app.models.product import Product
 from app.models.sales.sales import Sale
 from app.models.sales.sale_items import SaleItem
 from app.models.inventory_movements import InventoryMovement
+from app.models.idempotency_keys import ClaveIdempotencia
 from app.core.enums.tipo_movimiento import MovementType
-from app.models.user import Usuario
-from app.schemas.sales import SaleCreateRequest, SaleCreateResponse, SaleProductResponse
-from app.services.mail_service import MailService  # <- tus schemas
+from app.core.enums.responses import ResponseCode
+from app.core.idempotency import idempotency_store
+from app.core.report_cache import REPORTE_INVENTARIO, REPORTE_VENTAS, CambioReporte, report_cache
+from app.schemas.sales import (
+    SaleCreateRequest,
+    SaleCreateResponse,
+    SaleProductRequest,
+    SaleProductResponse,
+    SaleSyncRecord,
+    SaleSyncResult
+)
 from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from app.services.inventory_service import descontar_inventarios
+from app.services.rollup_ventas_service import acumular_venta
+from app.services.stock_alert_service import stock_alert_aggregator
 
 class SaleService:
-    def __init__(self, db: AsyncSession, current_user_id: int):
+    def __init__(self, db: AsyncSession, current_user_id: int, current_user_name: Optional[str] = None):
         self.db = db
         self.user_id = current_user_id
+        self.user_name = current_user_name  # Para invalidar solo los reportes de este usuario
 
-    async def create_sale(self, sale_request: SaleCreateRequest) -> SaleCreateResponse:
+    async def _obtener_productos_bloqueados(self, items: List[SaleProductRequest]) -> List[Product]:
+        """
+        Obtiene en un solo round trip todos los productos referenciados por código
+        o código de barras, bloqueándolos con FOR UPDATE ordenados por id_product.
+        El orden fijo garantiza que dos ventas concurrentes tomen los locks en la
+        misma secuencia y no se bloqueen mutuamente.
+        """
+        codes = {item.product_code for item in items if item.product_code}
+        barcodes = {item.barcode for item in items if item.barcode}
+
+        condiciones = []
+        if codes:
+            condiciones.append(Product.code.in_(codes))
+        if barcodes:
+            condiciones.append(Product.barcode.in_(barcodes))
+        if not condiciones:
+            return []
+
+        query = (
+            select(Product)
+            .options(selectinload(Product.category))
+            .where(or_(*condiciones))
+            .order_by(Product.id_product)
+            .with_for_update(of=Product)
+        )
+        result = await self.db.execute(query)
+        return list(result.scalars().all())
+
+    @staticmethod
+    def _buscar_producto(productos: List[Product], item: SaleProductRequest) -> Optional[Product]:
+        """Coincide por código de barras o por código, igual que la consulta por item."""
+        if item.barcode:
+            product = next((p for p in productos if p.barcode == item.barcode), None)
+            if product:
+                return product
+        if item.product_code:
+            return next((p for p in productos if p.code == item.product_code), None)
+        return None
+
+    def _cambio_reporte(self, fecha: datetime, productos: List[Product]) -> CambioReporte:
+        return CambioReporte.de_productos(
+            [REPORTE_VENTAS, REPORTE_INVENTARIO], productos, fecha=fecha, usuario=self.user_name
+        )
+
+    async def create_sale(
+        self,
+        sale_request: SaleCreateRequest,
+        antes_de_confirmar: Optional[Callable[[SaleCreateResponse], None]] = None
+    ) -> SaleCreateResponse:
         """
         Crea una venta con múltiples productos, valida inventario, registra detalle y movimientos.
         También envía alerta por correo si algún producto queda bajo el inventario mínimo.
+        `antes_de_confirmar` recibe la respuesta antes del commit (p. ej. para guardar la
+        clave de idempotencia en la misma transacción).
+        """
+        # Resolver todos los productos de la venta en una sola consulta,
+        # bloqueando las filas (FOR UPDATE) en orden de id para evitar deadlocks
+        productos = await self._obtener_productos_bloqueados(sale_request.products)
+
+        response = await self._registrar_venta(sale_request, productos)
+        if antes_de_confirmar:
+            antes_de_confirmar(response)
+
+        # Confirmar venta
+        await self.db.commit()
+
+        report_cache.invalidar(self._cambio_reporte(response.date, productos))
+        stock_alert_aggregator.registrar(response.low_stock_products)
+        return response
+
+    @staticmethod
+    def _restaurar_inventario(productos: List[Product], inventarios: dict):
+        # El SAVEPOINT revirtió el descuento: restaurar el inventario en memoria
+        for product in productos:
+            set_committed_value(product, "inventory", inventarios[product.id_product])
+
+    def _clave_sincronizacion(self, client_id: str) -> str:
+        return f"sales-sync:{self.user_id}:{client_id}"
+
+    def _resultado_previo(self, registro: SaleSyncRecord, fila: ClaveIdempotencia) -> SaleSyncResult:
+        """Resultado de una venta que ya se había sincronizado con el mismo client_id."""
+        try:
+            guardado = idempotency_store.resultado(fila, registro.model_dump_json())
+        except ValueError:
+            return SaleSyncResult.from_enum(
+                ResponseCode.VALIDATION_ERROR,
+                client_id=registro.client_id,
+                detail=f"El client_id '{registro.client_id}' ya fue usado con una venta distinta."
+            )
+        return SaleSyncResult.from_enum(
+            ResponseCode.SUCCESS,
+            client_id=registro.client_id,
+            data=SaleCreateResponse.model_validate(guardado),
+            detail="Venta ya sincronizada anteriormente."
+        )
+
+    async def sincronizar_ventas(self, registros: List[SaleSyncRecord]) -> List[SaleSyncResult]:
+        """
+        Registra un lote de ventas hechas sin conexión en una sola transacción.
+        Los productos de todo el lote se resuelven y bloquean con una sola consulta;
+        cada venta usa un SAVEPOINT para que un error (p. ej. sin stock) no descarte
+        las demás del lote.
+
+        Cada venta guarda su client_id como clave de idempotencia en la misma transacción:
+        un client_id ya sincronizado (en este lote, en uno anterior o por otro worker)
+        devuelve el resultado original sin registrar la venta otra vez.
+        """
+        productos = await self._obtener_productos_bloqueados(
+            [item for registro in registros for item in registro.products]
+        )
+        claves = await idempotency_store.buscar(
+            self.db, [self._clave_sincronizacion(registro.client_id) for registro in registros]
+        )
+
+        resultados = []
+        productos_bajo_minimo = []
+        cambios = []
+        for registro in registros:
+            clave = self._clave_sincronizacion(registro.client_id)
+            if clave in claves:
+                resultados.append(self._resultado_previo(registro, claves[clave]))
+                continue
+
+            inventarios = {p.id_product: p.inventory for p in productos}
+            try:
+                async with self.db.begin_nested():
+                    response = await self._registrar_venta(registro, productos, fecha=registro.date)
+                    fila = idempotency_store.agregar(self.db, clave, registro.model_dump_json(), response)
+                    await self.db.flush()
+            except ValueError as e:
+                self._restaurar_inventario(productos, inventarios)
+                resultados.append(SaleSyncResult.from_enum(
+                    ResponseCode.VALIDATION_ERROR,
+                    client_id=registro.client_id,
+                    detail=str(e)
+                ))
+                continue
+            except IntegrityError:
+                # Otro worker sincronizó este client_id mientras tanto
+                self._restaurar_inventario(productos, inventarios)
+                fila = (await idempotency_store.buscar(self.db, [clave])).get(clave)
+                if fila is None:
+                    raise
+                claves[clave] = fila
+                resultados.append(self._resultado_previo(registro, fila))
+                continue
+
+            claves[clave] = fila
+            productos_bajo_minimo.extend(response.low_stock_products)
+            cambios.append(self._cambio_reporte(
+                response.date, [self._buscar_producto(productos, item) for item in registro.products]
+            ))
+            resultados.append(SaleSyncResult.from_enum(
+                ResponseCode.SUCCESS,
+                client_id=registro.client_id,
+                data=response,
+                detail="Venta sincronizada exitosamente."
+            ))
+
+        await self.db.commit()
+
+        report_cache.invalidar(*cambios)
+        stock_alert_aggregator.registrar(productos_bajo_minimo)
+        return resultados
+
+    async def _registrar_venta(
+        self,
+        sale_request: SaleCreateRequest,
+        productos: List[Product],
+        fecha: Optional[datetime] = None
+    ) -> SaleCreateResponse:
+        """
+        Inserta la venta, descuenta inventario y registra detalle y movimientos
+        usando productos ya bloqueados. No confirma la transacción.
         """
         total_sale = 0
         sale_items_response = []
@@ -30,72 +215,64 @@ class SaleService:
         # 1️⃣ Crear la venta
         sale = Sale(
             id_user=self.user_id,
-            date=datetime.now(),
+            date=fecha or datetime.now(),
             total=0,
             customer_name=sale_request.customer_name
         )
         self.db.add(sale)
         await self.db.flush()  # Para obtener el ID antes del commit
 
+        sale_items_rows = []
+        movement_rows = []
+        lineas = []  # (producto, inventario anterior, inventario nuevo) por cada item
+
+        # 2️⃣ Resolver los productos y sumar la cantidad por producto (un item puede repetirse)
+        items = []
+        cantidades = {}
         for item in sale_request.products:
-            query = select(Product).options(selectinload(Product.category))
-            query = query.where(
-                or_(
-                    Product.barcode == item.barcode,
-                    Product.code == item.product_code
-                )
-            )
-            
-            result = await self.db.execute(query)
-            product: Product = result.scalar_one_or_none()
+            product = self._buscar_producto(productos, item)
             if not product:
                 raise ValueError(f"Producto con código '{item.product_code or item.barcode}' no encontrado.")
+            items.append((item, product))
+            cantidades[product.id_product] = cantidades.get(product.id_product, 0) + item.quantity
 
+        # Descuento atómico de todos los productos en un solo UPDATE: cada fila solo se
+        # actualiza si queda stock suficiente, así que debe volver una fila por producto
+        inventarios = await descontar_inventarios(self.db, cantidades)
+        if len(inventarios) != len(cantidades):
+            product = next(p for _, p in items if p.id_product not in inventarios)
+            raise ValueError(f"Cantidad solicitada ({cantidades[product.id_product]}) mayor al stock disponible ({product.inventory})")
 
-            if item.quantity > product.inventory:
-                raise ValueError(f"Cantidad solicitada ({item.quantity}) mayor al stock disponible ({product.inventory})")
-
-            previous_inventory = product.inventory
+        # Inventario antes y después de cada item, en el orden de la venta
+        restante = {id_product: anterior for id_product, (anterior, _) in inventarios.items()}
+        for item, product in items:
+            previous_inventory = restante[product.id_product]
             new_inventory = previous_inventory - item.quantity
+            restante[product.id_product] = new_inventory
+            # Mantener el objeto en sesión alineado con la BD sin generar otro UPDATE
+            set_committed_value(product, "inventory", new_inventory)
+            lineas.append((product, previous_inventory, new_inventory))
 
             # Detalle de venta
-            sale_item = SaleItem(
-                id_sale=sale.id_sale,
-                id_product=product.id_product,
-                quantity=item.quantity,
-                price=product.sale_price
-            )
-            self.db.add(sale_item)
-
-            # Actualizar inventario
-            product.inventory = new_inventory
-            self.db.add(product)
+            sale_items_rows.append({
+                "id_sale": sale.id_sale,
+                "id_product": product.id_product,
+                "quantity": item.quantity,
+                "price": product.sale_price
+            })
 
             # Movimiento de inventario
-            movement = InventoryMovement(
-                id_product=product.id_product,
-                movement_type=MovementType.SALIDA,
-                quantity=item.quantity,
-                reason="venta",
-                related_id=sale.id_sale,
-                previous_inventory=previous_inventory,
-                new_inventory=new_inventory,
-                user_id=self.user_id,
-                date=datetime.now()
-            )
-            self.db.add(movement)
-
-            total_sale += item.quantity * product.sale_price
-            sale_items_response.append(
-                SaleProductResponse(
-                    product=product.name,
-                    quantity=item.quantity,
-                    price=float(product.sale_price),
-                    previous_inventory=previous_inventory,
-                    new_inventory=new_inventory,
-                    min_inventory=product.min_inventory
-                )
-            )
+            movement_rows.append({
+                "id_product": product.id_product,
+                "movement_type": MovementType.SALIDA,
+                "quantity": item.quantity,
+                "reason": "venta",
+                "related_id": sale.id_sale,
+                "previous_inventory": previous_inventory,
+                "new_inventory": new_inventory,
+                "user_id": self.user_id,
+                "date": datetime.now()
+            })
 
             # Alerta de stock bajo
             if new_inventory < product.min_inventory:
@@ -109,28 +286,38 @@ class SaleService:
                     "category": product.category.name if product.category else "Sin categoría"
                 })
 
-        # 9️⃣ Confirmar venta
-        sale.total = total_sale
-        await self.db.commit()
-        await self.db.refresh(sale)
-
-        # 🔹 Enviar correo asíncrono en background (sin bloquear ni tocar la sesión)
-        if productos_bajo_minimo:
-            # Obtener correos de usuarios admin
-            query_admins = select(Usuario.correo_electronico).where(Usuario.rol == "admin")
-            result = await self.db.execute(query_admins)
-            admin_emails = [row[0] for row in result.fetchall()]
-
-            if admin_emails:  # solo si hay admins
-                asyncio.create_task(
-                    MailService().send_stock_alert_email(
-                        email=admin_emails,  # ahora es lista de correos
-                        productos=productos_bajo_minimo
-                    )
+        # 3️⃣ Insertar detalle y movimientos con un INSERT multi-fila por tabla
+        result = await self.db.execute(
+            insert(SaleItem).returning(
+                SaleItem.quantity, SaleItem.price, sort_by_parameter_order=True
+            ),
+            sale_items_rows
+        )
+        await self.db.execute(insert(InventoryMovement), movement_rows)
+
+        for row, (product, previous_inventory, new_inventory) in zip(result.all(), lineas):
+            total_sale += row.quantity * row.price
+            sale_items_response.append(
+                SaleProductResponse(
+                    product=product.name,
+                    quantity=row.quantity,
+                    price=float(row.price),
+                    previous_inventory=previous_inventory,
+                    new_inventory=new_inventory,
+                    min_inventory=product.min_inventory
                 )
+            )
 
+        sale.total = total_sale
+        await self.db.flush()
+
+        # 5️⃣ Acumulado diario por producto y usuario (misma transacción)
+        await acumular_venta(
+            self.db, sale.date, self.user_id,
+            [(fila["id_product"], fila["quantity"], fila["price"]) for fila in sale_items_rows]
+        )
 
-        # 10️⃣ Retornar response
+        # 6️⃣ Retornar response
         return SaleCreateResponse(
             sale_id=sale.id_sale,
             total=float(total_sale),
@@ -138,4 +325,4 @@ class SaleService:
             customer_name=sale.customer_name,
             products=sale_items_response,
             low_stock_products=productos_bajo_minimo
-        )
\ No newline at end of file
+        )
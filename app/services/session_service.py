@@ -5,6 +5,7 @@ from app.models.sesion import Sesion
 from datetime import datetime, timedelta
 
 from app.core.security import create_session_token
+from app.core.session_cache import session_cache
 
 class SessionService:
     def __init__(self, db: AsyncSession):
@@ -28,6 +29,11 @@ class SessionService:
 
         ahora = datetime.utcnow()
 
+        # La sesión cambia (actividad, estado o token): descartar lo que haya en caché,
+        # también en los demás workers al confirmar
+        session_cache.invalidar_usuario(id_usuario)
+        await session_cache.publicar(self.db, usuarios=[id_usuario])
+
         if sesion_existente:
             expiracion = sesion_existente.ultima_actividad + sesion_existente.expiracion_inactividad
 
@@ -100,6 +106,7 @@ class SessionService:
         # Verificar inactividad
         if sesion.ultima_actividad + sesion.expiracion_inactividad < datetime.utcnow():
             sesion.estado = False
+            await session_cache.publicar(self.db, sesiones=[sesion.id])
             await self.db.commit()
             return False
 
@@ -113,6 +120,8 @@ class SessionService:
             select(Sesion).where(Sesion.token == token_sesion)
         )
         sesion = result.scalars().first()
+        session_cache.invalidar(token_sesion)
         if sesion:
             sesion.estado = False
+            await session_cache.publicar(self.db, sesiones=[sesion.id])
             await self.db.commit()
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional, Set
+from sqlalchemy import select
+from app.core.config import settings
+from app.db.database import async_session
+from app.models.user import Usuario
+from app.services.mail_service import MailService
+
+logger = logging.getLogger(__name__)
+
+
+class StockAlertAggregator:
+    """
+    Agrupa las alertas de stock bajo en un solo correo (low_stock_alert.html).
+
+    - Las ventas solo registran los productos bajo mínimo; no consultan ni envían nada.
+    - Cada ventana de `ventana_segundos` se envía un resumen con el último estado de
+      cada producto pendiente. Un mismo producto se notifica como máximo una vez por ventana.
+    - Los correos de administradores se cachean durante `ttl_destinatarios` segundos.
+    - Los envíos en curso se limitan con un semáforo y se esperan al cerrar la app.
+    """
+
+    def __init__(self, ventana_segundos: float, ttl_destinatarios: float, max_envios_concurrentes: int):
+        self.ventana_segundos = ventana_segundos
+        self.ttl_destinatarios = ttl_destinatarios
+        self._semaforo = asyncio.Semaphore(max_envios_concurrentes)
+        self._pendientes: Dict[str, dict] = {}
+        self._ultimo_aviso: Dict[str, float] = {}
+        self._destinatarios: Optional[List[str]] = None
+        self._destinatarios_expiran = 0.0
+        self._temporizador: Optional[asyncio.Task] = None
+        self._envios: Set[asyncio.Task] = set()
+        self._cerrado = False
+
+    def registrar(self, productos: List[dict]):
+        """Encola productos bajo mínimo. No bloquea ni toca la base de datos."""
+        if self._cerrado or not productos:
+            return
+        for producto in productos:
+            self._pendientes[producto["code"]] = producto
+        self._programar()
+
+    def invalidar_destinatarios(self):
+        """Fuerza a recargar los correos de administradores en el próximo envío."""
+        self._destinatarios = None
+
+    async def cerrar(self):
+        """Envía lo pendiente sin esperar la ventana y espera los envíos en curso."""
+        self._cerrado = True
+        if self._temporizador:
+            self._temporizador.cancel()
+            self._temporizador = None
+        if self._pendientes:
+            productos = list(self._pendientes.values())
+            self._pendientes.clear()
+            self._lanzar_envio(productos)
+        if self._envios:
+            await asyncio.gather(*self._envios, return_exceptions=True)
+
+    def _programar(self):
+        if self._temporizador is None or self._temporizador.done():
+            self._temporizador = asyncio.create_task(self._esperar_ventana())
+
+    async def _esperar_ventana(self):
+        await asyncio.sleep(self.ventana_segundos)
+        self._temporizador = None
+        self._despachar()
+
+    def _despachar(self):
+        ahora = time.monotonic()
+        # Olvidar avisos que ya salieron de la ventana
+        self._ultimo_aviso = {
+            code: momento for code, momento in self._ultimo_aviso.items()
+            if ahora - momento < self.ventana_segundos
+        }
+
+        listos = [code for code in self._pendientes if code not in self._ultimo_aviso]
+        if listos:
+            productos = [self._pendientes.pop(code) for code in listos]
+            for code in listos:
+                self._ultimo_aviso[code] = ahora
+            self._lanzar_envio(productos)
+
+        # Productos avisados hace poco: se reintentan en la siguiente ventana
+        if self._pendientes:
+            self._programar()
+
+    def _lanzar_envio(self, productos: List[dict]):
+        tarea = asyncio.create_task(self._enviar(productos))
+        self._envios.add(tarea)
+        tarea.add_done_callback(self._envios.discard)
+
+    async def _obtener_destinatarios(self) -> List[str]:
+        if self._destinatarios is None or time.monotonic() >= self._destinatarios_expiran:
+            async with async_session() as db:
+                result = await db.execute(
+                    select(Usuario.correo_electronico).where(Usuario.rol == "admin")
+                )
+                self._destinatarios = [row[0] for row in result.fetchall()]
+            self._destinatarios_expiran = time.monotonic() + self.ttl_destinatarios
+        return self._destinatarios
+
+    async def _enviar(self, productos: List[dict]):
+        async with self._semaforo:
+            try:
+                destinatarios = await self._obtener_destinatarios()
+                if destinatarios:  # solo si hay admins
+                    await MailService().send_stock_alert_email(email=destinatarios, productos=productos)
+            except Exception as e:
+                logger.error(f"Error al enviar alerta de stock bajo: {e}")
+
+
+stock_alert_aggregator = StockAlertAggregator(
+    ventana_segundos=settings.STOCK_ALERT_WINDOW_SECONDS,
+    ttl_destinatarios=settings.STOCK_ALERT_RECIPIENTS_TTL_SECONDS,
+    max_envios_concurrentes=settings.STOCK_ALERT_MAX_CONCURRENT_SENDS
+)
@@ -7,7 +7,7 @@ from sqlalchemy.exc import IntegrityError
 from app.models.password_resets import PasswordReset
 from app.models.sesion import Sesion
 from app.models.user import Usuario
-from app.core.security import hash_password, hash_password_async, verify_password
+from app.core.security import hash_password_async, verify_password_async
 from app.schemas.auth import UsuarioRequest
 from pydantic import ValidationError
 import re
@@ -28,7 +28,7 @@ class UserService:
 
         if not user:
             raise ValueError("Usuario no existe")
-        if not verify_password(password, user.contrasena):
+        if not await verify_password_async(password, user.contrasena):
             raise ValueError("Contraseña incorrecta")
         return user
     
@@ -161,7 +161,7 @@ class UserService:
             raise ValueError(
                 "La contraseña debe contener mayúscula, minúscula, número y carácter especial."
             )
-        user.contrasena = hash_password(new_password)
+        user.contrasena = await hash_password_async(new_password)
         self.db.add(user)
         await self.db.commit()
         await self.db.refresh(user)
@@ -1,8 +1,5 @@
 from functools import wraps
-from fastapi import Request
-from fastapi.encoders import jsonable_encoder
-from sqlalchemy.ext.asyncio import AsyncSession
-from app.services.historial_acciones_service import registrar_accion_async
+from app.services.audit_writer import EventoAuditoria, audit_writer
 
 def log_action(accion: str, modulo: str):
     """
@@ -10,8 +7,12 @@ def log_action(accion: str, modulo: str):
     Solo registra si la acción fue exitosa (success=True).
 
     - Para 'crear': datos_nuevos contiene el objeto creado, datos_anteriores es None.
-    - Para 'modificar': datos_anteriores contiene el estado previo, datos_nuevos el estado actualizado.
+    - Para 'modificar': datos_anteriores y datos_nuevos contienen solo los campos que cambiaron
+      (HistorialService reconstruye el estado completo al leer).
     - Para 'eliminar': datos_anteriores contiene el objeto eliminado, datos_nuevos es None.
+
+    El evento solo se encola: la serialización y el INSERT los hace audit_writer
+    en segundo plano, en lotes y con su propia sesión.
     """
     def decorator(func):
         @wraps(func)
@@ -19,37 +20,28 @@ def log_action(accion: str, modulo: str):
             # Ejecutar la función original
             response = await func(*args, **kwargs)
 
-            # Extraer db, usuario y request de kwargs
-            db: AsyncSession = kwargs.get("db")
             usuario = kwargs.get("usuario")
-            request: Request = kwargs.get("request")
 
             # Registrar solo si la acción fue exitosa
-            if db and usuario and getattr(response, "success", False):
+            if usuario and getattr(response, "success", False):
                 datos_anteriores = None
-                datos_nuevos = None
-
-                # Convertir el response a dict JSON serializable
-                datos_nuevos = jsonable_encoder(response)
+                datos_nuevos = getattr(response, "data", None)
 
                 # Para modificar o eliminar, intentar obtener previous_data
                 if accion in ["modificar", "eliminar"]:
-                    prev_data = getattr(response, "previous_data", None)
-                    datos_anteriores = jsonable_encoder(prev_data) if prev_data else None
+                    datos_anteriores = getattr(response, "previous_data", None)
 
                     if accion == "eliminar":
                         datos_nuevos = None  # En eliminar, no hay datos nuevos
 
-                # Registrar acción en la base de datos
-                await registrar_accion_async(
-                    db=db,
+                await audit_writer.registrar(EventoAuditoria(
                     id_usuario=usuario.id_usuario,
                     accion=accion,
                     modulo=modulo,
                     descripcion=f"{accion.capitalize()} en {modulo}",
                     datos_anteriores=datos_anteriores,
                     datos_nuevos=datos_nuevos,
-                )
+                ))
 
             return response
         return wrapper
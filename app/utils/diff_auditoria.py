@@ -0,0 +1,50 @@
+# app/utils/diff_auditoria.py
+from typing import Any, Optional, Tuple
+
+
+def diferencia(anterior: dict, nuevo: dict) -> Tuple[dict, dict]:
+    """
+    Solo los campos que cambiaron entre dos objetos JSON: (valores anteriores, valores nuevos).
+    Los objetos anidados se comparan campo por campo; listas y valores simples, completos.
+    Un campo que no existe en uno de los lados se registra como null.
+    """
+    antes, despues = {}, {}
+    for campo in dict.fromkeys([*anterior, *nuevo]):
+        valor_anterior, valor_nuevo = anterior.get(campo), nuevo.get(campo)
+        if valor_anterior == valor_nuevo:
+            continue
+        if isinstance(valor_anterior, dict) and isinstance(valor_nuevo, dict):
+            antes[campo], despues[campo] = diferencia(valor_anterior, valor_nuevo)
+        else:
+            antes[campo], despues[campo] = valor_anterior, valor_nuevo
+    return antes, despues
+
+
+def aplicar(base: Optional[dict], cambios: Optional[dict]) -> dict:
+    """Aplica sobre `base` los campos de una diferencia (sin modificar `base`)."""
+    resultado = dict(base or {})
+    for campo, valor in (cambios or {}).items():
+        if isinstance(valor, dict) and isinstance(resultado.get(campo), dict):
+            resultado[campo] = aplicar(resultado[campo], valor)
+        else:
+            resultado[campo] = valor
+    return resultado
+
+
+def clave_entidad(datos: Any) -> Optional[str]:
+    """Id del objeto auditado: el campo `id` o el primer `id_*` con valor."""
+    if not isinstance(datos, dict):
+        return None
+    if datos.get("id") is not None:
+        return str(datos["id"])
+    for campo, valor in datos.items():
+        if campo.startswith("id_") and valor is not None:
+            return str(valor)
+    return None
+
+
+def datos_de_respuesta(payload: Any) -> Any:
+    """Registros anteriores guardaban el APIResponse completo: retorna solo su `data`."""
+    if isinstance(payload, dict) and "success" in payload and "data" in payload:
+        return payload["data"]
+    return payload
@@ -0,0 +1,57 @@
+# app/utils/exportacion.py
+import asyncio
+import csv
+import gzip
+import io
+from typing import AsyncIterator, Sequence
+
+from pydantic import BaseModel
+
+CSV_MEDIA_TYPE = "text/csv; charset=utf-8"
+
+# Tamaño aproximado de cada parte enviada al cliente
+TAMANO_PARTE = 64 * 1024
+
+
+async def codificar_csv(filas: AsyncIterator[Sequence], columnas: Sequence[str]) -> AsyncIterator[bytes]:
+    """Convierte filas en partes CSV (con encabezado) de ~TAMANO_PARTE bytes."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columnas)
+    async for fila in filas:
+        writer.writerow(fila)
+        if buffer.tell() >= TAMANO_PARTE:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate(0)
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+async def codificar_ndjson(modelos: AsyncIterator[BaseModel]) -> AsyncIterator[bytes]:
+    """Convierte modelos en partes NDJSON (un objeto por línea) de ~TAMANO_PARTE bytes."""
+    partes = []
+    tamano = 0
+    async for modelo in modelos:
+        linea = modelo.model_dump_json().encode("utf-8") + b"\n"
+        partes.append(linea)
+        tamano += len(linea)
+        if tamano >= TAMANO_PARTE:
+            yield b"".join(partes)
+            partes = []
+            tamano = 0
+    if partes:
+        yield b"".join(partes)
+
+
+async def leer_gzip(ruta: str) -> AsyncIterator[bytes]:
+    """Descomprime un archivo gzip por partes de ~TAMANO_PARTE bytes, fuera del event loop."""
+    archivo = await asyncio.to_thread(gzip.open, ruta, "rb")
+    try:
+        while True:
+            parte = await asyncio.to_thread(archivo.read, TAMANO_PARTE)
+            if not parte:
+                break
+            yield parte
+    finally:
+        archivo.close()
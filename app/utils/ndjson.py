@@ -0,0 +1,23 @@
+# app/utils/ndjson.py
+from typing import AsyncIterator
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+async def leer_lineas_ndjson(stream: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """
+    Recorre un cuerpo NDJSON a medida que llega y entrega cada línea no vacía,
+    sin cargar el cuerpo completo en memoria.
+    """
+    pendiente = b""
+    async for chunk in stream:
+        pendiente += chunk
+        *lineas, pendiente = pendiente.split(b"\n")
+        for linea in lineas:
+            linea = linea.strip()
+            if linea:
+                yield linea.decode("utf-8")
+
+    pendiente = pendiente.strip()
+    if pendiente:
+        yield pendiente.decode("utf-8")
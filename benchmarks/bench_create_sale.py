@@ -0,0 +1,106 @@
+"""
+Benchmark de latencia de checkout: SaleService.create_sale vs. número de items.
+
+Crea una categoría y productos temporales en la base configurada en .env,
+ejecuta ventas de distinto tamaño y reporta latencia media y número de
+sentencias SQL por venta. Al final elimina todo lo que creó.
+
+Uso:
+    PYTHONPATH=$(pwd) python benchmarks/bench_create_sale.py --user-id 1
+
+Para comparar antes/después, ejecutar el mismo comando sobre el commit
+anterior al cambio y sobre el actual.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+from sqlalchemy import delete, event, select
+
+from app.db.database import async_session, engine
+from app.models import Category, InventoryMovement, Product, Sale, SaleItem
+from app.schemas.sales import SaleCreateRequest, SaleProductRequest
+from app.services.sale_service import SaleService
+
+TAMANOS = [1, 5, 10, 20, 40]
+
+
+class ContadorSentencias:
+    def __init__(self):
+        self.total = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.total += 1
+
+
+async def preparar_datos(prefijo: str, n_productos: int) -> int:
+    async with async_session() as db:
+        categoria = Category(name=f"{prefijo}-cat")
+        db.add(categoria)
+        await db.flush()
+        for i in range(n_productos):
+            db.add(Product(
+                code=f"{prefijo}-{i}",
+                barcode=f"{prefijo}-bc-{i}",
+                name=f"{prefijo} producto {i}",
+                sale_price=10,
+                inventory=1_000_000,
+                min_inventory=0,
+                id_category=categoria.id
+            ))
+        await db.commit()
+        return categoria.id
+
+
+async def limpiar_datos(id_categoria: int):
+    async with async_session() as db:
+        ids = select(Product.id_product).where(Product.id_category == id_categoria)
+        ventas = select(SaleItem.id_sale).where(SaleItem.id_product.in_(ids))
+        await db.execute(delete(InventoryMovement).where(InventoryMovement.id_product.in_(ids)))
+        await db.execute(delete(Sale).where(Sale.id_sale.in_(ventas)))
+        await db.execute(delete(Product).where(Product.id_category == id_categoria))
+        await db.execute(delete(Category).where(Category.id == id_categoria))
+        await db.commit()
+
+
+async def medir(prefijo: str, user_id: int, n_items: int, repeticiones: int, contador: ContadorSentencias):
+    request = SaleCreateRequest(
+        products=[SaleProductRequest(product_code=f"{prefijo}-{i}", quantity=1) for i in range(n_items)],
+        customer_name="benchmark"
+    )
+    tiempos = []
+    contador.total = 0
+    for _ in range(repeticiones):
+        async with async_session() as db:
+            inicio = time.perf_counter()
+            await SaleService(db, user_id).create_sale(request)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.mean(tiempos), statistics.median(tiempos), contador.total / repeticiones
+
+
+async def main(user_id: int, repeticiones: int):
+    prefijo = f"bench-{uuid.uuid4().hex[:8]}"
+    contador = ContadorSentencias()
+    engine.echo = False
+    event.listen(engine.sync_engine, "before_cursor_execute", contador)
+
+    id_categoria = await preparar_datos(prefijo, max(TAMANOS))
+    try:
+        print(f"{'items':>6} | {'media ms':>9} | {'mediana ms':>10} | {'sentencias':>10}")
+        for n in TAMANOS:
+            media, mediana, sentencias = await medir(prefijo, user_id, n, repeticiones, contador)
+            print(f"{n:>6} | {media:>9.1f} | {mediana:>10.1f} | {sentencias:>10.1f}")
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", contador)
+        await limpiar_datos(id_categoria)
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user-id", type=int, required=True, help="id_usuario que registra las ventas")
+    parser.add_argument("--repeticiones", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.user_id, args.repeticiones))
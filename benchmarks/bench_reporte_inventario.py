@@ -0,0 +1,131 @@
+"""
+Benchmark del reporte de inventario sobre un conjunto sintético grande.
+
+Crea una categoría con N productos y M movimientos de inventario en la base
+configurada en .env (Postgres; los datos se generan en el servidor con
+generate_series), mide generar_reporte_inventario y al final elimina todo
+lo que creó.
+
+Con --legacy también mide la versión anterior (una consulta de movimientos
+por producto); con millones de movimientos tarda minutos.
+
+Uso:
+    PYTHONPATH=$(pwd) python benchmarks/bench_reporte_inventario.py --productos 5000 --movimientos 2000000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+from sqlalchemy import delete, event, select, text
+
+from app.core.enums.tipo_movimiento import MovementType
+from app.db.database import async_session, engine
+from app.models import Category, InventoryMovement, Product
+from app.schemas.reporte_inventario import ReporteInventarioRequest
+from app.services.reporte_inventario_service import generar_reporte_inventario
+
+
+class ContadorSentencias:
+    def __init__(self):
+        self.total = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.total += 1
+
+
+async def preparar_datos(prefijo: str, n_productos: int, n_movimientos: int) -> int:
+    async with async_session() as db:
+        categoria = Category(name=f"{prefijo}-cat")
+        db.add(categoria)
+        await db.flush()
+        await db.execute(text("""
+            INSERT INTO products (code, name, sale_price, inventory, min_inventory, id_category, date_added)
+            SELECT :prefijo || '-' || g, :prefijo || ' producto ' || g, 10, g % 100, 20, :categoria, now()
+            FROM generate_series(1, :n) AS g
+        """), {"prefijo": prefijo, "categoria": categoria.id, "n": n_productos})
+        # Movimientos repartidos entre los productos: 2 de cada 3 son entradas
+        await db.execute(text("""
+            INSERT INTO inventory_movements
+                (id_product, movement_type, quantity, reason, previous_inventory, new_inventory, date)
+            SELECT ids.ids[1 + (g % :n)],
+                   CASE WHEN g % 3 = 0 THEN 'SALIDA' ELSE 'ENTRADA' END::movementtype,
+                   1 + (g % 7), 'benchmark', 0, 0,
+                   now() - (g || ' seconds')::interval
+            FROM generate_series(1, :m) AS g,
+                 (SELECT array_agg(id_product) AS ids FROM products WHERE id_category = :categoria) AS ids
+        """), {"categoria": categoria.id, "n": n_productos, "m": n_movimientos})
+        await db.commit()
+        await db.execute(text("ANALYZE products"))
+        await db.execute(text("ANALYZE inventory_movements"))
+        return categoria.id
+
+
+async def limpiar_datos(id_categoria: int):
+    async with async_session() as db:
+        ids = select(Product.id_product).where(Product.id_category == id_categoria)
+        await db.execute(delete(InventoryMovement).where(InventoryMovement.id_product.in_(ids)))
+        await db.execute(delete(Product).where(Product.id_category == id_categoria))
+        await db.execute(delete(Category).where(Category.id == id_categoria))
+        await db.commit()
+
+
+async def reporte_legacy(db, filtros: ReporteInventarioRequest):
+    """Implementación anterior: productos y luego una consulta de movimientos por producto."""
+    productos = (await db.execute(
+        select(Product).join(Category).where(Category.name.in_(filtros.categorias))
+    )).scalars().all()
+    for producto in productos:
+        movimientos = (await db.execute(
+            select(InventoryMovement).filter(InventoryMovement.id_product == producto.id_product)
+        )).scalars().all()
+        sum(m.quantity for m in movimientos if m.movement_type == MovementType.ENTRADA)
+        sum(m.quantity for m in movimientos if m.movement_type == MovementType.SALIDA)
+        max((m.date for m in movimientos), default=None)
+
+
+async def medir(funcion, filtros, repeticiones: int, contador: ContadorSentencias):
+    tiempos = []
+    contador.total = 0
+    for _ in range(repeticiones):
+        async with async_session() as db:
+            inicio = time.perf_counter()
+            await funcion(db, filtros)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.mean(tiempos), statistics.median(tiempos), contador.total / repeticiones
+
+
+async def main(n_productos: int, n_movimientos: int, repeticiones: int, legacy: bool):
+    prefijo = f"bench-{uuid.uuid4().hex[:8]}"
+    contador = ContadorSentencias()
+    engine.echo = False
+
+    inicio = time.perf_counter()
+    id_categoria = await preparar_datos(prefijo, n_productos, n_movimientos)
+    print(f"Datos sintéticos: {n_productos} productos, {n_movimientos} movimientos "
+          f"({time.perf_counter() - inicio:.1f}s)")
+
+    event.listen(engine.sync_engine, "before_cursor_execute", contador)
+    filtros = ReporteInventarioRequest(categorias=[f"{prefijo}-cat"])
+    try:
+        print(f"{'versión':>10} | {'media ms':>10} | {'mediana ms':>10} | {'sentencias':>10}")
+        media, mediana, sentencias = await medir(generar_reporte_inventario, filtros, repeticiones, contador)
+        print(f"{'agregada':>10} | {media:>10.1f} | {mediana:>10.1f} | {sentencias:>10.1f}")
+        if legacy:
+            media, mediana, sentencias = await medir(reporte_legacy, filtros, 1, contador)
+            print(f"{'legacy':>10} | {media:>10.1f} | {mediana:>10.1f} | {sentencias:>10.1f}")
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", contador)
+        await limpiar_datos(id_categoria)
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--productos", type=int, default=5000)
+    parser.add_argument("--movimientos", type=int, default=2_000_000)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--legacy", action="store_true", help="medir también la versión de una consulta por producto")
+    args = parser.parse_args()
+    asyncio.run(main(args.productos, args.movimientos, args.repeticiones, args.legacy))
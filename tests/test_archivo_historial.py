@@ -0,0 +1,174 @@
+# tests/test_archivo_historial.py
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+import app.services.historial_acciones_service as historial_module
+from app.core.enums.modo_total import TotalMode
+from app.services.archivo_historial import ArchivoHistorial, FiltroArchivo, sumar_meses
+from app.services.historial_acciones_service import HistorialService
+
+
+def fila(id_historial, fecha, modulo="productos", id_usuario=1):
+    return {
+        "id_historial": id_historial, "id_usuario": id_usuario, "nombre_usuario": "ana", "accion": "crear",
+        "modulo": modulo, "descripcion": None, "datos_anteriores": None, "datos_nuevos": {"id": id_historial},
+        "fecha_accion": fecha, "entidad": str(id_historial), "es_diferencia": False,
+    }
+
+
+async def lotes(filas, tamano=2):
+    for i in range(0, len(filas), tamano):
+        yield filas[i:i + tamano]
+
+
+async def archivar_mes(archivo, mes, ids):
+    """Filas del mes en el orden del listado: de la más reciente a la más antigua."""
+    filas = [fila(i, datetime(mes.year, mes.month, 1) + timedelta(hours=i)) for i in sorted(ids, reverse=True)]
+    return await archivo.escribir(mes, lotes(filas))
+
+
+def test_sumar_meses():
+    assert sumar_meses(date(2025, 11, 1), 3) == date(2026, 2, 1)
+    assert sumar_meses(date(2025, 1, 1), -1) == date(2024, 12, 1)
+
+
+@pytest.mark.asyncio
+async def test_escribe_y_busca_por_cursor(tmp_path):
+    archivo = ArchivoHistorial(str(tmp_path))
+    assert await archivar_mes(archivo, date(2025, 1, 1), [1, 2, 3]) == 3
+    await archivar_mes(archivo, date(2025, 2, 1), [4, 5])
+
+    assert archivo.meses() == [date(2025, 2, 1), date(2025, 1, 1)]
+    assert not list(tmp_path.glob("*.tmp"))
+
+    meses = archivo.meses()
+    primeras = await archivo.buscar(meses, lambda f: True, None, 3)
+    assert [f["id_historial"] for f in primeras] == [5, 4, 3]
+    assert isinstance(primeras[0]["fecha_accion"], datetime)
+
+    ultima = primeras[-1]
+    siguientes = await archivo.buscar(meses, lambda f: True, (ultima["fecha_accion"], ultima["id_historial"]), 3)
+    assert [f["id_historial"] for f in siguientes] == [2, 1]
+
+    assert await archivo.contar(meses, FiltroArchivo()) == 5
+    assert await archivo.contar(meses, FiltroArchivo(modulo="ventas")) == 0
+
+
+@pytest.mark.asyncio
+async def test_totales_desde_los_conteos_por_mes(tmp_path, monkeypatch):
+    archivo = ArchivoHistorial(str(tmp_path))
+    await archivar_mes(archivo, date(2025, 1, 1), [1, 2, 3])
+    await archivar_mes(archivo, date(2025, 2, 1), [4, 5])
+    assert (tmp_path / "historial_2025_01.conteos.json").exists()
+
+    recorridos = []
+    original = archivo._recorrer
+    monkeypatch.setattr(archivo, "_recorrer", lambda meses, *args: recorridos.append(meses) or original(meses, *args))
+    meses = archivo.meses()
+
+    # Meses cubiertos completos: sin descomprimir nada
+    assert await archivo.contar(meses, FiltroArchivo(id_usuario=1, por_usuario=True)) == 5
+    assert await archivo.contar(meses, FiltroArchivo(id_usuario=2, por_usuario=True)) == 0
+    assert recorridos == []
+
+    # Enero cubierto en parte (desde las 02:00): exacto recorre solo ese mes, estimado no
+    filtro = FiltroArchivo(desde=datetime(2025, 1, 1, 2))
+    assert await archivo.contar(meses, filtro) == 4
+    assert recorridos == [[date(2025, 1, 1)]]
+    assert await archivo.contar(meses, filtro, exacto=False) == 5
+    assert len(recorridos) == 1
+
+
+@pytest.mark.asyncio
+async def test_mes_archivado_sin_conteos_los_calcula_una_vez(tmp_path):
+    await archivar_mes(ArchivoHistorial(str(tmp_path)), date(2025, 1, 1), [1, 2, 3])
+    (tmp_path / "historial_2025_01.conteos.json").unlink()
+
+    archivo = ArchivoHistorial(str(tmp_path))
+    assert await archivo.contar(archivo.meses(), FiltroArchivo(modulo="productos")) == 3
+    assert (tmp_path / "historial_2025_01.conteos.json").exists()
+
+
+@pytest.mark.asyncio
+async def test_meses_en_rango(tmp_path):
+    archivo = ArchivoHistorial(str(tmp_path))
+    for mes in (1, 2, 3):
+        await archivar_mes(archivo, date(2025, mes, 1), [mes])
+
+    assert archivo.meses_en_rango(datetime(2025, 1, 31), datetime(2025, 2, 1)) == [date(2025, 2, 1), date(2025, 1, 1)]
+    assert archivo.meses_en_rango(datetime(2025, 4, 1), None) == []
+
+
+class FakeResult:
+    def __init__(self, filas=None, escalar=None):
+        self.filas = filas or []
+        self.escalar = escalar
+
+    def all(self):
+        return self.filas
+
+    def scalar(self):
+        return self.escalar
+
+
+class FakeDB:
+    """Tabla caliente con los registros 10 y 9 (marzo de 2025)."""
+
+    def get_bind(self):
+        return SimpleNamespace(dialect=SimpleNamespace(name="sqlite"))
+
+    async def execute(self, query):
+        if "count(" in str(query):
+            return FakeResult(escalar=2)
+        return FakeResult(filas=[
+            (SimpleNamespace(**dict(fila(i, datetime(2025, 3, 1) + timedelta(hours=i)))), "ana")
+            for i in (10, 9)
+        ])
+
+
+@pytest.mark.asyncio
+async def test_listado_sigue_en_el_archivo(tmp_path, monkeypatch):
+    archivo = ArchivoHistorial(str(tmp_path))
+    await archivar_mes(archivo, date(2025, 1, 1), [1, 2, 3])
+    monkeypatch.setattr(historial_module, "archivo_historial", archivo)
+
+    pagina = (await HistorialService(FakeDB()).listar_historial(per_page=4, total=TotalMode.exacto)).data
+
+    assert [i.id_historial for i in pagina.items] == [10, 9, 3, 2]
+    assert pagina.items[2].nombre_usuario == "ana"
+    assert pagina.total_items == 5
+
+    siguiente = HistorialService.decodificar_cursor(pagina.next_cursor)
+    assert siguiente[1] == 2
+
+
+@pytest.mark.asyncio
+async def test_diferencia_archivada_no_se_presenta_como_completa(tmp_path, monkeypatch):
+    archivo = ArchivoHistorial(str(tmp_path))
+    diferencia = dict(
+        fila(1, datetime(2025, 1, 5)), accion="modificar", es_diferencia=True,
+        datos_anteriores={"precio": 1}, datos_nuevos={"precio": 2}
+    )
+    await archivo.escribir(date(2025, 1, 1), lotes([diferencia]))
+    monkeypatch.setattr(historial_module, "archivo_historial", archivo)
+
+    pagina = (await HistorialService(FakeDB()).listar_historial(per_page=4, completo=True)).data
+
+    archivada = pagina.items[-1]
+    assert archivada.id_historial == 1
+    assert archivada.es_diferencia is True
+    assert archivada.datos_nuevos == {"precio": 2}
+
+
+@pytest.mark.asyncio
+async def test_rango_de_fechas_sin_meses_archivados_no_lee_archivos(tmp_path, monkeypatch):
+    archivo = ArchivoHistorial(str(tmp_path))
+    await archivar_mes(archivo, date(2025, 1, 1), [1, 2, 3])
+    monkeypatch.setattr(historial_module, "archivo_historial", archivo)
+
+    pagina = (await HistorialService(FakeDB()).listar_historial(per_page=4, fecha_inicio="01-03-2025")).data
+
+    assert [i.id_historial for i in pagina.items] == [10, 9]
+    assert pagina.next_cursor is None
@@ -0,0 +1,103 @@
+# tests/test_audit_writer.py
+import asyncio
+import pytest
+from app.models.user import Usuario
+from app.schemas.api_response import APIResponse, ResponseCode
+from app.services import audit_writer as modulo
+from app.services.audit_writer import AuditWriter, EventoAuditoria
+from app.utils.decorators import log_action
+
+
+class FakeDBAuditoria:
+    def __init__(self, fallos=0):
+        self.fallos = fallos
+        self.lotes = []
+        self.commits = 0
+
+    async def execute(self, query, params=None):
+        if self.fallos:
+            self.fallos -= 1
+            raise RuntimeError("conexión perdida")
+        self.lotes.append((query.table.name, params))
+
+    async def commit(self):
+        self.commits += 1
+
+
+class FakeSessionMaker:
+    def __init__(self, db):
+        self.db = db
+
+    def __call__(self):
+        return self
+
+    async def __aenter__(self):
+        return self.db
+
+    async def __aexit__(self, *args):
+        return False
+
+
+def evento(i=0):
+    return EventoAuditoria(id_usuario=1, accion="crear", modulo="productos", datos_nuevos={"i": i})
+
+
+@pytest.mark.asyncio
+async def test_escribe_en_lotes_por_tamano():
+    db = FakeDBAuditoria()
+    writer = AuditWriter(FakeSessionMaker(db), max_size=100, batch_size=3, flush_interval=60)
+    writer.iniciar()
+    try:
+        for i in range(7):
+            await writer.registrar(evento(i))
+        await asyncio.sleep(0.05)
+        # Dos lotes completos; el séptimo espera al intervalo
+        assert [len(filas) for _, filas in db.lotes] == [3, 3]
+        assert db.lotes[0][0] == "historial_acciones"
+    finally:
+        await writer.cerrar()
+
+    # Al cerrar se escribe lo pendiente
+    assert [len(filas) for _, filas in db.lotes] == [3, 3, 1]
+    assert writer.metricas()["escritos"] == 7
+
+
+@pytest.mark.asyncio
+async def test_escribe_al_pasar_el_intervalo():
+    db = FakeDBAuditoria()
+    writer = AuditWriter(FakeSessionMaker(db), max_size=100, batch_size=50, flush_interval=0.01)
+    writer.iniciar()
+    try:
+        await writer.registrar(evento())
+        await asyncio.sleep(0.1)
+        assert len(db.lotes) == 1
+    finally:
+        await writer.cerrar()
+
+
+@pytest.mark.asyncio
+async def test_reintenta_lote_fallido():
+    db = FakeDBAuditoria(fallos=2)
+    writer = AuditWriter(FakeSessionMaker(db), max_size=10, batch_size=10, flush_interval=60, backoff_base=0)
+
+    await writer._escribir([evento(1), evento(2)])
+
+    assert len(db.lotes) == 1 and len(db.lotes[0][1]) == 2
+    assert writer.metricas()["errores"] == 2
+
+
+@pytest.mark.asyncio
+async def test_log_action_encola_sin_tocar_la_sesion(monkeypatch):
+    writer = AuditWriter(FakeSessionMaker(FakeDBAuditoria()), max_size=10, batch_size=10, flush_interval=60)
+    monkeypatch.setattr("app.utils.decorators.audit_writer", writer)
+
+    @log_action(accion="modificar", modulo="categorias")
+    async def ruta(db=None, usuario=None):
+        return APIResponse.from_enum(ResponseCode.SUCCESS, data={"name": "nuevo"}, detail="ok", previous_data={"name": "viejo"})
+
+    await ruta(db=object(), usuario=Usuario(id_usuario=5))
+
+    encolado = writer._cola.get_nowait()
+    assert encolado.id_usuario == 5 and encolado.accion == "modificar"
+    assert encolado.datos_anteriores == {"name": "viejo"}
+    assert encolado.datos_nuevos == {"name": "nuevo"}
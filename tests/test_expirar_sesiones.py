@@ -0,0 +1,98 @@
+# tests/test_expirar_sesiones.py
+import pytest
+from sqlalchemy.dialects import postgresql
+from app.core.session_cache import SessionCache
+from app.jobs import expirar_sesiones as job
+
+
+class FakeResult:
+    def __init__(self, tokens=None, rowcount=0, filas=None):
+        self.tokens = tokens or []
+        self.rowcount = rowcount
+        self.filas = filas or []
+
+    def all(self):
+        return self.filas
+
+    def scalars(self):
+        tokens = self.tokens
+
+        class Inner:
+            def all(inner_self):
+                return tokens
+        return Inner()
+
+
+class FakeDBJob:
+    def __init__(self, resultados):
+        self.resultados = list(resultados)
+        self.queries = []
+        self.params = []
+        self.commits = 0
+
+    async def execute(self, query, params=None):
+        self.queries.append(query)
+        self.params.append(params)
+        return self.resultados.pop(0)
+
+    async def commit(self):
+        self.commits += 1
+
+
+class FakeSessionMaker:
+    def __init__(self, db):
+        self.db = db
+
+    def __call__(self):
+        return self
+
+    async def __aenter__(self):
+        return self.db
+
+    async def __aexit__(self, *args):
+        return False
+
+
+def sql(query):
+    return str(query.compile(dialect=postgresql.dialect()))
+
+
+@pytest.mark.asyncio
+async def test_expira_con_un_solo_update(monkeypatch):
+    db = FakeDBJob([FakeResult(filas=[(1, "a"), (2, "b")]), FakeResult()])
+    # Con engine (PostgreSQL) la caché avisa a los demás workers
+    cache = SessionCache(ttl_seconds=60, max_entries=10, flush_interval=60, engine=object())
+    invalidados = []
+    monkeypatch.setattr(cache, "invalidar", invalidados.append)
+    monkeypatch.setattr(job, "session_cache", cache)
+    monkeypatch.setattr(job, "async_session", FakeSessionMaker(db))
+
+    assert await job.expirar_sesiones() == 2
+
+    assert len(db.queries) == 2 and db.commits == 1
+    texto = sql(db.queries[0])
+    assert texto.startswith("UPDATE sesiones SET")
+    assert "sesiones.ultima_actividad + sesiones.expiracion_inactividad <" in texto
+    assert "RETURNING sesiones.id, sesiones.token" in texto
+    # NOTIFY en la misma transacción que el UPDATE
+    assert str(db.queries[1]) == "SELECT pg_notify(:canal, :payload)"
+    assert db.params[1] == {"canal": "sesiones_revocadas", "payload": '{"sesiones": [1, 2]}'}
+    assert invalidados == ["a", "b"]
+
+
+@pytest.mark.asyncio
+async def test_purga_en_lotes_acotados(monkeypatch):
+    # user_otp: 2 lotes llenos + 1 parcial; password_resets y claves_idempotencia: 1 lote vacío
+    db = FakeDBJob([
+        FakeResult(rowcount=10), FakeResult(rowcount=10), FakeResult(rowcount=3),
+        FakeResult(rowcount=0), FakeResult(rowcount=0)
+    ])
+    monkeypatch.setattr(job, "async_session", FakeSessionMaker(db))
+
+    borrados = await job.purgar_registros_vencidos(tamano_lote=10)
+
+    assert borrados == {"user_otp": 23, "password_resets": 0, "claves_idempotencia": 0}
+    assert db.commits == 5
+    texto = sql(db.queries[0])
+    assert texto.startswith("DELETE FROM user_otp WHERE user_otp.id IN (SELECT user_otp.id")
+    assert "LIMIT" in texto
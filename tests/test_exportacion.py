@@ -0,0 +1,72 @@
+# tests/test_exportacion.py
+import json
+from datetime import datetime
+from decimal import Decimal
+from types import SimpleNamespace
+import pytest
+from app.core.enums.formato_reporte import ReportFormat
+from app.schemas.reporte_ventas import ReporteVentasRequest
+from app.services import reporte_ventas_service
+from app.services.reporte_ventas_service import construir_consulta_ventas, exportar_reporte_ventas
+from app.utils import exportacion
+from app.utils.exportacion import codificar_csv
+
+
+def fila(id_sale, id_product):
+    return SimpleNamespace(
+        id_sale=id_sale, fecha=datetime(2025, 1, id_sale), id_user=1, nombre_usuario="ana",
+        cliente=None, total=Decimal("10.00"), subtotal_venta=Decimal("10.00"),
+        id_product=id_product, nombre=f"Producto {id_product}", categoria="Bebidas",
+        cantidad=1, precio_unitario=Decimal("5.00"), subtotal=Decimal("5.00")
+    )
+
+
+@pytest.fixture
+def filas(monkeypatch):
+    leidas = []
+
+    async def fake_filas(db, query):
+        for f in [fila(1, 10), fila(1, 11), fila(2, 10)]:
+            leidas.append(f)
+            yield f
+    monkeypatch.setattr(reporte_ventas_service, "_filas", fake_filas)
+    return leidas
+
+
+async def juntar(partes):
+    return b"".join([parte async for parte in partes]).decode("utf-8")
+
+
+@pytest.mark.asyncio
+async def test_ventas_ndjson_una_venta_por_linea(filas):
+    query = construir_consulta_ventas(ReporteVentasRequest())
+    lineas = (await juntar(exportar_reporte_ventas(None, query, ReportFormat.ndjson))).splitlines()
+
+    ventas = [json.loads(linea) for linea in lineas]
+    assert [v["id_sale"] for v in ventas] == [1, 2]
+    assert [len(v["productos"]) for v in ventas] == [2, 1]
+
+
+@pytest.mark.asyncio
+async def test_ventas_csv_una_linea_por_producto(filas):
+    query = construir_consulta_ventas(ReporteVentasRequest())
+    lineas = (await juntar(exportar_reporte_ventas(None, query, ReportFormat.csv))).splitlines()
+
+    assert lineas[0].startswith("id_sale,fecha,usuario")
+    assert lineas[1] == "1,2025-01-01 00:00:00,ana,,10.00,10.00,10,Producto 10,Bebidas,1,5.00,5.00"
+    assert len(lineas) == 4
+
+
+@pytest.mark.asyncio
+async def test_csv_se_envia_por_partes(monkeypatch):
+    monkeypatch.setattr(exportacion, "TAMANO_PARTE", 20)
+
+    async def filas():
+        for i in range(10):
+            yield (i, "x" * 10)
+
+    partes = [parte async for parte in codificar_csv(filas(), ["n", "texto"])]
+
+    assert len(partes) > 1
+    assert all(len(parte) < 60 for parte in partes)
+    assert b"".join(partes).decode().count("\n") == 11
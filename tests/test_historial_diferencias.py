@@ -0,0 +1,68 @@
+# tests/test_historial_diferencias.py
+from datetime import datetime
+from types import SimpleNamespace
+from app.services.audit_writer import AuditWriter, EventoAuditoria
+from app.services.historial_acciones_service import reproducir_cambios
+from app.utils.diff_auditoria import aplicar, diferencia
+
+
+PRODUCTO = {
+    "id_product": 7, "code": "P-7", "barcode": None, "name": "Café", "description": "Molido 500g",
+    "sale_price": 90.0, "inventory": 12, "min_inventory": 5, "category": "Bebidas",
+    "date_added": "2025-01-01T10:00:00",
+}
+
+
+def test_diferencia_solo_campos_cambiados():
+    nuevo = dict(PRODUCTO, sale_price=95.0)
+    antes, despues = diferencia(PRODUCTO, nuevo)
+
+    assert (antes, despues) == ({"sale_price": 90.0}, {"sale_price": 95.0})
+    assert aplicar(PRODUCTO, despues) == nuevo
+    assert aplicar(nuevo, antes) == PRODUCTO
+
+
+def test_diferencia_anidada():
+    antes, despues = diferencia({"a": {"x": 1, "y": 2}, "b": [1]}, {"a": {"x": 1, "y": 3}, "b": [1]})
+    assert (antes, despues) == ({"a": {"y": 2}}, {"a": {"y": 3}})
+    assert aplicar({"a": {"x": 1, "y": 2}, "b": [1]}, despues) == {"a": {"x": 1, "y": 3}, "b": [1]}
+
+
+def test_fila_de_modificacion_guarda_solo_la_diferencia():
+    fila = AuditWriter._fila(EventoAuditoria(
+        id_usuario=1, accion="modificar", modulo="productos",
+        datos_anteriores=PRODUCTO, datos_nuevos=dict(PRODUCTO, sale_price=95.0)
+    ))
+
+    assert fila["es_diferencia"] is True and fila["entidad"] == "7"
+    assert fila["datos_anteriores"] == {"sale_price": 90.0}
+    assert fila["datos_nuevos"] == {"sale_price": 95.0}
+    # Una copia del objeto en el registro "crear" contra dos copias completas por cambio
+    assert len(str(fila["datos_nuevos"])) * 10 < len(str(PRODUCTO))
+
+
+def registro(id_historial, accion, anteriores=None, nuevos=None, diferencia=False):
+    return SimpleNamespace(
+        id_historial=id_historial, modulo="productos", entidad="7", accion=accion,
+        es_diferencia=diferencia, datos_anteriores=anteriores, datos_nuevos=nuevos,
+        fecha_accion=datetime(2025, 1, 1)
+    )
+
+
+def test_reconstruye_vistas_completas():
+    filas = [
+        # Registro anterior al cambio: el APIResponse completo
+        registro(1, "crear", nuevos={"success": True, "data": PRODUCTO}),
+        registro(2, "modificar", {"sale_price": 90.0}, {"sale_price": 95.0}, diferencia=True),
+        registro(3, "modificar", {"inventory": 12}, {"inventory": 20}, diferencia=True),
+    ]
+
+    vistas = reproducir_cambios(filas)
+
+    assert vistas[2] == (PRODUCTO, dict(PRODUCTO, sale_price=95.0))
+    assert vistas[3] == (dict(PRODUCTO, sale_price=95.0), dict(PRODUCTO, sale_price=95.0, inventory=20))
+
+
+def test_sin_estado_inicial_solo_campos_conocidos():
+    vistas = reproducir_cambios([registro(5, "modificar", {"name": "A"}, {"name": "B"}, diferencia=True)])
+    assert vistas[5] == ({"name": "A"}, {"name": "B"})
@@ -0,0 +1,151 @@
+# tests/test_historial_paginacion.py
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.core.enums.modo_total import TotalMode
+from app.services.historial_acciones_service import HistorialService
+
+
+class FakeResult:
+    def __init__(self, filas=None, escalar=None):
+        self.filas = filas or []
+        self.escalar = escalar
+
+    def all(self):
+        return self.filas
+
+    def scalar(self):
+        return self.escalar
+
+
+class FakeDB:
+    def __init__(self, filas, dialecto="sqlite", total=None, dialecto_pg=None):
+        self.filas = filas
+        self.total = total
+        self.dialecto = dialecto
+        self.dialecto_pg = dialecto_pg or postgresql.dialect()
+        self.queries = []
+        self.explains = []
+
+    def get_bind(self):
+        return SimpleNamespace(dialect=self.dialecto_pg if self.dialecto == "postgresql"
+                               else SimpleNamespace(name=self.dialecto))
+
+    async def connection(self):
+        db = self
+
+        class Conexion:
+            async def exec_driver_sql(self, sql, parametros):
+                db.explains.append((sql, parametros))
+                return FakeResult(escalar=[{"Plan": {"Plan Rows": 1234}}])
+        return Conexion()
+
+    async def execute(self, query):
+        self.queries.append(query)
+        sql = str(query)
+        if "count(" in sql:
+            return FakeResult(escalar=self.total)
+        return FakeResult(filas=self.filas)
+
+
+def registro(id_historial, fecha):
+    return SimpleNamespace(
+        id_historial=id_historial, id_usuario=1, accion="crear", modulo="productos", descripcion=None,
+        datos_anteriores=None, datos_nuevos=None, es_diferencia=False, entidad=None, fecha_accion=fecha
+    )
+
+
+def filas(n):
+    base = datetime(2025, 3, 1, 12, 0, 0)
+    return [(registro(100 - i, base - timedelta(minutes=i)), "ana") for i in range(n)]
+
+
+def sql(query):
+    return str(query.compile(dialect=postgresql.dialect())).lower()
+
+
+def test_cursor_ida_y_vuelta():
+    fecha = datetime(2025, 3, 1, 12, 30, 15, 123456)
+    cursor = HistorialService.codificar_cursor(fecha, 42)
+    assert HistorialService.decodificar_cursor(cursor) == (fecha, 42)
+
+
+@pytest.mark.parametrize("cursor", ["no-es-cursor", "W10=", "ñ"])
+def test_cursor_invalido(cursor):
+    with pytest.raises(ValueError):
+        HistorialService.decodificar_cursor(cursor)
+
+
+@pytest.mark.asyncio
+async def test_pagina_con_siguiente_cursor():
+    db = FakeDB(filas(4))
+    respuesta = await HistorialService(db).listar_historial(per_page=3)
+
+    pagina = respuesta.data
+    assert [i.id_historial for i in pagina.items] == [100, 99, 98]
+    assert pagina.items[0].nombre_usuario == "ana"
+    assert HistorialService.decodificar_cursor(pagina.next_cursor) == (pagina.items[-1].fecha_accion, 98)
+    assert pagina.total_items is None
+    # Una sola consulta: sin COUNT y el usuario viene en el mismo SELECT
+    assert len(db.queries) == 1
+    consulta = sql(db.queries[0])
+    assert "join usuarios" in consulta and "usuarios.nombre_usuario" in consulta
+    assert "offset" not in consulta
+    assert "order by historial_acciones.fecha_accion desc, historial_acciones.id_historial desc" in consulta
+
+
+@pytest.mark.asyncio
+async def test_ultima_pagina_sin_cursor():
+    db = FakeDB(filas(2))
+    respuesta = await HistorialService(db).listar_historial(per_page=3)
+    assert respuesta.data.next_cursor is None
+
+
+@pytest.mark.asyncio
+async def test_filtros_exactos_y_condicion_de_cursor():
+    db = FakeDB([])
+    cursor = HistorialService.codificar_cursor(datetime(2025, 3, 1), 50)
+    await HistorialService(db).listar_historial(
+        cursor=cursor, usuario_nombre="ana", accion="crear", modulo="productos"
+    )
+
+    consulta = sql(db.queries[0])
+    assert "ilike" not in consulta
+    assert "historial_acciones.accion = " in consulta and "historial_acciones.modulo = " in consulta
+    assert "historial_acciones.id_usuario = (select usuarios.id_usuario" in consulta
+    assert "(historial_acciones.fecha_accion, historial_acciones.id_historial) < (" in consulta
+
+
+@pytest.mark.asyncio
+async def test_total_exacto():
+    db = FakeDB(filas(1), total=57)
+    pagina = (await HistorialService(db).listar_historial(total=TotalMode.exacto)).data
+    assert (pagina.total_items, pagina.total_estimado) == (57, False)
+
+
+@pytest.mark.asyncio
+async def test_total_estimado_con_el_plan():
+    db = FakeDB(filas(1), dialecto="postgresql")
+    pagina = (await HistorialService(db).listar_historial(modulo="productos", total=TotalMode.estimado)).data
+
+    assert (pagina.total_items, pagina.total_estimado) == (1234, True)
+    explain, parametros = db.explains[0]
+    assert explain.startswith("EXPLAIN (FORMAT JSON) SELECT")
+    assert "productos" not in explain and "productos" in parametros.values()
+
+
+@pytest.mark.asyncio
+async def test_total_estimado_no_interpreta_el_filtro():
+    """Un valor con ':palabra' es un parámetro más, no SQL ni un bind nuevo."""
+    from sqlalchemy.dialects.postgresql import asyncpg
+
+    db = FakeDB(filas(1), dialecto="postgresql", dialecto_pg=asyncpg.dialect())
+    pagina = (await HistorialService(db).listar_historial(modulo="x :evil", total=TotalMode.estimado)).data
+
+    assert pagina.total_items == 1234
+    explain, parametros = db.explains[0]
+    assert ":evil" not in explain and "$1" in explain
+    assert parametros == ("x :evil",)
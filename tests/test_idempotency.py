@@ -0,0 +1,148 @@
+# tests/test_idempotency.py
+"""Claves de idempotencia en una base SQLite local, cada petición con su propia sesión."""
+from types import SimpleNamespace
+
+import pytest
+import pytest_asyncio
+from pydantic import BaseModel
+from sqlalchemy import Column, Integer, MetaData, Table, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.idempotency import IdempotencyStore
+from app.models.idempotency_keys import ClaveIdempotencia
+
+metadata = MetaData()
+ventas = Table("ventas_prueba", metadata, Column("id", Integer, primary_key=True))
+
+
+class Venta(BaseModel):
+    sale_id: int
+
+
+@pytest_asyncio.fixture
+async def sesiones(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'idempotencia.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(metadata.create_all)
+        await conn.run_sync(ClaveIdempotencia.__table__.create)
+    yield sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession)
+    await engine.dispose()
+
+
+def crear_venta(db, llamadas, falla=False):
+    """Imita SaleService.create_sale: registra la venta y la clave en la misma transacción."""
+    async def funcion(registrar):
+        llamadas.append(1)
+        result = await db.execute(insert(ventas).returning(ventas.c.id), [{}])
+        venta = Venta(sale_id=result.scalar_one())
+        if falla:
+            raise ValueError("sin stock")
+        if registrar:
+            registrar(venta)
+        await db.commit()
+        return venta
+    return funcion
+
+
+async def pedir(sesiones, store, clave, payload="{}", llamadas=None, falla=False):
+    async with sesiones() as db:
+        return await store.ejecutar(db, clave, payload, Venta, crear_venta(db, llamadas if llamadas is not None else [], falla))
+
+
+async def contar(sesiones, tabla) -> int:
+    async with sesiones() as db:
+        return (await db.execute(select(func.count()).select_from(tabla))).scalar()
+
+
+@pytest.mark.asyncio
+async def test_reintento_devuelve_resultado_guardado(sesiones):
+    store = IdempotencyStore(ttl_seconds=60)
+    llamadas = []
+
+    primero = await pedir(sesiones, store, "k1", llamadas=llamadas)
+    segundo = await pedir(sesiones, store, "k1", llamadas=llamadas)
+
+    assert primero == segundo == Venta(sale_id=1)
+    assert len(llamadas) == 1
+    assert await contar(sesiones, ventas) == 1
+
+
+@pytest.mark.asyncio
+async def test_error_no_se_guarda(sesiones):
+    store = IdempotencyStore(ttl_seconds=60)
+
+    with pytest.raises(ValueError, match="sin stock"):
+        await pedir(sesiones, store, "k1", falla=True)
+    assert await contar(sesiones, ClaveIdempotencia.__table__) == 0
+
+    assert await pedir(sesiones, store, "k1") == Venta(sale_id=1)
+
+
+@pytest.mark.asyncio
+async def test_clave_reutilizada_con_otro_payload(sesiones):
+    store = IdempotencyStore(ttl_seconds=60)
+
+    await pedir(sesiones, store, "k1", payload='{"a": 1}')
+    with pytest.raises(ValueError, match="solicitud distinta"):
+        await pedir(sesiones, store, "k1", payload='{"a": 2}')
+
+
+@pytest.mark.asyncio
+async def test_clave_vencida_se_reemplaza(sesiones):
+    store = IdempotencyStore(ttl_seconds=0)
+    llamadas = []
+
+    assert await pedir(sesiones, store, "k1", llamadas=llamadas) == Venta(sale_id=1)
+    assert await pedir(sesiones, store, "k1", llamadas=llamadas) == Venta(sale_id=2)
+    assert len(llamadas) == 2
+    assert await contar(sesiones, ClaveIdempotencia.__table__) == 1
+
+
+@pytest.mark.asyncio
+async def test_otro_worker_confirma_primero(sesiones):
+    """Sin advisory lock (SQLite), la restricción única resuelve la carrera."""
+    store = IdempotencyStore(ttl_seconds=60)
+    llamadas = []
+
+    async with sesiones() as db:
+        operacion = crear_venta(db, llamadas)
+
+        async def carrera(registrar):
+            # La misma clave llega a otro worker y se confirma antes que esta
+            otro = await pedir(sesiones, store, "k1", llamadas=llamadas)
+            assert otro == Venta(sale_id=1)
+            return await operacion(registrar)
+
+        resultado = await store.ejecutar(db, "k1", "{}", Venta, carrera)
+
+    assert resultado == Venta(sale_id=1)
+    assert len(llamadas) == 2
+    # La venta duplicada se revirtió junto con su clave
+    assert await contar(sesiones, ventas) == 1
+
+
+@pytest.mark.asyncio
+async def test_sin_clave_siempre_ejecuta(sesiones):
+    store = IdempotencyStore(ttl_seconds=60)
+    llamadas = []
+
+    await pedir(sesiones, store, None, llamadas=llamadas)
+    await pedir(sesiones, store, None, llamadas=llamadas)
+    assert len(llamadas) == 2
+    assert await contar(sesiones, ClaveIdempotencia.__table__) == 0
+
+
+@pytest.mark.asyncio
+async def test_advisory_lock_en_postgres():
+    ejecutadas = []
+
+    class FakeDB:
+        async def connection(self):
+            return SimpleNamespace(dialect=SimpleNamespace(name="postgresql"))
+
+        async def execute(self, stmt, params=None):
+            ejecutadas.append((str(stmt), params))
+
+    await IdempotencyStore._bloquear(FakeDB(), "sales:1:k1")
+    assert ejecutadas == [("SELECT pg_advisory_xact_lock(hashtextextended(:clave, 0))", {"clave": "sales:1:k1"})]
@@ -0,0 +1,100 @@
+# tests/test_instrumentacion_sql.py
+import json
+import logging
+
+import pytest
+import pytest_asyncio
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from app.core.config import settings
+from app.db.instrumentacion import forma_sentencia, instrumentar, medir_sql, presupuesto_sql
+from app.middleware.logging import LoggingMiddleware
+
+
+@pytest_asyncio.fixture
+async def engine():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    instrumentar(engine)
+    yield engine
+    await engine.dispose()
+
+
+async def consultar_productos(engine, ids):
+    """Una consulta por producto: el patrón N+1."""
+    async with engine.connect() as conn:
+        for id_product in ids:
+            await conn.execute(text("SELECT :id AS id_product"), {"id": id_product})
+
+
+def test_forma_sentencia():
+    assert forma_sentencia("SELECT * FROM products WHERE id = $1 AND name IN ($2, $3,  $4)") == \
+        "SELECT * FROM products WHERE id = ? AND name IN (?...)"
+    assert forma_sentencia("SELECT *\n  FROM t WHERE a = %(a)s") == "SELECT * FROM t WHERE a = ?"
+
+
+@pytest.mark.asyncio
+async def test_mide_consultas_y_detecta_repetidas(engine):
+    with medir_sql() as estadisticas:
+        await consultar_productos(engine, range(6))
+
+    assert estadisticas.consultas == 6
+    assert estadisticas.tiempo_ms > 0
+    resumen = estadisticas.resumen()
+    assert len(resumen["mas_lentas"]) == 3
+    assert resumen["repetidas"] == [{"veces": 6, "sql": "SELECT ? AS id_product"}]
+
+
+@pytest.mark.asyncio
+async def test_fuera_de_un_bloque_medido_no_registra(engine):
+    await consultar_productos(engine, [1])
+    with medir_sql() as estadisticas:
+        pass
+    assert estadisticas.consultas == 0
+
+
+@pytest.mark.asyncio
+async def test_presupuesto_sql(engine):
+    with presupuesto_sql(max_consultas=2):
+        await consultar_productos(engine, [1, 2])
+
+    with pytest.raises(AssertionError, match="3 sentencias"):
+        with presupuesto_sql(max_consultas=2):
+            await consultar_productos(engine, [1, 2, 3])
+
+    with pytest.raises(AssertionError, match="repetidas"):
+        with presupuesto_sql(max_consultas=10, max_repeticiones=1):
+            await consultar_productos(engine, [1, 2])
+
+
+@pytest.mark.asyncio
+async def test_consulta_lenta_se_registra_en_el_log(engine, monkeypatch, caplog):
+    monkeypatch.setattr(settings, "SQL_SLOW_QUERY_MS", 0.0)
+    with caplog.at_level(logging.WARNING, logger="app.db.instrumentacion"):
+        await consultar_productos(engine, [1])
+    assert "Consulta lenta" in caplog.text and "SELECT ? AS id_product" in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_log_de_peticion_y_presupuesto_por_endpoint(engine, caplog):
+    async def productos(request):
+        await consultar_productos(engine, [1, 2, 3])
+        return JSONResponse({"ok": True})
+
+    app = Starlette(routes=[Route("/productos", productos)])
+    app.add_middleware(LoggingMiddleware)
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        with caplog.at_level(logging.INFO, logger="api-logger"):
+            with presupuesto_sql(max_consultas=3) as estadisticas:
+                response = await client.get("/productos")
+
+    assert response.status_code == 200
+    assert estadisticas.consultas == 3
+    log = json.loads(next(r.getMessage() for r in caplog.records if r.name == "api-logger"))
+    assert log["db"]["consultas"] == 3
+    assert log["db"]["mas_lentas"][0]["sql"] == "SELECT ? AS id_product"
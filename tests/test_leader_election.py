@@ -0,0 +1,85 @@
+# tests/test_leader_election.py
+import pytest
+from app.jobs.leader_election import FileLock, LeaderElection, LeaderLock
+from app.jobs.scheduler import _ejecuciones, registrar_ejecucion
+
+
+class Estado:
+    def __init__(self):
+        self.activo = False
+
+    def ganar(self):
+        self.activo = True
+
+    def perder(self):
+        self.activo = False
+
+
+def crear_eleccion(ruta, estado):
+    return LeaderElection(FileLock(ruta), intervalo=60, al_ganar=estado.ganar, al_perder=estado.perder)
+
+
+@pytest.mark.asyncio
+async def test_solo_un_lider_y_failover(tmp_path):
+    ruta = str(tmp_path / "scheduler.lock")
+    estado_a, estado_b = Estado(), Estado()
+    lider_a, lider_b = crear_eleccion(ruta, estado_a), crear_eleccion(ruta, estado_b)
+
+    await lider_a.verificar()
+    await lider_b.verificar()
+    assert lider_a.es_lider and estado_a.activo
+    assert not lider_b.es_lider and not estado_b.activo
+
+    # El líder se detiene: el siguiente intento del otro worker toma el candado
+    await lider_a.cerrar()
+    assert not estado_a.activo
+    await lider_b.verificar()
+    assert lider_b.es_lider and estado_b.activo
+    await lider_b.cerrar()
+
+
+@pytest.mark.asyncio
+async def test_lider_que_pierde_el_candado_se_pausa(tmp_path):
+    estado = Estado()
+    eleccion = crear_eleccion(str(tmp_path / "scheduler.lock"), estado)
+    await eleccion.verificar()
+
+    async def perdido():
+        return False
+    eleccion.lock.sigue_activo = perdido
+    await eleccion.verificar()
+
+    assert not eleccion.es_lider and not estado.activo
+
+
+@pytest.mark.asyncio
+async def test_registra_duracion_y_resultado():
+    @registrar_ejecucion
+    async def job_prueba():
+        return 3
+
+    @registrar_ejecucion
+    async def job_con_error():
+        raise RuntimeError("falló")
+
+    assert await job_prueba() == 3
+    with pytest.raises(RuntimeError):
+        await job_con_error()
+
+    assert _ejecuciones["job_prueba"]["ultimo_estado"] == "ok"
+    assert _ejecuciones["job_prueba"]["ultimo_resultado"] == 3
+    assert _ejecuciones["job_prueba"]["ultima_duracion_ms"] >= 0
+    assert _ejecuciones["job_con_error"]["errores"] == 1
+    assert _ejecuciones["job_con_error"]["ultimo_error"] == "falló"
+
+
+def test_candado_incompleto_falla_al_crearse():
+    class SinLiberar(LeaderLock):
+        async def adquirir(self):
+            return True
+
+        async def sigue_activo(self):
+            return True
+
+    with pytest.raises(TypeError):
+        SinLiberar()
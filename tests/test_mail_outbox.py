@@ -0,0 +1,100 @@
+# tests/test_mail_outbox.py
+import asyncio
+import pytest
+from app.services.mail_outbox import MailOutbox, MailTransport, MemoryTransport
+from app.services.mail_service import MailService
+
+
+def crear_outbox(transport, **kwargs):
+    opciones = dict(workers=2, max_size=100, batch_size=10, max_reintentos=3, backoff_base=0.01)
+    opciones.update(kwargs)
+    return MailOutbox(transport=transport, **opciones)
+
+
+class FlakyTransport(MemoryTransport):
+    """Falla las primeras `fallos` llamadas."""
+    def __init__(self, fallos):
+        super().__init__()
+        self.fallos = fallos
+        self.llamadas = 0
+
+    async def send(self, to_emails, subject, html_content):
+        self.llamadas += 1
+        if self.llamadas <= self.fallos:
+            raise RuntimeError("SMTP caído")
+        await super().send(to_emails, subject, html_content)
+
+
+@pytest.mark.asyncio
+async def test_send_solo_encola_y_retorna():
+    transport = MemoryTransport()
+    outbox = crear_outbox(transport)
+    service = MailService(outbox=outbox)
+
+    await service.send_otp_email("a@example.com", "123456", "ana")
+
+    # Sin workers iniciados no se envía nada, pero la llamada ya retornó
+    assert transport.enviados == []
+    outbox.iniciar()
+    await outbox.cerrar()
+    assert transport.enviados[0][0] == ["a@example.com"]
+    assert "123456" in transport.enviados[0][2]
+
+
+@pytest.mark.asyncio
+async def test_agrupa_destinatarios_del_mismo_correo():
+    transport = MemoryTransport()
+    outbox = crear_outbox(transport, workers=1)
+    for email in ["a@example.com", "b@example.com", "a@example.com"]:
+        outbox.encolar(email, "Alerta", "<p>stock</p>")
+    outbox.encolar("c@example.com", "Otro", "<p>otro</p>")
+
+    outbox.iniciar()
+    await outbox.cerrar()
+
+    assert sorted(transport.enviados) == [
+        (["a@example.com", "b@example.com"], "Alerta", "<p>stock</p>"),
+        (["c@example.com"], "Otro", "<p>otro</p>"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_reintenta_con_backoff():
+    transport = FlakyTransport(fallos=2)
+    outbox = crear_outbox(transport)
+    outbox.encolar("a@example.com", "Asunto", "<p>hola</p>")
+    outbox.iniciar()
+
+    await asyncio.sleep(0.1)
+    await outbox.cerrar()
+
+    assert transport.llamadas == 3
+    assert len(transport.enviados) == 1
+
+
+@pytest.mark.asyncio
+async def test_descarta_tras_max_reintentos():
+    transport = FlakyTransport(fallos=100)
+    outbox = crear_outbox(transport, max_reintentos=2)
+    outbox.encolar("a@example.com", "Asunto", "<p>hola</p>")
+    outbox.iniciar()
+
+    await asyncio.sleep(0.1)
+    await outbox.cerrar()
+
+    assert transport.llamadas == 3
+    assert transport.enviados == []
+
+
+def test_cola_llena_no_bloquea():
+    outbox = crear_outbox(MemoryTransport(), max_size=1)
+    assert outbox.encolar("a@example.com", "1", "x") is True
+    assert outbox.encolar("b@example.com", "2", "x") is False
+
+
+def test_transporte_incompleto_falla_al_crearse():
+    class SinSend(MailTransport):
+        pass
+
+    with pytest.raises(TypeError):
+        SinSend()
@@ -0,0 +1,144 @@
+# tests/test_permission_cache.py
+import asyncio
+import pytest
+from app.core.permission_cache import PermissionCache
+from app.dependencies.auth import PermissionDeniedError, permission_required
+from app.models.user import Usuario
+
+
+class FakeDBPermisos:
+    def __init__(self, permisos, pausa=None):
+        self.permisos = permisos
+        self.pausa = pausa
+        self.consultas = 0
+
+    async def execute(self, query):
+        self.consultas += 1
+        if self.pausa:
+            await self.pausa.wait()
+        permisos = list(self.permisos)
+
+        class Result:
+            def scalars(inner_self):
+                class Inner:
+                    def all(inner_self):
+                        return permisos
+                return Inner()
+        return Result()
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = PermissionCache(ttl_seconds=60, max_entries=100)
+    monkeypatch.setattr("app.dependencies.auth.permission_cache", cache)
+    return cache
+
+
+@pytest.mark.asyncio
+async def test_permisos_se_consultan_una_vez(cache):
+    db = FakeDBPermisos(["crear_venta", "ver_perfil"])
+    usuario = Usuario(id_usuario=3, rol="usuario")
+    validar_venta = permission_required("crear_venta")
+    validar_perfil = permission_required("ver_perfil")
+
+    assert await validar_venta(usuario=usuario, db=db) is usuario
+    assert await validar_perfil(usuario=usuario, db=db) is usuario
+    with pytest.raises(PermissionDeniedError):
+        await permission_required("config_ticket")(usuario=usuario, db=db)
+
+    assert db.consultas == 1
+    assert cache.metricas()["aciertos"] == 2
+
+
+@pytest.mark.asyncio
+async def test_admin_no_consulta_permisos(cache):
+    db = FakeDBPermisos([])
+    usuario = Usuario(id_usuario=1, rol="admin")
+    assert await permission_required("lo_que_sea")(usuario=usuario, db=db) is usuario
+    assert db.consultas == 0
+
+
+@pytest.mark.asyncio
+async def test_invalidar_usuario_recarga_permisos(cache):
+    db = FakeDBPermisos(["crear_venta"])
+    assert await cache.obtener(3, db) == frozenset({"crear_venta"})
+
+    db.permisos = []
+    cache.invalidar_usuario(3)
+    assert await cache.obtener(3, db) == frozenset()
+    assert db.consultas == 2
+
+
+@pytest.mark.asyncio
+async def test_carga_iniciada_antes_de_invalidar_no_se_guarda(cache):
+    pausa = asyncio.Event()
+    db = FakeDBPermisos(["crear_venta"], pausa=pausa)
+
+    carga = asyncio.create_task(cache.obtener(3, db))
+    await asyncio.sleep(0)
+    cache.invalidar_usuario(3)
+    pausa.set()
+    await carga
+
+    assert cache.metricas()["entradas"] == 0
+
+
+@pytest.mark.asyncio
+async def test_invalidar_todo(cache):
+    db = FakeDBPermisos(["crear_venta"])
+    await cache.obtener(3, db)
+    await cache.obtener(4, db)
+
+    cache.invalidar_todo()
+    await cache.obtener(3, db)
+    assert db.consultas == 3
+
+
+@pytest.mark.asyncio
+async def test_invalidaciones_no_crecen_sin_limite(cache):
+    db = FakeDBPermisos(["crear_venta"])
+    for id_usuario in range(50):
+        await cache.obtener(id_usuario, db)
+        cache.invalidar_usuario(id_usuario)
+
+    # Una invalidación durante una carga se anota solo mientras esa carga sigue en curso
+    pausa = asyncio.Event()
+    carga = asyncio.create_task(cache.obtener(3, FakeDBPermisos(["crear_venta"], pausa=pausa)))
+    await asyncio.sleep(0)
+    cache.invalidar_usuario(3)
+    assert cache._invalidado_en == {3: cache._contador}
+    pausa.set()
+    await carga
+
+    assert cache._invalidado_en == {} and cache._cargas_en_curso == {}
+    assert cache.metricas()["entradas"] == 0
+
+
+@pytest.mark.asyncio
+async def test_seed_de_roles_invalida_todo(monkeypatch, tmp_path):
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+    from sqlalchemy.orm import sessionmaker
+    import app.models  # noqa: F401
+    from app.db import seed_data
+    from app.models import Permiso, Rol, usuario_permisos
+
+    invalidaciones = []
+    monkeypatch.setattr(seed_data.permission_cache, "invalidar_todo", lambda: invalidaciones.append(1))
+    monkeypatch.setattr(seed_data, "hash_password", lambda contrasena: "hash")
+    avisos = []
+
+    async def publicar(db, **kwargs):
+        avisos.append(kwargs)
+    monkeypatch.setattr(seed_data.session_cache, "publicar", publicar)
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'seed.db'}")
+    async with engine.begin() as conn:
+        for tabla in (Rol.__table__, Permiso.__table__, Usuario.__table__, usuario_permisos):
+            await conn.run_sync(tabla.create)
+    async with sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession)() as db:
+        await seed_data.seed_roles_and_permissions(db)
+    await engine.dispose()
+
+    assert invalidaciones == [1]
+    # Los demás workers también descartan sus permisos en caché
+    assert avisos == [{"todos_los_permisos": True}]
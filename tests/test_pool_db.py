@@ -0,0 +1,56 @@
+# tests/test_pool_db.py
+import pytest
+import pytest_asyncio
+from sqlalchemy import exc
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.config import settings
+from app.db.pool import clase_pool, metricas_pool, opciones_engine, precalentar_pool
+
+
+@pytest_asyncio.fixture
+async def engine(tmp_path):
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}",
+        poolclass=clase_pool("prueba"), pool_size=2, max_overflow=0, pool_timeout=0.05
+    )
+    yield engine
+    await engine.dispose()
+
+
+def test_opciones_desde_settings(monkeypatch):
+    monkeypatch.setattr(settings, "DB_STATEMENT_CACHE_SIZE", 0)
+    monkeypatch.setattr(settings, "DB_SSL", False)
+    opciones = opciones_engine("postgresql+asyncpg://u:p@db/x", 5, 3, "x")
+
+    assert (opciones["pool_size"], opciones["max_overflow"]) == (5, 3)
+    assert opciones["pool_timeout"] == settings.DB_POOL_TIMEOUT
+    assert opciones["connect_args"] == {"statement_cache_size": 0, "prepared_statement_cache_size": 0}
+    # Cada engine tiene sus propias métricas
+    assert opciones["poolclass"].metricas is not opciones_engine("postgresql+asyncpg://u:p@db/x", 1, 0, "y")["poolclass"].metricas
+
+
+@pytest.mark.asyncio
+async def test_precalentar_y_metricas(engine):
+    assert await precalentar_pool(engine, 2) == 2
+
+    metricas = metricas_pool(engine)
+    assert (metricas["tamano"], metricas["libres"], metricas["en_uso"]) == (2, 2, 0)
+    assert metricas["checkouts"] == 2
+
+    conn = await engine.connect()
+    assert metricas_pool(engine)["en_uso"] == 1
+    await conn.close()
+
+
+@pytest.mark.asyncio
+async def test_timeout_al_agotar_el_pool(engine):
+    abiertas = [await engine.connect(), await engine.connect()]
+    with pytest.raises(exc.TimeoutError):
+        await engine.connect()
+    for conn in abiertas:
+        await conn.close()
+
+    metricas = metricas_pool(engine)
+    assert metricas["timeouts"] == 1
+    assert metricas["espera_max_ms"] >= 40
@@ -0,0 +1,102 @@
+# tests/test_replica_lectura.py
+"""Réplica de lectura con dos bases SQLite locales: una hace de primaria y otra de réplica."""
+import pytest
+import pytest_asyncio
+from sqlalchemy import Column, Integer, String, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+from app.db.replica import EstadoReplica, SelectorLectura, SesionSoloLecturaError
+
+Base = declarative_base()
+
+
+class Origen(Base):
+    __tablename__ = "origen"
+    id = Column(Integer, primary_key=True)
+    nombre = Column(String(20), nullable=False)
+
+
+async def crear_base(ruta, nombre):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{ruta}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(Origen.__table__.insert().values(nombre=nombre))
+    return engine
+
+
+def fabrica(engine):
+    return sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession)
+
+
+@pytest_asyncio.fixture
+async def bases(tmp_path):
+    primaria = await crear_base(tmp_path / "primaria.db", "primaria")
+    replica = await crear_base(tmp_path / "replica.db", "replica")
+    estado = EstadoReplica(replica, max_retraso=5, intervalo=60)
+    selector = SelectorLectura(fabrica(primaria), fabrica(replica), estado)
+    yield selector, estado
+    await primaria.dispose()
+    await replica.dispose()
+
+
+async def leer(selector) -> str:
+    async with selector() as db:
+        return (await db.execute(select(Origen.nombre))).scalar()
+
+
+@pytest.mark.asyncio
+async def test_lee_de_la_replica_disponible(bases):
+    selector, estado = bases
+    assert await estado.revisar() is True
+
+    assert await leer(selector) == "replica"
+    assert (estado.metricas()["lecturas_replica"], estado.metricas()["retraso_s"]) == (1, 0.0)
+
+
+@pytest.mark.asyncio
+async def test_replica_atrasada_va_a_la_primaria(bases, monkeypatch):
+    selector, estado = bases
+
+    async def atrasada():
+        return 60.0
+    monkeypatch.setattr(estado, "_medir_retraso", atrasada)
+
+    assert await estado.revisar() is False
+    assert await leer(selector) == "primaria"
+    assert estado.lecturas_primaria == 1
+
+
+@pytest.mark.asyncio
+async def test_replica_caida_va_a_la_primaria(tmp_path):
+    primaria = await crear_base(tmp_path / "primaria.db", "primaria")
+    caida = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'no-existe' / 'replica.db'}")
+    estado = EstadoReplica(caida, max_retraso=5, intervalo=60)
+    selector = SelectorLectura(fabrica(primaria), fabrica(caida), estado)
+
+    assert await estado.revisar() is False
+    # Se cae entre revisiones: la primera sesión detecta la falla y usa la primaria
+    estado.disponible = True
+    assert await leer(selector) == "primaria"
+    assert (estado.disponible, estado.caidas) == (False, 1)
+
+    await primaria.dispose()
+    await caida.dispose()
+
+
+@pytest.mark.asyncio
+async def test_sin_replica_configurada(tmp_path):
+    primaria = await crear_base(tmp_path / "primaria.db", "primaria")
+    assert await leer(SelectorLectura(fabrica(primaria))) == "primaria"
+    await primaria.dispose()
+
+
+@pytest.mark.asyncio
+async def test_sesion_de_lectura_no_escribe(bases):
+    selector, estado = bases
+    await estado.revisar()
+
+    async with selector() as db:
+        db.add(Origen(nombre="nuevo"))
+        with pytest.raises(SesionSoloLecturaError):
+            await db.flush()
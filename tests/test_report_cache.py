@@ -0,0 +1,103 @@
+# tests/test_report_cache.py
+import asyncio
+from datetime import datetime
+from decimal import Decimal
+import pytest
+from app.core.report_cache import REPORTE_INVENTARIO, REPORTE_VENTAS, CambioReporte, ReportCache
+from app.schemas.reporte_inventario import ReporteInventarioRequest
+from app.schemas.reporte_ventas import ReporteVentasRequest, ReporteVentasResponse
+from app.services.reporte_inventario_service import alcance_reporte_inventario
+from app.services.reporte_ventas_service import alcance_reporte_ventas
+
+
+def reporte(total="10.00"):
+    return ReporteVentasResponse(ventas=[], total_general=Decimal(total), total_ventas=0)
+
+
+def venta(fecha, producto="Café", categoria="Bebidas", usuario="ana"):
+    return CambioReporte(
+        reportes=frozenset([REPORTE_VENTAS, REPORTE_INVENTARIO]),
+        productos=((producto, categoria),), fecha=fecha, usuario=usuario
+    )
+
+
+class Calculo:
+    def __init__(self):
+        self.llamadas = 0
+
+    async def __call__(self):
+        self.llamadas += 1
+        return reporte()
+
+
+def test_llave_normalizada():
+    a = ReporteVentasRequest(categorias=["B", "A", "A"], fecha_inicio="2025-01-01")
+    b = ReporteVentasRequest(categorias=["A", "B"], fecha_inicio="2025-01-01T00:00:00", productos=[])
+    assert alcance_reporte_ventas(a) == alcance_reporte_ventas(b)
+    assert alcance_reporte_inventario(ReporteInventarioRequest(productos=["x", "y"])) == \
+        alcance_reporte_inventario(ReporteInventarioRequest(productos=["y", "x"]))
+    with pytest.raises(ValueError):
+        alcance_reporte_ventas(ReporteVentasRequest(fecha_fin="ayer"))
+
+
+@pytest.mark.asyncio
+async def test_aciertos_y_fallos():
+    cache = ReportCache(ttl_seconds=60, max_entries=10, max_bytes=10_000)
+    calcular = Calculo()
+    alcance = alcance_reporte_ventas(ReporteVentasRequest())
+
+    await cache.obtener_o_calcular(alcance, calcular)
+    await cache.obtener_o_calcular(alcance, calcular)
+
+    assert calcular.llamadas == 1
+    metricas = cache.metricas()
+    assert (metricas["aciertos"], metricas["fallos"], metricas["entradas"]) == (1, 1, 1)
+
+
+@pytest.mark.asyncio
+async def test_invalidacion_precisa():
+    cache = ReportCache(ttl_seconds=60, max_entries=10, max_bytes=10_000)
+    enero = alcance_reporte_ventas(ReporteVentasRequest(fecha_inicio="2025-01-01", fecha_fin="2025-01-31"))
+    bebidas = alcance_reporte_ventas(ReporteVentasRequest(categorias=["Bebidas"], nombres_usuario=["ana"]))
+    inventario = alcance_reporte_inventario(ReporteInventarioRequest(productos=["Pan"]))
+    for alcance in (enero, bebidas, inventario):
+        await cache.obtener_o_calcular(alcance, Calculo())
+
+    cache.invalidar(venta(datetime(2025, 2, 10), usuario="luis"))        # fuera de enero y de otro usuario
+    assert cache.metricas()["entradas"] == 3
+
+    cache.invalidar(venta(datetime(2025, 1, 15), producto="Pan", categoria="Panadería"))
+    assert cache.metricas()["entradas"] == 1                           # enero e inventario de Pan
+    assert bebidas in cache._entradas
+
+
+@pytest.mark.asyncio
+async def test_calculo_afectado_en_curso_no_se_guarda():
+    cache = ReportCache(ttl_seconds=60, max_entries=10, max_bytes=10_000)
+    alcance = alcance_reporte_ventas(ReporteVentasRequest())
+    pausa = asyncio.Event()
+
+    async def calcular():
+        await pausa.wait()
+        return reporte()
+
+    tarea = asyncio.create_task(cache.obtener_o_calcular(alcance, calcular))
+    await asyncio.sleep(0)
+    cache.invalidar(venta(datetime(2025, 1, 1)))
+    pausa.set()
+    await tarea
+
+    assert cache.metricas()["entradas"] == 0
+
+
+@pytest.mark.asyncio
+async def test_limite_de_memoria_expulsa_lru():
+    tamano = len(reporte().model_dump_json())
+    cache = ReportCache(ttl_seconds=60, max_entries=10, max_bytes=tamano * 2)
+    alcances = [alcance_reporte_ventas(ReporteVentasRequest(productos=[str(i)])) for i in range(3)]
+    for alcance in alcances:
+        await cache.obtener_o_calcular(alcance, Calculo())
+
+    assert alcances[0] not in cache._entradas
+    assert cache.metricas()["bytes"] <= tamano * 2
+    assert cache.metricas()["expulsadas"] == 1
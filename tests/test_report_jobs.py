@@ -0,0 +1,218 @@
+# tests/test_report_jobs.py
+"""Reportes en segundo plano con jobs_reportes en una base SQLite local compartida por dos managers (workers)."""
+import gzip
+from decimal import Decimal
+from types import SimpleNamespace
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from app.core.enums.estado_job import ReportJobStatus
+from app.core.enums.formato_reporte import ReportFormat
+from app.core.enums.tipo_reporte import ReportType
+from app.models.jobs_reportes import JobReporte
+from app.schemas.reporte_ventas import ReporteVentasResponse
+from app.services import report_jobs as modulo
+from app.services.report_jobs import ColaReportesLlenaError, ReportJobManager
+from app.utils.exportacion import leer_gzip
+
+
+class FakeSessionMaker:
+    def __init__(self):
+        self.abiertas = 0
+
+    def __call__(self):
+        return self
+
+    async def __aenter__(self):
+        self.abiertas += 1
+        return object()
+
+    async def __aexit__(self, *args):
+        return False
+
+
+def reporte():
+    return ReporteVentasResponse(ventas=[], total_general=Decimal("12.50"), total_ventas=0)
+
+
+@pytest.fixture
+def ventas_falsas(monkeypatch):
+    llamadas = []
+
+    async def generar(db, filtros):
+        llamadas.append(filtros)
+        if filtros.productos == ["falla"]:
+            raise RuntimeError("sin conexión")
+        return reporte()
+
+    async def exportar(db, query, formato):
+        for parte in (b"a,b\n", b"1,2\n"):
+            yield parte
+
+    definicion = modulo.TIPOS_REPORTE[ReportType.ventas]
+    monkeypatch.setitem(
+        modulo.TIPOS_REPORTE, ReportType.ventas,
+        definicion._replace(generar=generar, exportar=exportar, construir_consulta=lambda filtros: None)
+    )
+    return llamadas
+
+
+@pytest_asyncio.fixture
+async def registro(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'jobs.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(JobReporte.__table__.create)
+    yield sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession)
+    await engine.dispose()
+
+
+@pytest.fixture
+def manager(tmp_path, registro):
+    def crear(**kwargs):
+        opciones = dict(workers=1, max_pendientes=10, ttl_seconds=3600, directorio=str(tmp_path / "archivos"))
+        opciones.update(kwargs)
+        return ReportJobManager(FakeSessionMaker(), registro, **opciones)
+    return crear
+
+
+async def ejecutar_pendientes(jobs):
+    while not jobs._cola.empty():
+        await jobs._ejecutar(await jobs._cola.get())
+
+
+@pytest.mark.asyncio
+async def test_jobs_identicos_pendientes_se_deduplican(manager, ventas_falsas):
+    jobs = manager()
+    a = await jobs.crear(ReportType.ventas, ReportFormat.json, {"categorias": ["B", "A"]}, 1)
+    b = await jobs.crear(ReportType.ventas, ReportFormat.json, {"categorias": ["A", "B", "A"]}, 1)
+    c = await jobs.crear(ReportType.ventas, ReportFormat.csv, {"categorias": ["A", "B"]}, 1)
+    # Otro usuario con los mismos filtros tiene su propio job
+    d = await jobs.crear(ReportType.ventas, ReportFormat.json, {"categorias": ["A", "B"]}, 2)
+
+    assert a.id == b.id and len({a.id, c.id, d.id}) == 3
+    assert (await jobs.a_respuesta(c)).posicion_en_cola == 2
+    assert jobs.metricas()["deduplicados"] == 1
+
+
+@pytest.mark.asyncio
+async def test_otro_worker_ve_y_deduplica_el_job(manager, ventas_falsas):
+    worker_a, worker_b = manager(), manager()
+    job = await worker_a.crear(ReportType.ventas, ReportFormat.json, {}, 1)
+
+    # El estado y la deduplicación no dependen del worker que recibió la solicitud
+    assert (await worker_b.obtener(job.id, 1)).estado == ReportJobStatus.pendiente
+    assert (await worker_b.crear(ReportType.ventas, ReportFormat.json, {}, 1)).id == job.id
+    assert worker_b._cola.empty()
+
+    await ejecutar_pendientes(worker_a)
+    assert (await worker_b.obtener(job.id, 1)).estado == ReportJobStatus.terminado
+
+
+@pytest.mark.asyncio
+async def test_solo_el_dueno_o_un_admin_ven_el_job(manager, ventas_falsas):
+    jobs = manager()
+    job = await jobs.crear(ReportType.ventas, ReportFormat.json, {}, 1)
+
+    assert await jobs.obtener(job.id, 2) is None
+    assert (await jobs.obtener(job.id, 2, es_admin=True)).id == job.id
+    assert await jobs.obtener("no-existe", 1) is None
+
+
+@pytest.mark.asyncio
+async def test_job_genera_archivo_gzip(manager, ventas_falsas):
+    jobs = manager()
+    json_job = await jobs.crear(ReportType.ventas, ReportFormat.json, {}, 1)
+    csv_job = await jobs.crear(ReportType.ventas, ReportFormat.csv, {}, 1)
+    jobs.iniciar()
+    try:
+        await jobs._cola.join()
+    finally:
+        await jobs.cerrar()
+
+    json_job = await jobs.obtener(json_job.id, 1)
+    csv_job = await jobs.obtener(csv_job.id, 1)
+    assert json_job.estado == ReportJobStatus.terminado and json_job.expira is not None
+    with gzip.open(json_job.ruta, "rb") as archivo:
+        assert archivo.read() == reporte().model_dump_json().encode("utf-8")
+    assert b"".join([parte async for parte in leer_gzip(csv_job.ruta)]) == b"a,b\n1,2\n"
+    assert csv_job.bytes_generados == 8
+
+    # Terminado ya no bloquea una solicitud idéntica
+    assert (await jobs.crear(ReportType.ventas, ReportFormat.json, {}, 1)).id != json_job.id
+
+
+@pytest.mark.asyncio
+async def test_job_con_error_no_deja_archivo(manager, ventas_falsas, tmp_path):
+    jobs = manager()
+    job = await jobs.crear(ReportType.ventas, ReportFormat.json, {"productos": ["falla"]}, 1)
+    await ejecutar_pendientes(jobs)
+
+    job = await jobs.obtener(job.id, 1)
+    assert job.estado == ReportJobStatus.error
+    assert job.error == "sin conexión"
+    assert list((tmp_path / "archivos").iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_jobs_vencidos_se_eliminan(manager, ventas_falsas, tmp_path):
+    jobs = manager(ttl_seconds=0)
+    job = await jobs.crear(ReportType.ventas, ReportFormat.json, {}, 1)
+    await ejecutar_pendientes(jobs)
+
+    assert await jobs.obtener(job.id, 1) is None
+    assert await jobs.purgar_expirados() == 1
+    assert list((tmp_path / "archivos").iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_cerrar_marca_los_jobs_locales_con_error(manager, ventas_falsas):
+    jobs = manager()
+    job = await jobs.crear(ReportType.ventas, ReportFormat.json, {}, 1)
+    await jobs.cerrar()
+
+    async with jobs.registro_factory() as db:
+        assert (await db.get(JobReporte, job.id)).estado == ReportJobStatus.error
+    # Ya no bloquea una solicitud idéntica en otro worker
+    assert (await manager().crear(ReportType.ventas, ReportFormat.json, {}, 1)).id != job.id
+
+
+@pytest.mark.asyncio
+async def test_validaciones_y_cola_llena(manager):
+    jobs = manager(max_pendientes=1)
+    with pytest.raises(ValueError):
+        await jobs.crear(ReportType.ventas, ReportFormat.json, {"categorias": "no es lista"}, 1)
+    await jobs.crear(ReportType.inventario, ReportFormat.json, {}, 1)
+    with pytest.raises(ColaReportesLlenaError):
+        await jobs.crear(ReportType.inventario, ReportFormat.csv, {}, 1)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("ruta", ["/reportes/jobs/{id_job}", "/reportes/jobs/{id_job}/descarga"])
+async def test_endpoint_404_para_otro_usuario(manager, ventas_falsas, monkeypatch, ruta):
+    from fastapi import FastAPI
+    from httpx import ASGITransport, AsyncClient
+    from app.api.v1 import routes_reportes
+    from app.core.enums.responses import ResponseCode
+
+    jobs = manager()
+    job = await jobs.crear(ReportType.ventas, ReportFormat.json, {}, 1)
+    await ejecutar_pendientes(jobs)
+    monkeypatch.setattr(routes_reportes, "report_jobs", jobs)
+
+    app = FastAPI()
+    app.include_router(routes_reportes.router)
+    endpoint = next(r for r in app.routes if getattr(r, "path", None) == ruta)
+    permiso = next(d.call for d in endpoint.dependant.dependencies if d.name == "usuario")
+
+    async def pedir(usuario):
+        app.dependency_overrides[permiso] = lambda: usuario
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            return await client.get(ruta.format(id_job=job.id))
+
+    ajeno = await pedir(SimpleNamespace(id_usuario=2, rol="usuario"))
+    assert ajeno.json()["code"] == ResponseCode.NOT_FOUND.code
+
+    dueno = await pedir(SimpleNamespace(id_usuario=1, rol="usuario"))
+    assert dueno.status_code == 200
+    assert dueno.headers["content-type"].startswith("application/json")
@@ -0,0 +1,60 @@
+# tests/test_reporte_inventario.py
+from datetime import datetime
+from types import SimpleNamespace
+import pytest
+from sqlalchemy.dialects import postgresql
+from app.schemas.reporte_inventario import ReporteInventarioRequest
+from app.services.reporte_inventario_service import generar_reporte_inventario
+
+
+def fila(id_product, stock, entradas=0, salidas=0, fecha=None):
+    return SimpleNamespace(
+        id_product=id_product, nombre=f"Producto {id_product}", categoria="Bebidas",
+        total_entradas=entradas, total_salidas=salidas, stock_actual=stock, minimo=5,
+        ultima_actualizacion=fecha
+    )
+
+
+class FakeDBReporte:
+    def __init__(self, filas):
+        self.filas = filas
+        self.queries = []
+
+    async def execute(self, query):
+        self.queries.append(query)
+        filas = self.filas
+
+        class Result:
+            def all(inner_self):
+                return filas
+        return Result()
+
+
+@pytest.mark.asyncio
+async def test_reporte_en_una_sola_consulta():
+    fecha = datetime(2025, 1, 10)
+    db = FakeDBReporte([fila(1, 10, entradas=15, salidas=5, fecha=fecha), fila(2, 3)])
+
+    reporte = await generar_reporte_inventario(db, ReporteInventarioRequest())
+
+    assert len(db.queries) == 1
+    assert reporte.total_productos == 2
+    assert reporte.total_stock_general == 13
+    assert reporte.productos[0].total_entradas == 15
+    assert reporte.productos[0].ultima_actualizacion == fecha
+    assert reporte.productos[1].ultima_actualizacion is None
+
+
+@pytest.mark.asyncio
+async def test_filtros_y_agregados_en_sql():
+    db = FakeDBReporte([])
+    filtros = ReporteInventarioRequest(categorias=["Bebidas"], productos=["Agua"], tipo_inventario="bajo")
+
+    await generar_reporte_inventario(db, filtros)
+
+    sql = str(db.queries[0].compile(dialect=postgresql.dialect()))
+    assert "sum(CASE WHEN (inventory_movements.movement_type =" in sql
+    assert "max(inventory_movements.date)" in sql
+    assert "LEFT OUTER JOIN inventory_movements" in sql
+    assert "products.inventory <= products.min_inventory" in sql
+    assert "GROUP BY products.id_product" in sql
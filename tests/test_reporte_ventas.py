@@ -0,0 +1,72 @@
+# tests/test_reporte_ventas.py
+from datetime import datetime
+from decimal import Decimal
+from types import SimpleNamespace
+import pytest
+from sqlalchemy.dialects import postgresql
+from app.schemas.reporte_ventas import ReporteVentasRequest
+from app.services.reporte_ventas_service import generar_reporte_ventas
+
+
+def fila(id_sale, id_product, cantidad, precio, total, subtotal_venta):
+    return SimpleNamespace(
+        id_sale=id_sale, fecha=datetime(2025, 1, id_sale), id_user=1, nombre_usuario="ana",
+        cliente=None, total=Decimal(total), subtotal_venta=Decimal(subtotal_venta),
+        id_product=id_product, nombre=f"Producto {id_product}", categoria="Bebidas",
+        cantidad=cantidad, precio_unitario=Decimal(precio), subtotal=Decimal(precio) * cantidad
+    )
+
+
+class FakeDBReporte:
+    def __init__(self, filas):
+        self.filas = filas
+        self.queries = []
+
+    async def execute(self, query):
+        self.queries.append(query)
+        filas = self.filas
+
+        class Result:
+            def all(inner_self):
+                return filas
+        return Result()
+
+
+@pytest.mark.asyncio
+async def test_agrupa_filas_por_venta():
+    db = FakeDBReporte([
+        fila(1, 10, 2, "5.00", "25.00", "15.00"),
+        fila(1, 11, 1, "5.00", "25.00", "15.00"),
+        fila(2, 10, 1, "5.00", "5.00", "5.00"),
+    ])
+
+    reporte = await generar_reporte_ventas(db, ReporteVentasRequest())
+
+    assert len(db.queries) == 1
+    assert reporte.total_ventas == 2
+    assert reporte.total_general == Decimal("30.00")
+    assert [len(v.productos) for v in reporte.ventas] == [2, 1]
+    assert reporte.ventas[0].subtotal == Decimal("15.00")
+
+
+@pytest.mark.asyncio
+async def test_filtros_en_sql():
+    db = FakeDBReporte([])
+    filtros = ReporteVentasRequest(
+        nombres_usuario=["ana"], fecha_inicio="2025-01-01", fecha_fin="2025-01-31",
+        categorias=["Bebidas"], productos=["Agua"]
+    )
+
+    await generar_reporte_ventas(db, filtros)
+
+    sql = str(db.queries[0].compile(dialect=postgresql.dialect()))
+    assert "categories.name IN" in sql
+    assert "products.name IN" in sql
+    assert "sum(sale_items.price * sale_items.quantity) OVER (PARTITION BY sales.id_sale)" in sql
+    assert "JOIN sale_items" in sql
+
+
+@pytest.mark.asyncio
+async def test_fecha_invalida():
+    with pytest.raises(ValueError, match="fecha_inicio"):
+        await generar_reporte_ventas(FakeDBReporte([]), ReporteVentasRequest(fecha_inicio="ayer"))
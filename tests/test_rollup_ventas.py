@@ -0,0 +1,200 @@
+# tests/test_rollup_ventas.py
+from datetime import date, datetime
+from decimal import Decimal
+from types import SimpleNamespace
+import pytest
+import pytest_asyncio
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from app.core.enums.agrupacion_resumen import SummaryGroupBy
+from app.models import Category, Product, Sale, SaleItem, TicketDiario, Usuario, VentaDiaria
+from app.schemas.reporte_ventas import ResumenVentasRequest
+from app.services import rollup_ventas_service as rollup
+from app.services.reporte_ventas_service import (
+    _dias_completos, construir_consulta_resumen, construir_fuente_resumen, generar_resumen_ventas
+)
+
+
+class FakeDBRollup:
+    def __init__(self, resultados=None):
+        self.resultados = list(resultados or [])
+        self.queries = []
+
+    async def execute(self, query, params=None):
+        self.queries.append((query, params))
+        filas = self.resultados.pop(0) if self.resultados else []
+
+        class Result:
+            def all(inner_self):
+                return filas
+        return Result()
+
+
+def sql(query):
+    return str(query.compile(dialect=postgresql.dialect()))
+
+
+@pytest.mark.asyncio
+async def test_acumular_venta_un_upsert_por_producto():
+    db = FakeDBRollup()
+    lineas = [(7, 2, Decimal("5.00")), (3, 1, Decimal("10.00")), (7, 1, Decimal("5.00"))]
+
+    await rollup.acumular_venta(db, datetime(2025, 3, 4, 15, 30), 9, lineas)
+
+    assert len(db.queries) == 2
+    query, filas = db.queries[0]
+    assert "ON CONFLICT (dia, id_product, id_user) DO UPDATE" in sql(query)
+    assert [f["id_product"] for f in filas] == [3, 7]
+    assert filas[1] == {
+        "dia": date(2025, 3, 4), "id_product": 7, "id_user": 9,
+        "cantidad": 3, "ingresos": Decimal("15.00"), "tickets": 1
+    }
+
+    # La venta de dos productos es un solo ticket del día
+    query, filas = db.queries[1]
+    assert "ON CONFLICT (dia, id_user) DO UPDATE" in sql(query)
+    assert filas == [{"dia": date(2025, 3, 4), "id_user": 9, "tickets": 1}]
+
+
+def test_dias_completos():
+    assert _dias_completos(None, None) == (None, None)
+    assert _dias_completos(datetime(2025, 1, 1), datetime(2025, 1, 31, 23, 59, 59, 999999)) == (
+        date(2025, 1, 1), date(2025, 1, 31)
+    )
+    assert _dias_completos(datetime(2025, 1, 1, 8), datetime(2025, 1, 31, 12)) == (
+        date(2025, 1, 2), date(2025, 1, 30)
+    )
+
+
+def test_fuente_solo_rollup_con_dias_completos():
+    texto = sql(construir_fuente_resumen(datetime(2025, 1, 1), None).element)
+    assert "FROM ventas_diarias" in texto
+    assert "UNION ALL" not in texto and "sale_items" not in texto
+
+
+def test_fuente_combina_rollup_y_dias_parciales():
+    texto = sql(construir_fuente_resumen(datetime(2025, 1, 1, 8), datetime(2025, 1, 31, 12)).element)
+    assert texto.count("UNION ALL") == 2
+    assert "FROM ventas_diarias" in texto
+    assert texto.count("JOIN sale_items") == 2
+
+
+def test_fuente_mismo_dia_lee_solo_ventas():
+    texto = sql(construir_fuente_resumen(datetime(2025, 1, 1, 8), datetime(2025, 1, 1, 12)).element)
+    assert "ventas_diarias" not in texto
+    assert "JOIN sale_items" in texto
+
+
+def test_consulta_resumen_agrupa_y_filtra():
+    filtros = ResumenVentasRequest(categorias=["Bebidas"], agrupar_por=SummaryGroupBy.categoria)
+    texto = sql(construir_consulta_resumen(filtros))
+    assert "GROUP BY categories.name" in texto
+    assert "categories.name IN" in texto
+    # Los tickets por categoría se cuentan desde las ventas, no se suman por producto
+    assert "count(distinct(sales.id_sale)) AS tickets" in texto
+
+
+@pytest.mark.parametrize("agrupar_por, origen", [
+    (SummaryGroupBy.dia, "FROM tickets_diarios"),
+    (SummaryGroupBy.usuario, "FROM tickets_diarios"),
+    (SummaryGroupBy.producto, "sum(anon_1.tickets) AS tickets"),
+])
+def test_consulta_resumen_origen_de_tickets(agrupar_por, origen):
+    texto = sql(construir_consulta_resumen(ResumenVentasRequest(agrupar_por=agrupar_por)))
+    assert origen in texto
+
+
+def test_tickets_con_filtro_de_producto_salen_de_las_ventas():
+    filtros = ResumenVentasRequest(productos=["Café"], agrupar_por=SummaryGroupBy.dia)
+    texto = sql(construir_consulta_resumen(filtros))
+    assert "tickets_diarios" not in texto
+    assert "count(distinct(sales.id_sale)) AS tickets" in texto
+
+
+@pytest_asyncio.fixture
+async def sesiones_resumen(tmp_path):
+    """
+    Un día completo con un solo ticket de dos productos de la misma categoría,
+    con los acumulados tal como los deja acumular_venta.
+    """
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'resumen.db'}")
+    tablas = [t.__table__ for t in (Usuario, Category, Product, Sale, SaleItem, VentaDiaria, TicketDiario)]
+    async with engine.begin() as conn:
+        await conn.run_sync(lambda c: Usuario.metadata.create_all(c, tables=tablas))
+        await conn.execute(insert(Usuario), [{
+            "id_usuario": 1, "nombre_usuario": "caja1", "correo_electronico": "caja1@x.com", "contrasena": "x"
+        }])
+        await conn.execute(insert(Category), [{"id": 1, "name": "Bebidas"}])
+        await conn.execute(insert(Product), [
+            {"id_product": p, "code": f"P{p}", "name": f"Producto {p}", "sale_price": Decimal("5.00"),
+             "inventory": 10, "min_inventory": 0, "id_category": 1}
+            for p in (1, 2)
+        ])
+        await conn.execute(insert(Sale), [{"id_sale": 1, "id_user": 1, "date": datetime(2025, 1, 1, 10), "total": Decimal("15.00")}])
+        await conn.execute(insert(SaleItem), [
+            {"id_sale": 1, "id_product": 1, "quantity": 1, "price": Decimal("5.00")},
+            {"id_sale": 1, "id_product": 2, "quantity": 2, "price": Decimal("5.00")},
+        ])
+        await conn.execute(insert(VentaDiaria), [
+            {"dia": date(2025, 1, 1), "id_product": p, "id_user": 1, "cantidad": c, "ingresos": Decimal(i), "tickets": 1}
+            for p, c, i in ((1, 1, "5.00"), (2, 2, "10.00"))
+        ])
+        await conn.execute(insert(TicketDiario), [{"dia": date(2025, 1, 1), "id_user": 1, "tickets": 1}])
+    yield sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession)
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("agrupar_por, filtros", [
+    (SummaryGroupBy.dia, {}),
+    (SummaryGroupBy.usuario, {}),
+    (SummaryGroupBy.usuario, {"productos": ["Producto 1", "Producto 2"]}),
+    (SummaryGroupBy.categoria, {}),
+])
+async def test_ticket_de_dos_productos_cuenta_una_vez(sesiones_resumen, agrupar_por, filtros):
+    request = ResumenVentasRequest(
+        fecha_inicio="2025-01-01", fecha_fin="2025-01-01T23:59:59.999999", agrupar_por=agrupar_por, **filtros
+    )
+    async with sesiones_resumen() as db:
+        resumen = await generar_resumen_ventas(db, request)
+
+    assert [(f.cantidad, f.ingresos, f.tickets) for f in resumen.filas] == [(3, Decimal("15.00"), 1)]
+
+
+@pytest.mark.asyncio
+async def test_ticket_de_dos_productos_por_producto(sesiones_resumen):
+    request = ResumenVentasRequest(fecha_inicio="2025-01-01", agrupar_por=SummaryGroupBy.producto)
+    async with sesiones_resumen() as db:
+        resumen = await generar_resumen_ventas(db, request)
+
+    # Cada producto estuvo en un ticket
+    assert [(f.clave, f.tickets) for f in resumen.filas] == [("Producto 1", 1), ("Producto 2", 1)]
+
+
+@pytest.mark.asyncio
+async def test_generar_resumen_totales():
+    db = FakeDBRollup([[
+        SimpleNamespace(clave=date(2025, 1, 1), cantidad=3, ingresos=Decimal("15.00"), tickets=2),
+        SimpleNamespace(clave=date(2025, 1, 2), cantidad=1, ingresos=Decimal("5.50"), tickets=1),
+    ]])
+
+    resumen = await generar_resumen_ventas(db, ResumenVentasRequest())
+
+    assert [f.clave for f in resumen.filas] == ["2025-01-01", "2025-01-02"]
+    assert resumen.total_cantidad == 4
+    assert resumen.total_ingresos == Decimal("20.50")
+
+
+@pytest.mark.asyncio
+async def test_verificar_rollup_reporta_dias_distintos():
+    dia = lambda d, c, i, t: SimpleNamespace(dia=date(2025, 1, d), cantidad=c, ingresos=Decimal(i), tickets=t)
+    db = FakeDBRollup([
+        [dia(1, 3, "15.00", 2), dia(2, 1, "5.00", 1)],   # ventas
+        [dia(1, 3, "15.00", 2)],                          # ventas_diarias
+    ])
+
+    diferencias = await rollup.verificar_rollup(db, date(2025, 1, 1), date(2025, 1, 2))
+
+    assert diferencias == [{"dia": "2025-01-02", "ventas": (1, Decimal("5.00"), 1), "rollup": None}]
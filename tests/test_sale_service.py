@@ -0,0 +1,355 @@
+# tests/test_sale_service.py
+import asyncio
+import json
+from decimal import Decimal
+from types import SimpleNamespace
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.models.idempotency_keys import ClaveIdempotencia
+from app.models.product import Product
+from app.models.sales.sales import Sale
+from app.schemas.sales import SaleCreateRequest, SaleProductRequest, SaleSyncRecord
+from app.services.inventory_service import descontar_inventarios, incrementar_inventarios
+from app.services.sale_service import SaleService
+from app.utils.ndjson import leer_lineas_ndjson
+
+
+def make_product(id_product, code, barcode=None, inventory=100, min_inventory=0):
+    return Product(
+        id_product=id_product,
+        code=code,
+        barcode=barcode,
+        name=f"Producto {code}",
+        sale_price=Decimal("10.00"),
+        inventory=inventory,
+        min_inventory=min_inventory,
+    )
+
+
+class FakeDBSale:
+    """Sesión falsa que registra cada sentencia ejecutada."""
+    def __init__(self, products):
+        self.products = products
+        self.statements = []
+        self.added = []
+        self.bulk_inserts = {}
+        self.committed = False
+
+    @property
+    def claves(self):
+        return [obj for obj in self.added if isinstance(obj, ClaveIdempotencia)]
+
+    def add(self, obj):
+        self.added.append(obj)
+
+    async def flush(self):
+        for obj in self.added:
+            if isinstance(obj, Sale) and obj.id_sale is None:
+                obj.id_sale = 1
+
+    async def execute(self, query, params=None):
+        self.statements.append(query)
+        # Las claves de idempotencia "confirmadas" son las agregadas a la sesión
+        products = self.claves if "claves_idempotencia" in str(query) else self.products
+        if params is not None:
+            # INSERT multi-fila: RETURNING devuelve las mismas filas en orden
+            self.bulk_inserts[query.table.name] = params
+            rows = [SimpleNamespace(**p) for p in params]
+        else:
+            rows = []
+
+        class Result:
+            def scalars(inner_self):
+                class Inner:
+                    def all(inner_self):
+                        return products
+                return Inner()
+
+            def all(inner_self):
+                return rows
+
+            def fetchall(inner_self):
+                return []
+        return Result()
+
+    def begin_nested(self):
+        class FakeSavepoint:
+            async def __aenter__(inner_self):
+                return inner_self
+
+            async def __aexit__(inner_self, exc_type, exc, tb):
+                return False
+        return FakeSavepoint()
+
+    async def commit(self):
+        self.committed = True
+
+    async def refresh(self, obj):
+        pass
+
+
+def fake_descontar(products, llamadas=None):
+    """Imita el UPDATE ... FROM (VALUES ...) condicional sobre los productos en memoria."""
+    async def _descontar(db, cantidades):
+        if llamadas is not None:
+            llamadas.append(dict(cantidades))
+        resultado = {}
+        for product in products:
+            cantidad = cantidades.get(product.id_product)
+            if cantidad is not None and product.inventory >= cantidad:
+                product.inventory -= cantidad
+                resultado[product.id_product] = (product.inventory + cantidad, product.inventory)
+        return resultado
+    return _descontar
+
+
+@pytest.mark.asyncio
+async def test_create_sale_resuelve_productos_en_una_consulta(monkeypatch):
+    products = [make_product(1, "A"), make_product(2, "B", barcode="111"), make_product(3, "C")]
+    db = FakeDBSale(products)
+    monkeypatch.setattr("app.services.sale_service.descontar_inventarios", fake_descontar(products))
+    service = SaleService(db, current_user_id=1)
+
+    request = SaleCreateRequest(products=[
+        SaleProductRequest(product_code="C", quantity=1),
+        SaleProductRequest(product_code=None, barcode="111", quantity=2),
+        SaleProductRequest(product_code="A", quantity=3),
+    ])
+    response = await service.create_sale(request)
+
+    product_queries = [q for q in db.statements if str(q).startswith("SELECT") and "products" in str(q)]
+    assert len(product_queries) == 1
+    sql = str(product_queries[0].compile(dialect=postgresql.dialect()))
+    assert "FOR UPDATE" in sql
+    assert "ORDER BY products.id_product" in sql
+
+    assert [p.product for p in response.products] == ["Producto C", "Producto B", "Producto A"]
+    assert response.total == 60.0
+    assert db.committed is True
+
+    # Un solo INSERT por tabla, sin importar el número de items
+    inserts = [q for q in db.statements if str(q).startswith("INSERT")]
+    assert len(inserts) == 4
+    assert len(db.bulk_inserts["sale_items"]) == 3
+    assert len(db.bulk_inserts["inventory_movements"]) == 3
+
+    # Acumulado diario: un upsert con una fila por producto, en orden de id
+    acumulados = db.bulk_inserts["ventas_diarias"]
+    assert [a["id_product"] for a in acumulados] == [1, 2, 3]
+    assert [a["ingresos"] for a in acumulados] == [Decimal("30.00"), Decimal("20.00"), Decimal("10.00")]
+    assert all(a["tickets"] == 1 for a in acumulados)
+    assert [t["tickets"] for t in db.bulk_inserts["tickets_diarios"]] == [1]
+
+
+@pytest.mark.asyncio
+async def test_create_sale_producto_no_encontrado():
+    db = FakeDBSale([make_product(1, "A")])
+    service = SaleService(db, current_user_id=1)
+
+    request = SaleCreateRequest(products=[SaleProductRequest(product_code="X", quantity=1)])
+    with pytest.raises(ValueError, match="no encontrado"):
+        await service.create_sale(request)
+
+
+@pytest.mark.asyncio
+async def test_create_sale_stock_insuficiente(monkeypatch):
+    products = [make_product(1, "A", inventory=2)]
+    db = FakeDBSale(products)
+    monkeypatch.setattr("app.services.sale_service.descontar_inventarios", fake_descontar(products))
+    service = SaleService(db, current_user_id=1)
+
+    request = SaleCreateRequest(products=[SaleProductRequest(product_code="A", quantity=5)])
+    with pytest.raises(ValueError, match="mayor al stock disponible"):
+        await service.create_sale(request)
+
+
+@pytest.mark.asyncio
+async def test_create_sale_movimientos_usan_valores_del_update(monkeypatch):
+    products = [make_product(1, "A", inventory=10)]
+    db = FakeDBSale(products)
+    llamadas = []
+    monkeypatch.setattr("app.services.sale_service.descontar_inventarios", fake_descontar(products, llamadas))
+    service = SaleService(db, current_user_id=1)
+
+    request = SaleCreateRequest(products=[
+        SaleProductRequest(product_code="A", quantity=4),
+        SaleProductRequest(product_code="A", quantity=3),
+    ])
+    response = await service.create_sale(request)
+
+    movements = db.bulk_inserts["inventory_movements"]
+    assert [(m["previous_inventory"], m["new_inventory"]) for m in movements] == [(10, 6), (6, 3)]
+    assert [(p.previous_inventory, p.new_inventory) for p in response.products] == [(10, 6), (6, 3)]
+    # Los dos items del mismo producto se descuentan juntos en un solo UPDATE
+    assert llamadas == [{1: 7}]
+
+
+class FakeDBUpdate:
+    def __init__(self, filas):
+        self.filas = filas
+        self.sql = []
+
+    async def execute(self, stmt):
+        self.sql.append(str(stmt.compile(dialect=postgresql.dialect())))
+        filas = self.filas
+
+        class Result:
+            def all(inner_self):
+                return filas
+        return Result()
+
+
+@pytest.mark.asyncio
+async def test_descontar_inventarios_en_un_update_condicional():
+    # El producto 2 no tenía stock suficiente: el UPDATE no lo devuelve
+    db = FakeDBUpdate([(1, 6)])
+    assert await descontar_inventarios(db, {2: 5, 1: 4}) == {1: (10, 6)}
+
+    assert len(db.sql) == 1
+    sql = db.sql[0]
+    assert sql.startswith("UPDATE products SET inventory=(products.inventory - v.cantidad) FROM (VALUES")
+    assert "AS v (id_product, cantidad)" in sql
+    assert "WHERE products.id_product = v.id_product AND products.inventory >= v.cantidad" in sql
+    assert "RETURNING products.id_product, products.inventory" in sql
+
+
+@pytest.mark.asyncio
+async def test_incrementar_inventarios_en_un_update():
+    db = FakeDBUpdate([(1, 14), (2, 3)])
+    assert await incrementar_inventarios(db, {1: 4, 2: 3}) == {1: (10, 14), 2: (0, 3)}
+    assert len(db.sql) == 1
+    assert "SET inventory=(products.inventory + v.cantidad) FROM (VALUES" in db.sql[0]
+
+
+@pytest.mark.asyncio
+async def test_sincronizar_ventas_lote_con_errores(monkeypatch):
+    products = [make_product(1, "A", inventory=5), make_product(2, "B", inventory=5)]
+    db = FakeDBSale(products)
+    monkeypatch.setattr("app.services.sale_service.descontar_inventarios", fake_descontar(products))
+    service = SaleService(db, current_user_id=1)
+
+    registros = [
+        SaleSyncRecord(client_id="pos-1", products=[SaleProductRequest(product_code="A", quantity=3)]),
+        SaleSyncRecord(client_id="pos-2", products=[SaleProductRequest(product_code="A", quantity=3)]),
+        SaleSyncRecord(client_id="pos-3", products=[SaleProductRequest(product_code="B", quantity=1)]),
+    ]
+    resultados = await service.sincronizar_ventas(registros)
+
+    assert [(r.client_id, r.success) for r in resultados] == [("pos-1", True), ("pos-2", False), ("pos-3", True)]
+    assert "mayor al stock disponible" in resultados[1].detail
+    product_queries = [q for q in db.statements if str(q).startswith("SELECT") and "products" in str(q)]
+    assert len(product_queries) == 1
+    assert db.committed is True
+
+
+@pytest.mark.asyncio
+async def test_sincronizar_ventas_client_id_repetido(monkeypatch):
+    products = [make_product(1, "A", inventory=10)]
+    db = FakeDBSale(products)
+    monkeypatch.setattr("app.services.sale_service.descontar_inventarios", fake_descontar(products))
+    service = SaleService(db, current_user_id=1)
+
+    venta = SaleSyncRecord(client_id="pos-1", products=[SaleProductRequest(product_code="A", quantity=3)])
+    distinta = SaleSyncRecord(client_id="pos-1", products=[SaleProductRequest(product_code="A", quantity=1)])
+    resultados = await service.sincronizar_ventas([venta, venta, distinta])
+
+    assert [(r.success, r.detail) for r in resultados] == [
+        (True, "Venta sincronizada exitosamente."),
+        (True, "Venta ya sincronizada anteriormente."),
+        (False, "El client_id 'pos-1' ya fue usado con una venta distinta."),
+    ]
+    assert resultados[1].data == resultados[0].data
+    assert products[0].inventory == 7
+
+    # Reenvío en otra petición: se devuelve el resultado guardado sin descontar de nuevo
+    reintento = await SaleService(db, current_user_id=1).sincronizar_ventas([venta])
+    assert reintento[0].data == resultados[0].data
+    assert products[0].inventory == 7
+    assert len(db.claves) == 1 and db.claves[0].clave == "sales-sync:1:pos-1"
+
+
+@pytest.mark.asyncio
+async def test_leer_lineas_ndjson_con_chunks_partidos():
+    async def stream():
+        for chunk in [b'{"a": 1}\n{"b"', b': 2}\n\n', b'{"c": 3}']:
+            yield chunk
+
+    lineas = [linea async for linea in leer_lineas_ndjson(stream())]
+    assert lineas == ['{"a": 1}', '{"b": 2}', '{"c": 3}']
+
+
+async def enviar_bulk(monkeypatch, chunks):
+    from fastapi import FastAPI
+    from httpx import ASGITransport, AsyncClient
+    from app.api.v1 import routes_sales
+    from app.schemas.sales import SaleSyncResult
+    from app.core.enums.responses import ResponseCode
+
+    lotes = []
+
+    class FakeSaleService:
+        def __init__(self, db, id_usuario, nombre_usuario):
+            pass
+
+        async def sincronizar_ventas(self, lote):
+            lotes.append([r.client_id for r in lote])
+            return [SaleSyncResult.from_enum(ResponseCode.SUCCESS, client_id=r.client_id, detail="ok") for r in lote]
+
+    class FakeSession:
+        async def __aenter__(self):
+            return None
+
+        async def __aexit__(self, *args):
+            return False
+
+    monkeypatch.setattr(routes_sales, "SaleService", FakeSaleService)
+    monkeypatch.setattr(routes_sales, "async_session", FakeSession)
+    monkeypatch.setattr(routes_sales.settings, "SALES_SYNC_CHUNK_SIZE", 2)
+
+    app = FastAPI()
+    app.include_router(routes_sales.router)
+    ruta = next(r for r in app.routes if getattr(r, "path", None) == "/sales/bulk")
+    permiso = next(d.call for d in ruta.dependant.dependencies if d.name == "usuario")
+    app.dependency_overrides[permiso] = lambda: SimpleNamespace(id_usuario=1, nombre_usuario="pos")
+
+    async def cuerpo():
+        for chunk in chunks:
+            yield chunk
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        response = await asyncio.wait_for(
+            client.post("/sales/bulk", content=cuerpo(), headers={"Content-Type": "application/x-ndjson"}),
+            timeout=5
+        )
+
+    assert response.status_code == 200
+    resultados = [json.loads(linea) for linea in response.text.splitlines()]
+    return [(r["client_id"], r["success"]) for r in resultados], lotes
+
+
+@pytest.mark.asyncio
+async def test_endpoint_bulk_con_cuerpo_en_streaming(monkeypatch):
+    # Líneas partidas entre chunks, como las envía un cliente por streaming
+    resultados, lotes = await enviar_bulk(monkeypatch, [
+        b'{"client_id": "pos-1", "products": [{"product_code": "A", "quantity": 1}]}\n{"client_id": "pos-2", ',
+        b'"products": [{"product_code": "A", "quantity": 1}]}\n{"client_id": "pos-3"}\n',
+        b'{"client_id": "pos-4", "products": [{"product_code": "B", "quantity": 2}]}',
+    ])
+
+    assert resultados == [("pos-1", True), ("pos-2", True), ("pos-3", False), ("pos-4", True)]
+    assert lotes == [["pos-1", "pos-2"], ["pos-4"]]
+
+
+@pytest.mark.asyncio
+async def test_endpoint_bulk_respeta_el_orden_de_entrada(monkeypatch):
+    # El registro inválido queda entre dos válidos del mismo lote
+    resultados, lotes = await enviar_bulk(monkeypatch, [
+        b'{"client_id": "pos-1", "products": [{"product_code": "A", "quantity": 1}]}\n',
+        b'{"client_id": "pos-2"}\n',
+        b'{"client_id": "pos-3", "products": [{"product_code": "B", "quantity": 2}]}\n',
+        b'{"client_id": "pos-4"}\n',
+    ])
+
+    assert resultados == [("pos-1", True), ("pos-2", False), ("pos-3", True), ("pos-4", False)]
+    assert lotes == [["pos-1", "pos-3"]]
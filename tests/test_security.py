@@ -0,0 +1,103 @@
+# tests/test_security.py
+import asyncio
+import threading
+import pytest
+from app.core.security import HashingBusyError, HashingExecutor
+
+
+@pytest.mark.asyncio
+async def test_hash_y_verify_en_executor_compartido():
+    executor = HashingExecutor(workers=2, max_pendientes=10)
+
+    hashed = await executor.hash("Password123!")
+    assert await executor.verify("Password123!", hashed) is True
+    assert await executor.verify("otra", hashed) is False
+
+    metricas = executor.metricas()
+    assert metricas["total"] == 3
+    assert metricas["en_cola"] == 0
+    assert metricas["tiempo_promedio_ms"] > 0
+    executor.cerrar()
+
+
+@pytest.mark.asyncio
+async def test_no_bloquea_el_event_loop():
+    executor = HashingExecutor(workers=1, max_pendientes=10)
+    liberar = threading.Event()
+    ticks = []
+
+    async def reloj():
+        for _ in range(5):
+            ticks.append(1)
+            await asyncio.sleep(0.01)
+
+    tarea = asyncio.create_task(executor._ejecutar(liberar.wait, 1))
+    await reloj()
+    liberar.set()
+    await tarea
+
+    assert len(ticks) == 5
+    executor.cerrar()
+
+
+@pytest.mark.asyncio
+async def test_rechaza_cuando_la_cola_esta_llena():
+    executor = HashingExecutor(workers=1, max_pendientes=2)
+    liberar = threading.Event()
+
+    tareas = [asyncio.create_task(executor._ejecutar(liberar.wait, 1)) for _ in range(2)]
+    await asyncio.sleep(0)
+    assert executor.metricas()["en_cola"] == 2
+
+    with pytest.raises(HashingBusyError):
+        await executor.hash("Password123!")
+
+    liberar.set()
+    await asyncio.gather(*tareas)
+    assert executor.metricas()["rechazados"] == 1
+    executor.cerrar()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("ruta, cuerpo", [
+    ("/auth/login", {"username": "ana", "password": "Password123!", "login_type": "email"}),
+    ("/auth/reset-password", {"token": "t", "new_password": "Password123!", "confirm_new_password": "Password123!"}),
+])
+async def test_rutas_responden_503_con_pool_saturado(monkeypatch, ruta, cuerpo):
+    from types import SimpleNamespace
+    from fastapi import FastAPI
+    from httpx import ASGITransport, AsyncClient
+    from app.api.v1 import routes_auth
+    from app.core.exception_handlers import register_exception_handlers
+    from app.core.limiter import limiter
+    from app.db.database import get_db
+
+    async def saturado(*args, **kwargs):
+        raise HashingBusyError("Servidor ocupado procesando contraseñas, intenta nuevamente.")
+
+    async def reset_valido(token):
+        return SimpleNamespace(user_id=1)
+
+    async def usuario(id_usuario):
+        return SimpleNamespace(id_usuario=id_usuario)
+
+    fake_service = SimpleNamespace(
+        authenticate_user=saturado,
+        update_password=saturado,
+        verify_password_reset=reset_valido,
+        get_user_by_id=usuario,
+    )
+    monkeypatch.setattr(routes_auth, "UserService", lambda db: fake_service)
+
+    app = FastAPI()
+    app.state.limiter = limiter
+    app.include_router(routes_auth.router)
+    register_exception_handlers(app)
+    app.dependency_overrides[get_db] = lambda: None
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.post(ruta, json=cuerpo)
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "2"
+    assert response.json()["detail"] == "Servidor ocupado procesando contraseñas, intenta nuevamente."
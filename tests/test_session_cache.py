@@ -0,0 +1,275 @@
+# tests/test_session_cache.py
+import asyncio
+import json
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+import pytest
+from app.core.session_cache import CANAL_REVOCACIONES, SessionCache
+from app.dependencies.auth import AdminSessionError, UserSessionError, admin_session_required, user_session_required
+from app.models.sesion import Sesion
+from app.models.user import Usuario
+
+
+def crear_sesion(id=1, id_usuario=7, estado=True, inactivo_hace=timedelta(0)):
+    return Sesion(
+        id=id, id_usuario=id_usuario, estado=estado, token="tok",
+        ultima_actividad=datetime.utcnow() - inactivo_hace,
+        expiracion_inactividad=timedelta(minutes=30)
+    )
+
+
+def crear_usuario(id_usuario=7, rol="usuario"):
+    return Usuario(id_usuario=id_usuario, nombre_usuario="ana", correo_electronico="ana@example.com",
+                   contrasena="hash", rol=rol)
+
+
+class FakeDBSesion:
+    def __init__(self, sesion, usuario):
+        self.fila = (sesion, usuario) if sesion else None
+        self.queries = []
+        self.commits = 0
+
+    async def execute(self, query, params=None):
+        self.queries.append((query, params))
+        fila = self.fila
+
+        class Result:
+            def first(inner_self):
+                return fila
+        return Result()
+
+    async def commit(self):
+        self.commits += 1
+
+
+class FakeSessionMaker:
+    """Reemplaza async_session para capturar el UPDATE en lote."""
+    def __init__(self):
+        self.db = FakeDBSesion(None, None)
+
+    def __call__(self):
+        return self
+
+    async def __aenter__(self):
+        return self.db
+
+    async def __aexit__(self, *args):
+        return False
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = SessionCache(ttl_seconds=60, max_entries=100, flush_interval=60)
+    monkeypatch.setattr("app.dependencies.auth.session_cache", cache)
+    return cache
+
+
+@pytest.mark.asyncio
+async def test_segunda_peticion_no_consulta_la_base_de_datos(cache):
+    db = FakeDBSesion(crear_sesion(), crear_usuario())
+
+    usuario = await user_session_required(token="tok", db=db)
+    usuario_2 = await user_session_required(token="tok", db=db)
+
+    assert usuario.id_usuario == usuario_2.id_usuario == 7
+    assert len(db.queries) == 1
+    assert db.commits == 0
+    assert cache.metricas()["aciertos"] == 1
+    assert cache.metricas()["actividad_pendiente"] == 1
+
+
+@pytest.mark.asyncio
+async def test_admin_valida_rol_desde_cache(cache):
+    db = FakeDBSesion(crear_sesion(), crear_usuario(rol="usuario"))
+
+    with pytest.raises(AdminSessionError, match="No autorizado"):
+        await admin_session_required(token="tok", db=db)
+    with pytest.raises(AdminSessionError, match="No autorizado"):
+        await admin_session_required(token="tok", db=db)
+    assert len(db.queries) == 1
+
+
+@pytest.mark.asyncio
+async def test_sesion_inactiva_se_rechaza(cache):
+    db = FakeDBSesion(crear_sesion(estado=False), crear_usuario())
+    with pytest.raises(UserSessionError, match="inválida"):
+        await user_session_required(token="tok", db=db)
+    assert cache.metricas()["entradas"] == 0
+
+
+@pytest.mark.asyncio
+async def test_expiracion_invalida_la_entrada(cache):
+    db = FakeDBSesion(crear_sesion(inactivo_hace=timedelta(minutes=31)), crear_usuario())
+
+    with pytest.raises(UserSessionError, match="inactividad"):
+        await user_session_required(token="tok", db=db)
+
+    assert db.commits == 1
+    assert cache.metricas()["entradas"] == 0
+    assert cache.metricas()["actividad_pendiente"] == 0
+
+
+@pytest.mark.asyncio
+async def test_invalidar_usuario_fuerza_nueva_consulta(cache):
+    db = FakeDBSesion(crear_sesion(), crear_usuario())
+    await user_session_required(token="tok", db=db)
+
+    cache.invalidar_usuario(7)
+    await user_session_required(token="tok", db=db)
+
+    assert len(db.queries) == 2
+
+
+def test_limite_de_entradas_descarta_la_menos_usada():
+    cache = SessionCache(ttl_seconds=60, max_entries=2, flush_interval=60)
+    for i in range(3):
+        cache.guardar(f"tok{i}", crear_sesion(id=i), crear_usuario())
+    assert cache.obtener("tok0") is None
+    assert cache.obtener("tok2") is not None
+
+
+@pytest.mark.asyncio
+async def test_flush_agrupa_la_actividad_en_un_solo_update(monkeypatch):
+    maker = FakeSessionMaker()
+    monkeypatch.setattr("app.core.session_cache.async_session", maker)
+    cache = SessionCache(ttl_seconds=60, max_entries=100, flush_interval=60)
+
+    ahora = datetime.utcnow()
+    for i in range(3):
+        entrada = cache.guardar(f"tok{i}", crear_sesion(id=i), crear_usuario())
+        cache.registrar_actividad(entrada, ahora)
+        cache.registrar_actividad(entrada, ahora + timedelta(seconds=1))
+
+    assert await cache.flush() == 3
+    assert len(maker.db.queries) == 1
+    _, params = maker.db.queries[0]
+    assert sorted(p["b_id"] for p in params) == [0, 1, 2]
+    assert all(p["b_actividad"] == ahora + timedelta(seconds=1) for p in params)
+    assert maker.db.commits == 1
+    assert await cache.flush() == 0
+
+
+def test_aviso_de_otro_worker_invalida_sesiones_y_usuarios():
+    cache = SessionCache(ttl_seconds=60, max_entries=100, flush_interval=60)
+    cache.guardar("tok1", crear_sesion(id=1, id_usuario=7), crear_usuario(7))
+    cache.guardar("tok2", crear_sesion(id=2, id_usuario=8), crear_usuario(8))
+    cache.guardar("tok3", crear_sesion(id=3, id_usuario=9), crear_usuario(9))
+
+    cache._al_notificar(None, 4242, CANAL_REVOCACIONES, json.dumps({"sesiones": [1]}))
+    cache._al_notificar(None, 4242, CANAL_REVOCACIONES, json.dumps({"usuarios": [9]}))
+
+    assert [cache.obtener(t) is not None for t in ("tok1", "tok2", "tok3")] == [False, True, False]
+    assert cache.metricas()["avisos_recibidos"] == 2
+
+
+def test_aviso_de_otro_worker_invalida_permisos(monkeypatch):
+    from app.core import session_cache as modulo
+
+    invalidados = []
+    monkeypatch.setattr(modulo.permission_cache, "invalidar_usuario", lambda id_usuario: invalidados.append(id_usuario))
+    monkeypatch.setattr(modulo.permission_cache, "invalidar_todo", lambda: invalidados.append("todos"))
+    cache = SessionCache(ttl_seconds=60, max_entries=100, flush_interval=60)
+
+    cache._al_notificar(None, 4242, CANAL_REVOCACIONES, json.dumps({"usuarios": [9]}))
+    cache._al_notificar(None, 4242, CANAL_REVOCACIONES, json.dumps({"sesiones": [1]}))
+    cache._al_notificar(None, 4242, CANAL_REVOCACIONES, json.dumps({"todos_los_permisos": True}))
+
+    assert invalidados == [9, "todos"]
+
+
+@pytest.mark.asyncio
+async def test_publicar_va_en_la_transaccion_del_cambio():
+    db = FakeDBSesion(None, None)
+
+    # Sin PostgreSQL no hay a quién avisar
+    await SessionCache(ttl_seconds=60, max_entries=10, flush_interval=60).publicar(db, sesiones=[1])
+    assert db.queries == []
+
+    cache = SessionCache(ttl_seconds=60, max_entries=10, flush_interval=60, engine=object())
+    await cache.publicar(db, sesiones=range(1, 1002), usuarios=[7])
+
+    avisos = [json.loads(params["payload"]) for _, params in db.queries]
+    assert avisos[0] == {"usuarios": [7]}
+    assert [len(a["sesiones"]) for a in avisos[1:]] == [500, 500, 1]
+    assert all(params["canal"] == CANAL_REVOCACIONES for _, params in db.queries)
+
+    db.queries.clear()
+    await cache.publicar(db, todos_los_permisos=True)
+    assert [json.loads(params["payload"]) for _, params in db.queries] == [{"todos_los_permisos": True}]
+
+
+class FakeConexionCruda:
+    """Conexión asyncpg falsa: la primera se cae cuando se activa `caer`."""
+    def __init__(self, falla: bool):
+        self.listeners = {}
+        self.falla = falla
+        self.caer = asyncio.Event()
+        self.cerrada = False
+
+    async def add_listener(self, canal, callback):
+        self.listeners[canal] = callback
+
+    async def remove_listener(self, canal, callback):
+        self.listeners.pop(canal)
+
+    async def execute(self, sql):
+        if self.falla:
+            await self.caer.wait()
+            self.cerrada = True
+            raise ConnectionError("conexión perdida")
+
+    def is_closed(self):
+        return self.cerrada
+
+
+class FakeEngine:
+    def __init__(self):
+        self.conexiones = []
+
+    def connect(self):
+        crudo = FakeConexionCruda(falla=not self.conexiones)
+        self.conexiones.append(crudo)
+
+        class Conexion:
+            async def __aenter__(inner_self):
+                return inner_self
+
+            async def __aexit__(inner_self, *args):
+                return False
+
+            async def get_raw_connection(inner_self):
+                return SimpleNamespace(driver_connection=crudo)
+        return Conexion()
+
+
+async def esperar(condicion):
+    for _ in range(200):
+        if condicion():
+            return
+        await asyncio.sleep(0.005)
+    raise AssertionError("la condición no se cumplió a tiempo")
+
+
+@pytest.mark.asyncio
+async def test_escucha_revocaciones_y_reconecta():
+    engine = FakeEngine()
+    cache = SessionCache(ttl_seconds=60, max_entries=100, flush_interval=60, engine=engine)
+    tarea = asyncio.create_task(cache._ciclo_escucha(intervalo=0.01))
+    try:
+        await esperar(lambda: cache.escuchando)
+        cache.guardar("tok1", crear_sesion(id=1), crear_usuario())
+        cache.guardar("tok2", crear_sesion(id=2), crear_usuario(8))
+
+        # Otro worker cerró la sesión 1
+        primera = engine.conexiones[0]
+        primera.listeners[CANAL_REVOCACIONES](primera, 4242, CANAL_REVOCACIONES, json.dumps({"sesiones": [1]}))
+        assert cache.obtener("tok1") is None and cache.obtener("tok2") is not None
+
+        # Se cae la conexión: al reconectar la caché se vacía porque pudo perder avisos
+        primera.caer.set()
+        await esperar(lambda: len(engine.conexiones) == 2 and cache.escuchando)
+        assert cache.metricas()["entradas"] == 0
+        assert CANAL_REVOCACIONES in engine.conexiones[1].listeners
+    finally:
+        tarea.cancel()
+        await asyncio.gather(tarea, return_exceptions=True)
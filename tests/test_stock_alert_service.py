@@ -0,0 +1,69 @@
+# tests/test_stock_alert_service.py
+import asyncio
+import pytest
+from app.services.stock_alert_service import StockAlertAggregator
+
+
+def producto(code, inventory):
+    return {"name": f"Producto {code}", "code": code, "inventory": inventory, "min_inventory": 5}
+
+
+class FakeMailService:
+    enviados = []
+
+    async def send_stock_alert_email(self, email, productos):
+        FakeMailService.enviados.append((email, productos))
+
+
+@pytest.fixture
+def aggregator(monkeypatch):
+    FakeMailService.enviados = []
+
+    async def fake_destinatarios(self):
+        return ["admin@example.com"]
+
+    monkeypatch.setattr("app.services.stock_alert_service.MailService", FakeMailService)
+    monkeypatch.setattr(StockAlertAggregator, "_obtener_destinatarios", fake_destinatarios)
+    return StockAlertAggregator(ventana_segundos=0.05, ttl_destinatarios=60, max_envios_concurrentes=1)
+
+
+@pytest.mark.asyncio
+async def test_agrupa_alertas_en_un_solo_correo(aggregator):
+    aggregator.registrar([producto("A", 4)])
+    aggregator.registrar([producto("A", 3), producto("B", 1)])
+    aggregator.registrar([producto("A", 2)])
+
+    await asyncio.sleep(0.1)
+    await aggregator.cerrar()
+
+    assert len(FakeMailService.enviados) == 1
+    email, productos = FakeMailService.enviados[0]
+    assert email == ["admin@example.com"]
+    assert {p["code"]: p["inventory"] for p in productos} == {"A": 2, "B": 1}
+
+
+@pytest.mark.asyncio
+async def test_mismo_producto_una_vez_por_ventana(aggregator):
+    aggregator.registrar([producto("A", 4)])
+    await asyncio.sleep(0.07)
+    aggregator.registrar([producto("A", 3)])
+    await asyncio.sleep(0.02)
+    # Aún dentro de la ventana del primer aviso: no hay segundo correo
+    assert len(FakeMailService.enviados) == 1
+
+    await asyncio.sleep(0.1)
+    assert len(FakeMailService.enviados) == 2
+    assert FakeMailService.enviados[1][1][0]["inventory"] == 3
+    await aggregator.cerrar()
+
+
+@pytest.mark.asyncio
+async def test_cerrar_envia_pendientes_sin_esperar(aggregator):
+    aggregator.ventana_segundos = 60
+    aggregator.registrar([producto("A", 4)])
+
+    await aggregator.cerrar()
+
+    assert len(FakeMailService.enviados) == 1
+    aggregator.registrar([producto("B", 1)])
+    assert aggregator._pendientes == {}
@@ -35,7 +35,7 @@ class FakeDBAuth:
 def test_authenticate_user_success(monkeypatch):
     fake_user = FakeUser("ismael", "hashedpass")
     db = FakeDBAuth(user=fake_user)
-    monkeypatch.setattr("app.services.user_service.verify_password", lambda plain, hashed: True)
+    monkeypatch.setattr("app.services.user_service.verify_password_async", AsyncMock(return_value=True))
     service = UserService(db)
     user = asyncio.run(service.authenticate_user("ismael", "1234"))
     assert user.nombre_usuario == "ismael"
@@ -49,7 +49,7 @@ def test_authenticate_user_not_exist():
 def test_authenticate_user_wrong_password(monkeypatch):
     fake_user = FakeUser("ismael", "hashedpass")
     db = FakeDBAuth(user=fake_user)
-    monkeypatch.setattr("app.services.user_service.verify_password", lambda plain, hashed: False)
+    monkeypatch.setattr("app.services.user_service.verify_password_async", AsyncMock(return_value=False))
     service = UserService(db)
     with pytest.raises(ValueError, match="Contraseña incorrecta"):
         asyncio.run(service.authenticate_user("ismael", "wrong"))
@@ -445,8 +445,8 @@ async def test_update_password_success(monkeypatch):
     service = UserService(db)
     user = Usuario(nombre_usuario="manuel", contrasena="oldpass", correo_electronico="a@b.com", rol="admin")
 
-    # Mock hash_password
-    monkeypatch.setattr("app.services.user_service.hash_password", lambda pwd: "hashed_" + pwd)
+    # Mock hash_password_async
+    monkeypatch.setattr("app.services.user_service.hash_password_async", AsyncMock(side_effect=lambda pwd: "hashed_" + pwd))
 
     updated_user = await service.update_password(user, "Password123!")
 